@@ -0,0 +1,83 @@
+"""
+Benchmark of the SASA used by the energy terms (bagel.energies.structure_sasa) against biotite's ``sasa``.
+
+biotite computes the SASA of every atom of the structure, as SurfaceAreaEnergy and HydrophobicEnergy used to. The
+energy terms now only place surface points on the atoms they select (all atoms still occluding them), with a
+configurable number of points per atom. For complexes of 200 to 3000 residues folded by the SyntheticFoldingOracle, a
+binder of 40 residues is selected, as in a binder design run, and the time and largest error of its SASA are reported.
+
+Usage: python scripts/benchmarks/sasa.py [--lengths 200 500 1000 2000 3000] [--repeats 3]
+
+MIT License
+
+Copyright (c) 2025 Jakub Lála, Ayham Al-Saffar, Stefano Angioletti-Uberti
+"""
+
+import time
+import argparse
+from typing import Any, Callable
+import numpy as np
+import numpy.typing as npt
+import bagel as bg
+from biotite.structure import sasa
+from bagel.constants import probe_radius_water
+from bagel.energies import structure_sasa
+from bagel.oracles import OraclesResultDict
+
+BINDER_LENGTH = 40
+AMINO_ACIDS = 'ACDEFGHIKLMNPQRSTVWY'
+
+
+def make_complex(length: int, seed: int = 0) -> list[bg.Chain]:
+    """Target of ``length - BINDER_LENGTH`` residues and a binder of BINDER_LENGTH residues, with random sequences."""
+    rng = np.random.default_rng(seed)
+    chains = []
+    for chain_ID, chain_length in (('A', length - BINDER_LENGTH), ('B', BINDER_LENGTH)):
+        sequence = rng.choice(list(AMINO_ACIDS), size=chain_length)
+        chains.append(bg.Chain([bg.Residue(name=aa, chain_ID=chain_ID, index=i) for i, aa in enumerate(sequence)]))
+    return chains
+
+
+def best_time(function: Callable[[], object], repeats: int) -> float:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--lengths', type=int, nargs='+', default=[200, 500, 1000, 2000, 3000])
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    oracle = bg.oracles.SyntheticFoldingOracle()
+    columns = {'residues': 8, 'atoms': 7, 'biotite (s)': 12, 'points': 7, 'bagel (s)': 10, 'speedup': 8}
+    print(' '.join(f'{name:>{width}}' for name, width in columns.items()), f'{"max error (A^2)":>16}')
+    for length in args.lengths:
+        result = oracle.predict(make_complex(length))
+        structure = result.structure
+        binder_mask = structure.chain_id == 'B'
+        reference = sasa(structure, probe_radius=probe_radius_water)
+        reference_time = best_time(lambda: sasa(structure, probe_radius=probe_radius_water), args.repeats)
+
+        for point_number in (1000, 100):
+            # a copy of the result without derived quantities per call, so that nothing is reused from the previous call
+            def compute() -> npt.NDArray[Any]:
+                oracles_result = OraclesResultDict({oracle: result.model_copy()})
+                oracles_result[oracle]._derived = {}  # shared with the result by model_copy otherwise
+                return structure_sasa(oracles_result, oracle, probe_radius_water, binder_mask, point_number)
+
+            values = compute()
+            elapsed = best_time(compute, args.repeats)
+            error = np.nanmax(np.abs(values[binder_mask] - reference[binder_mask]))
+            print(
+                f'{length:>8} {len(structure):>7} {reference_time:>12.3f} {point_number:>7} {elapsed:>10.4f} '
+                f'{reference_time / elapsed:>8.1f} {error:>16.3f}'
+            )
+
+
+if __name__ == '__main__':
+    main()
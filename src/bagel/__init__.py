@@ -11,10 +11,22 @@ resolve_and_set_model_dir()
 
 __version__ = get_version_from_pyproject()
 
-from .chain import Chain, Residue
+from .chain import Chain, CompactChain, Residue
 from .state import State
-from .system import System
+from .system import System, SystemSnapshot
 from . import constants, energies, minimizer, mutation, oracles
 
 
-__all__ = ['Chain', 'Residue', 'State', 'System', 'constants', 'energies', 'minimizer', 'mutation', 'oracles']
+__all__ = [
+    'Chain',
+    'CompactChain',
+    'Residue',
+    'State',
+    'System',
+    'SystemSnapshot',
+    'constants',
+    'energies',
+    'minimizer',
+    'mutation',
+    'oracles',
+]
@@ -4,6 +4,7 @@ Protein chain and residue representation module.
 This module provides classes for representing and manipulating protein chains:
 - Residue: Represents a single amino acid with properties like name and mutability
 - Chain: Represents a sequence of residues with methods for mutation, addition, and removal
+- CompactChain: Same interface as Chain, storing the residues in NumPy arrays, for long chains and many-state systems
 
 The module supports loading protein structures from PDB files and working with
 amino acid sequences programmatically.
@@ -13,13 +14,112 @@ MIT License
 Copyright (c) 2025 Jakub Lála, Ayham Al-Saffar, Stefano Angioletti-Uberti
 """
 
-from dataclasses import dataclass
-from typing import Self, List
+from dataclasses import dataclass, field
+from typing import Any, ClassVar, Iterable, Self, List
+import zlib
+import threading
+import numpy as np
+import numpy.typing as npt
 import pathlib as pl
 from biotite.structure.io.pdb import PDBFile
 from biotite.structure import get_residues
 from .constants import aa_dict
 
+# one-letter names of the amino acids, indexed by the codes stored in a CompactChain
+amino_acids = list(aa_dict.keys())
+amino_acid_codes = {amino_acid: code for code, amino_acid in enumerate(amino_acids)}
+_amino_acid_letters = np.frombuffer(''.join(amino_acids).encode(), dtype=np.uint8)
+_letter_codes = np.zeros(256, dtype=np.uint8)
+_letter_codes[_amino_acid_letters] = np.arange(len(amino_acids), dtype=np.uint8)
+
+# Zobrist keys: one random 64-bit integer per (position, amino acid), generated in blocks of positions from fixed seeds,
+# so that fingerprints are the same in every process whatever the length of the chains seen first
+_ZOBRIST_BLOCK = 1024
+_zobrist_keys: npt.NDArray[np.uint64] = np.zeros((0, len(amino_acids)), dtype=np.uint64)
+_zobrist_lock = threading.Lock()
+
+
+def zobrist_keys(length: int) -> npt.NDArray[np.uint64]:
+    """Zobrist keys (at least ``length`` positions x 20 amino acids) used to fingerprint sequences."""
+    global _zobrist_keys
+    if len(_zobrist_keys) < length:
+        with _zobrist_lock:
+            blocks = [_zobrist_keys]
+            for block in range(len(_zobrist_keys) // _ZOBRIST_BLOCK, -(-length // _ZOBRIST_BLOCK)):
+                rng = np.random.default_rng([0xBA6E1, block])
+                blocks.append(rng.integers(0, 2**64, size=(_ZOBRIST_BLOCK, len(amino_acids)), dtype=np.uint64))
+            _zobrist_keys = np.concatenate(blocks)
+    return _zobrist_keys
+
+
+def sequence_fingerprint(codes: npt.NDArray[np.uint8]) -> int:
+    """64-bit fingerprint of a sequence of amino acid codes: the XOR of the Zobrist keys of all its residues."""
+    keys = zobrist_keys(len(codes))
+    return int(np.bitwise_xor.reduce(keys[np.arange(len(codes)), codes], initial=np.uint64(0)))
+
+
+def combine_fingerprints(fingerprints: Iterable[int]) -> int:
+    """Order-dependent 64-bit combination (FNV-1a over 64-bit words) of several fingerprints."""
+    combined = 0xCBF29CE484222325
+    for fingerprint in fingerprints:
+        combined = ((combined ^ fingerprint) * 0x100000001B3) & 0xFFFFFFFFFFFFFFFF
+    return combined
+
+
+def chains_fingerprint(chains: Iterable['Chain']) -> int:
+    """Fingerprint of an ordered list of chains, covering their IDs and sequences."""
+    return combine_fingerprints(
+        value for chain in chains for value in (zlib.crc32(chain.chain_ID.encode()), chain.fingerprint)
+    )
+
+
+class _ResidueIndex:
+    """
+    Index of a residue in its chain. Chains do not renumber their residues when one is added or removed, they only
+    record the first position whose residues may have moved, and renumber them the next time an index is read.
+    """
+
+    def __get__(self, residue: Any, owner: type) -> int:
+        if residue is None:
+            raise AttributeError('index')  # the field has no default value
+        chain = residue.__dict__.get('_chain')
+        if chain is not None and chain._renumber_from is not None:
+            chain._renumber()
+        return residue.__dict__['_index']  # type: ignore[no-any-return]
+
+    def __set__(self, residue: Any, index: int) -> None:
+        residue.__dict__['_index'] = index
+
+
+class _ResidueMutable:
+    """Mutability of a residue. Changing it invalidates the number of mutable residues cached by its chain."""
+
+    def __get__(self, residue: Any, owner: type) -> bool:
+        if residue is None:
+            return True  # default value of the field
+        return residue.__dict__['_mutable']  # type: ignore[no-any-return]
+
+    def __set__(self, residue: Any, mutable: bool) -> None:
+        residue.__dict__['_mutable'] = mutable
+        chain = residue.__dict__.get('_chain')
+        if chain is not None:
+            chain._n_mutable = None
+
+
+class _ResidueName:
+    """Amino acid of a residue. Changing it updates the fingerprint of its chain in O(1)."""
+
+    def __get__(self, residue: Any, owner: type) -> str:
+        if residue is None:
+            raise AttributeError('name')  # the field has no default value
+        return residue.__dict__['_name']  # type: ignore[no-any-return]
+
+    def __set__(self, residue: Any, name: str) -> None:
+        chain = residue.__dict__.get('_chain')
+        if chain is not None and chain._fingerprint is not None:
+            chain._update_fingerprint(residue.index, residue.__dict__['_name'], name)
+        residue.__dict__['_name'] = name
+
 
 @dataclass
 class Residue:
@@ -29,19 +129,25 @@ class Residue:
     Attributes:
         name: Type of the amino acid in one-letter format (upper-cased)
         chain_ID: ID of the polymer chain this residue belongs to
-        index: Internal index of the residue in the chain (0 to len(chain)-1, i.e. 0-indexed)
+        index: Internal index of the residue in the chain (0 to len(chain)-1, i.e. 0-indexed), kept up to date by the
+            chain it belongs to
         mutable: Whether the residue can be mutated
 
+    A residue of a chain also has a stable ID (``uid``), given by the chain, that does not change when residues are
+    added or removed before it, unlike its index.
+
     Examples:
         >>> residue = Residue("A", "X", 0)
         >>> residue.three_letter_name
         'ALA'
     """
 
-    name: str
-    chain_ID: str
-    index: int
-    mutable: bool = True
+    name: str = _ResidueName()  # type: ignore[assignment]
+    chain_ID: str  # type: ignore[misc]  # name has no default either, see _ResidueName
+    index: int = _ResidueIndex()  # type: ignore[assignment]
+    mutable: bool = _ResidueMutable()  # type: ignore[assignment]
+    _chain: 'Chain | None' = field(default=None, init=False, repr=False, compare=False)  # chain the residue is part of
+    uid: int = field(default=-1, init=False, repr=False, compare=False)  # stable ID in its chain, -1 if in no chain
 
     def __post_init__(self) -> None:
         """Validation checks for a residue."""
@@ -61,9 +167,21 @@ class Chain:
 
     Attributes:
         residues: List of Residue objects
+
+    Adding or removing a residue does not renumber the residues after it straight away, only when one of their indexes
+    is next read, so that moves on long chains do not pay for renumbering at every step. Set ``Chain.debug_checks``
+    to True to check that all indexes are consistent after every addition and removal.
+
+    Every residue gets a stable ID (``residue.uid``) from the chain: the initial residues are numbered from 0 like their
+    indexes, and added residues get the next unused ID. IDs are never reused, so energy terms can refer to residues by
+    their ID and translate IDs to positions with :meth:`residue_positions` only when they need them.
+
+    The chain also keeps a 64-bit :attr:`fingerprint` of its sequence, which is updated in O(1) when a residue is
+    mutated, and can be used in place of the sequence as a key of caches and visited sets.
     """
 
     residues: List[Residue]
+    debug_checks: ClassVar[bool] = False
 
     def __post_init__(self) -> None:
         """Used for sanity checks."""
@@ -72,6 +190,44 @@ class Chain:
         assert all(residue.chain_ID == self.chain_ID for residue in self.residues), (
             'chain_ID must be the same for all residues in the chain'
         )
+        self._renumber_from: int | None = None  # first position whose residues may have an outdated index
+        self._n_mutable: int | None = None  # cached number of mutable residues
+        self._fingerprint: int | None = None  # cached fingerprint of the sequence
+        self._position_table: npt.NDArray[np.int_] | None = None  # position of each residue, indexed by uid
+        self.layout_version = 0  # incremented every time a residue is added or removed
+        for uid, residue in enumerate(self.residues):
+            residue._chain = self
+            residue.uid = uid
+        self._next_uid = len(self.residues)
+
+    def _renumber(self) -> None:
+        """Update the indexes of the residues that moved since the last addition or removal."""
+        start = self._renumber_from
+        if start is None:
+            return
+        for i in range(start, len(self.residues)):
+            self.residues[i].index = i
+        # only cleared once all indexes are up to date: meanwhile, concurrent readers renumber (the same way) too
+        self._renumber_from = None
+
+    def _moved_from(self, position: int) -> None:
+        """Record that the residues from the given position on have moved."""
+        self._position_table = None
+        self.layout_version += 1
+        if self._renumber_from is None or position < self._renumber_from:
+            self._renumber_from = position
+
+    def _update_fingerprint(self, position: int, old_amino_acid: str, new_amino_acid: str) -> None:
+        """Update the cached fingerprint when the amino acid at the given position changes."""
+        assert self._fingerprint is not None
+        position %= self.length  # e.g. -1 for the last residue
+        keys = zobrist_keys(position + 1)[position]
+        self._fingerprint ^= int(keys[amino_acid_codes[old_amino_acid]] ^ keys[amino_acid_codes[new_amino_acid]])
+
+    def check_indexes(self) -> None:
+        """Consistency check that the index of every residue is its position in the chain."""
+        for i, residue in enumerate(self.residues):
+            assert residue.index == i, f'Index of residue {residue} is not correct'
 
     @property
     def chain_ID(self) -> str:
@@ -88,6 +244,40 @@ class Chain:
         """String (one-letter) representation of amino acids in Chain."""
         return ''.join([residue.name for residue in self.residues])
 
+    @property
+    def residue_uids(self) -> npt.NDArray[np.int_]:
+        """Stable IDs of the residues, in order."""
+        return np.array([residue.uid for residue in self.residues], dtype=int)
+
+    def residue_uid(self, index: int) -> int:
+        """Stable ID of the residue at the given index."""
+        return self.residues[index].uid
+
+    def residue_positions(self, uids: npt.NDArray[np.int_]) -> npt.NDArray[np.int_]:
+        """
+        Current positions of the residues with the given stable IDs, -1 for residues that have been removed. The table
+        of positions is built once after residues are added or removed, then every lookup is vectorised.
+        """
+        table = self._position_table
+        if table is None:
+            # only shared once filled, as other threads (e.g. states evaluated in parallel) may look positions up too
+            table = np.full(self._next_uid, -1, dtype=int)
+            table[self.residue_uids] = np.arange(self.length)
+            self._position_table = table
+        return table[uids]
+
+    @property
+    def fingerprint(self) -> int:
+        """
+        64-bit Zobrist fingerprint of the sequence, the XOR of one random key per (position, amino acid).
+
+        It is updated in O(1) when a residue is mutated. Adding or removing a residue shifts the positions of the
+        residues after it, so the fingerprint is then computed again (vectorised) the next time it is read.
+        """
+        if self._fingerprint is None:
+            self._fingerprint = sequence_fingerprint(_letter_codes[np.frombuffer(self.sequence.encode(), np.uint8)])
+        return self._fingerprint
+
     @property
     def mutable_residues(self) -> List[Residue]:
         """List of mutable Residues in Chain"""
@@ -96,7 +286,14 @@ class Chain:
     @property
     def mutable_residue_indexes(self) -> List[int]:
         """List of the indexes of mutable Residues in Chain"""
-        return [residue.index for residue in self.residues if residue.mutable]
+        return [i for i, residue in enumerate(self.residues) if residue.mutable]
+
+    @property
+    def n_mutable(self) -> int:
+        """Number of mutable Residues in Chain, cached and kept up to date when residues are added or removed."""
+        if self._n_mutable is None:
+            self._n_mutable = sum(residue.mutable for residue in self.residues)
+        return self._n_mutable
 
     @property
     def length(self) -> int:
@@ -131,31 +328,273 @@ class Chain:
         """Remove the Residue at the given index (0-indexed)."""
         index = index if index >= 0 else len(self.residues) + index
         assert self.residues[index].mutable, AssertionError('Cannot delete immutable residue')
-        self.residues.pop(index)
-        for i in range(index, len(self.residues)):
-            self.residues[i].index -= 1
-        # Added consistency check to ensure that the indices are correct
-        for i in range(len(self.residues)):
-            assert self.residues[i].index == i, f'Index of residue {self.residues[i]} is not correct after deletion'
+        removed = self.residues.pop(index)
+        removed._chain = None
+        self._moved_from(index)
+        self._fingerprint = None
+        if self._n_mutable is not None:
+            self._n_mutable -= 1
+        if self.debug_checks:
+            self.check_indexes()
 
     def add_residue(self, amino_acid: str, index: int) -> None:
         """Add a Residue of type amino_acid at the position specified by index (0-indexed)."""
         index = index if index >= 0 else len(self.residues) + index
         assert index <= self.length, f'Invalid index for {self.length} length chain'
         assert amino_acid in aa_dict.keys(), f'Acceptable amino acids are {aa_dict.keys()}'
-        chain_ID = self.residues[0].chain_ID
-        self.residues.insert(index, Residue(name=amino_acid, chain_ID=chain_ID, index=index, mutable=True))
-        for i in range(index + 1, len(self.residues)):
-            self.residues[i].index += 1
-        # Added consistency check to ensure that the indices are correct
-        for i in range(len(self.residues)):
-            assert self.residues[i].index == i, f'Index of residue {self.residues[i]} is not correct after addition'
+        residue = Residue(name=amino_acid, chain_ID=self.chain_ID, index=index, mutable=True)
+        residue._chain = self
+        residue.uid, self._next_uid = self._next_uid, self._next_uid + 1
+        self.residues.insert(index, residue)
+        self._moved_from(index + 1)
+        self._fingerprint = None
+        if self._n_mutable is not None:
+            self._n_mutable += 1
+        if self.debug_checks:
+            self.check_indexes()
 
     def mutate_residue(self, index: int, amino_acid: str) -> None:
         """Change identity of Residue at position specified by index to 'amino_acid'"""
         assert -self.length - 1 <= index <= self.length, f'Invalid index for {self.length} length chain'
-        assert self.mutability[index] == 1, 'Index of selected Residue is not mutable'
+        assert self.residues[index].mutable, 'Index of selected Residue is not mutable'
         assert amino_acid in aa_dict.keys(), f'Acceptable amino acids are {aa_dict.keys()}'
         mutated_residue = self.residues[index]
         mutated_residue.name = amino_acid
         self.residues[index] = mutated_residue
+
+
+class ResidueView(Residue):
+    """
+    Residue of a :class:`CompactChain`, created on demand. Its name and mutability are read from (and written to)
+    the arrays of the chain, and its index is its position in the chain.
+
+    A view is only valid until a residue is added to or removed from its chain, after which ``chain.residues`` returns
+    new views.
+    """
+
+    def __init__(self, chain: 'CompactChain', position: int) -> None:
+        self._compact_chain = chain
+        self._position = position
+
+    @property
+    def name(self) -> str:
+        return amino_acids[int(self._compact_chain._codes[self._position])]
+
+    @name.setter
+    def name(self, amino_acid: str) -> None:
+        self._compact_chain._set_code(self._position, amino_acid)
+
+    @property
+    def chain_ID(self) -> str:  # type: ignore[override]
+        return self._compact_chain.chain_ID
+
+    @property
+    def index(self) -> int:  # type: ignore[override]
+        return self._position
+
+    @property
+    def uid(self) -> int:  # type: ignore[override]
+        return self._compact_chain.residue_uid(self._position)
+
+    @property
+    def mutable(self) -> bool:
+        return bool(self._compact_chain._mutable[self._position])
+
+    @mutable.setter
+    def mutable(self, mutable: bool) -> None:
+        self._compact_chain._mutable[self._position] = mutable
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Residue):
+            return NotImplemented
+        return (self.name, self.chain_ID, self.index, self.mutable) == (
+            other.name,
+            other.chain_ID,
+            other.index,
+            other.mutable,
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f'ResidueView(name={self.name!r}, chain_ID={self.chain_ID!r}, index={self.index}, mutable={self.mutable})'
+        )
+
+
+class CompactChain(Chain):
+    """
+    Chain storing the amino acids of its residues as a ``uint8`` array of codes and their mutability as a boolean mask,
+    rather than as a list of :class:`Residue` objects. Its sequence is cached until the chain is mutated, and
+    :class:`Residue` objects are only created when ``residues`` is accessed, as :class:`ResidueView` objects.
+
+    It has the same interface as :class:`Chain` and can be used in its place anywhere, with a fraction of the memory
+    and of the cost of the properties used at every step (``sequence``, ``mutability``, ``mutable_residue_indexes``).
+
+    Examples:
+        >>> chain = CompactChain.from_sequence('GSVK', chain_ID='A', mutable=[False, True, True, True])
+        >>> chain.mutate_residue(index=1, amino_acid='A')
+        >>> chain.sequence
+        'GAVK'
+    """
+
+    _codes: npt.NDArray[np.uint8]
+    _mutable: npt.NDArray[np.bool_]
+    _sequence: str | None
+    _fingerprint: int | None
+    _uids: npt.NDArray[np.int_]
+    _views: List[ResidueView] | None
+
+    def __init__(self, residues: List[Residue]) -> None:
+        self.residues = residues
+        self.__post_init__()
+
+    def __post_init__(self) -> None:
+        assert self.length > 0, 'A CompactChain must have at least one residue'
+
+    @property
+    def residues(self) -> List[Residue]:
+        """Views of the residues of the chain, in order."""
+        if self._views is None:
+            self._views = [ResidueView(self, position) for position in range(self.length)]
+        return self._views  # type: ignore[return-value]
+
+    @residues.setter
+    def residues(self, residues: List[Residue]) -> None:
+        assert len(residues) > 0, 'A CompactChain must have at least one residue'
+        self.my_chain_ID = residues[0].chain_ID
+        assert all(residue.chain_ID == self.my_chain_ID for residue in residues), (
+            'chain_ID must be the same for all residues in the chain'
+        )
+        self._codes = np.array([amino_acid_codes[residue.name] for residue in residues], dtype=np.uint8)
+        self._mutable = np.array([residue.mutable for residue in residues], dtype=bool)
+        self._uids = np.arange(len(residues))
+        self._next_uid = len(residues)
+        self.layout_version = 0
+        self._invalidate(views=True)
+
+    def _invalidate(self, views: bool = False) -> None:
+        self._sequence = None
+        if views:
+            self._views = None
+            self._fingerprint = None
+            self._position_table = None
+
+    def _set_code(self, position: int, amino_acid: str) -> None:
+        assert amino_acid in amino_acid_codes, f'Acceptable amino acids are {aa_dict.keys()}'
+        if self._fingerprint is not None:
+            self._update_fingerprint(position, amino_acids[self._codes[position]], amino_acid)
+        self._codes[position] = amino_acid_codes[amino_acid]
+        self._invalidate()
+
+    def __getstate__(self) -> dict[str, Any]:
+        """Views are not copied (nor pickled) with the chain, they are created again when needed."""
+        state = self.__dict__.copy()
+        state['_views'] = None
+        return state
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, CompactChain):
+            return (
+                self.chain_ID == other.chain_ID
+                and np.array_equal(self._codes, other._codes)
+                and np.array_equal(self._mutable, other._mutable)
+            )
+        if isinstance(other, Chain):
+            return self.residues == other.residues
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f'CompactChain(chain_ID={self.chain_ID!r}, sequence={self.sequence!r})'
+
+    @classmethod
+    def from_sequence(cls, sequence: str, chain_ID: str, mutable: bool | List[bool] = True) -> Self:
+        """Create a CompactChain from a sequence of one-letter amino acids, all mutable by default."""
+        mutability = [mutable] * len(sequence) if isinstance(mutable, bool) else mutable
+        assert len(mutability) == len(sequence), 'sequence and mutability must have the same length'
+        return cls(
+            [
+                Residue(name=name, chain_ID=chain_ID, index=i, mutable=m)
+                for i, (name, m) in enumerate(zip(sequence, mutability))
+            ]
+        )
+
+    @classmethod
+    def from_chain(cls, chain: Chain) -> Self:
+        """Compact copy of a Chain."""
+        return cls(chain.residues)
+
+    @property
+    def mutability(self) -> List[bool]:
+        """List of mutability of each Residue in Chain."""
+        return self._mutable.tolist()  # type: ignore[no-any-return]
+
+    @property
+    def sequence(self) -> str:
+        """String (one-letter) representation of amino acids in Chain, cached until the chain is mutated."""
+        if self._sequence is None:
+            self._sequence = _amino_acid_letters[self._codes].tobytes().decode()
+        return self._sequence
+
+    @property
+    def residue_uids(self) -> npt.NDArray[np.int_]:
+        """Stable IDs of the residues, in order."""
+        return self._uids
+
+    def residue_uid(self, index: int) -> int:
+        """Stable ID of the residue at the given index."""
+        return int(self._uids[index])
+
+    @property
+    def fingerprint(self) -> int:
+        """64-bit Zobrist fingerprint of the sequence, see :attr:`Chain.fingerprint`."""
+        if self._fingerprint is None:
+            self._fingerprint = sequence_fingerprint(self._codes)
+        return self._fingerprint
+
+    @property
+    def mutable_residues(self) -> List[Residue]:
+        """List of mutable Residues in Chain"""
+        residues = self.residues
+        return [residues[i] for i in np.flatnonzero(self._mutable)]
+
+    @property
+    def mutable_residue_indexes(self) -> List[int]:
+        """List of the indexes of mutable Residues in Chain"""
+        return np.flatnonzero(self._mutable).tolist()  # type: ignore[no-any-return]
+
+    @property
+    def n_mutable(self) -> int:
+        """Number of mutable Residues in Chain."""
+        return int(np.count_nonzero(self._mutable))
+
+    @property
+    def length(self) -> int:
+        """Number of amino acids in Chain."""
+        return len(self._codes)
+
+    def remove_residue(self, index: int) -> None:
+        """Remove the Residue at the given index (0-indexed)."""
+        index = index if index >= 0 else self.length + index
+        assert self._mutable[index], AssertionError('Cannot delete immutable residue')
+        self._codes = np.delete(self._codes, index)
+        self._mutable = np.delete(self._mutable, index)
+        self._uids = np.delete(self._uids, index)
+        self.layout_version += 1
+        self._invalidate(views=True)
+
+    def add_residue(self, amino_acid: str, index: int) -> None:
+        """Add a Residue of type amino_acid at the position specified by index (0-indexed)."""
+        index = index if index >= 0 else self.length + index
+        assert index <= self.length, f'Invalid index for {self.length} length chain'
+        assert amino_acid in aa_dict.keys(), f'Acceptable amino acids are {aa_dict.keys()}'
+        self._codes = np.insert(self._codes, index, amino_acid_codes[amino_acid])
+        self._mutable = np.insert(self._mutable, index, True)
+        self._uids = np.insert(self._uids, index, self._next_uid)
+        self._next_uid += 1
+        self.layout_version += 1
+        self._invalidate(views=True)
+
+    def mutate_residue(self, index: int, amino_acid: str) -> None:
+        """Change identity of Residue at position specified by index to 'amino_acid'"""
+        assert -self.length - 1 <= index <= self.length, f'Invalid index for {self.length} length chain'
+        assert self._mutable[index], 'Index of selected Residue is not mutable'
+        self._set_code(index, amino_acid)
@@ -11,14 +11,13 @@ import warnings
 
 import numpy as np
 import numpy.typing as npt
-import pandas as pd
-from typing import Literal, Callable
-from biotite.structure import AtomArray, sasa, annotate_sse, superimpose
+from typing import Any, Literal, Callable
+from biotite.structure import AtomArray, CellList, sasa, annotate_sse, superimpose
 
 from .constants import hydrophobic_residues, max_sasa_values, probe_radius_water, backbone_atoms
 from .chain import Residue, Chain
 from .oracles import Oracle, OracleResult, OraclesResultDict
-from .oracles.folding import FoldingResult, FoldingOracle
+from .oracles.folding import FoldingResult, FoldingOracle, StructureIndex
 from .oracles.embedding import EmbeddingResult, EmbeddingOracle
 from .oracles.folding.utils import reorder_atoms_in_template
 
@@ -32,6 +31,134 @@ def residue_list_to_group(residues: list[Residue]) -> ResidueGroup:
     return (np.array([res.chain_ID for res in residues]), np.array([res.index for res in residues]))
 
 
+def at_least_float32(array: npt.NDArray[np.floating]) -> npt.NDArray[np.floating]:
+    """
+    Oracle result in the precision energy terms compute in. Results stored in float16 (see :attr:`.Oracle.precision`)
+    are promoted to float32, which is safe for the sums, means and norms of the energy terms while float16 is not,
+    and results stored in float32 or float64 are used as they are.
+    """
+    array = np.asarray(array)
+    return array.astype(np.promote_types(array.dtype, np.float32), copy=False)
+
+
+def structure_sasa(
+    oracles_result: OraclesResultDict,
+    oracle: Oracle,
+    probe_radius: float,
+    atom_mask: npt.NDArray[np.bool_] | None = None,
+    point_number: int = 1000,
+) -> npt.NDArray[Any]:
+    """
+    SASA of the atoms of the structure predicted by an oracle, using the Shrake-Rupley algorithm of biotite (``sasa``),
+    which finds the neighbours of each atom with a cell list.
+
+    Surface points are only placed on the target atoms (``atom_mask``, all atoms if None), while all atoms of the
+    structure occlude them, so the SASA of an atom does not depend on which other atoms are targets. It is therefore
+    computed at most once per atom, result, probe radius and point number (see :meth:`.OraclesResultDict.get_derived`),
+    the atoms computed for one energy term being reused by the others. SASA is the most expensive quantity computed by
+    the energy terms.
+
+    Parameters
+    ----------
+    oracles_result: OraclesResultDict
+        Results of the oracles of the state.
+    oracle: Oracle
+        Oracle that predicted the structure.
+    probe_radius: float
+        The VdW-radius of the solvent molecules.
+    atom_mask: npt.NDArray[np.bool_] | None, default=None
+        Atoms whose SASA is needed.
+    point_number: int, default=1000
+        Number of points on the sphere of each atom. The cost is proportional to it, and the error of the SASA of an
+        atom decreases roughly as its inverse square root, so fewer points (e.g. 100) can be used while exploring and
+        the full number for final scoring.
+
+    Returns
+    -------
+    npt.NDArray[Any]
+        SASA of every atom of the structure, NaN for atoms that are neither targets nor computed for other terms (as
+        well as for the atoms biotite ignores, e.g. hydrogens).
+    """
+    structure = oracles_result.get_structure(oracle)
+    values, computed = oracles_result.get_derived(
+        oracle,
+        'sasa',
+        lambda *_: (np.full(len(structure), np.nan, dtype=np.float32), np.full(len(structure), False)),
+        probe_radius,
+        point_number,
+    )
+    missing = ~computed if atom_mask is None else atom_mask & ~computed
+    if np.any(missing):
+        values[missing] = sasa(structure, probe_radius=probe_radius, atom_filter=missing, point_number=point_number)[
+            missing
+        ]
+        computed |= missing
+    return values
+
+
+def structure_backbone_mask(oracles_result: OraclesResultDict, oracle: Oracle) -> npt.NDArray[np.bool_]:
+    """Mask of the backbone atoms of the structure predicted by an oracle, computed once per result."""
+    structure = oracles_result.get_structure(oracle)
+    return oracles_result.get_derived(oracle, 'backbone_mask', lambda: np.isin(structure.atom_name, backbone_atoms))
+
+
+def structure_sse(oracles_result: OraclesResultDict, oracle: Oracle) -> npt.NDArray[np.str_]:
+    """Secondary structure label of every residue of the structure predicted by an oracle, computed once per result."""
+    structure = oracles_result.get_structure(oracle)
+    return oracles_result.get_derived(oracle, 'secondary_structure', lambda: annotate_sse(structure))
+
+
+def nearest_distances(
+    coord: npt.NDArray[np.floating], targets: npt.NDArray[np.floating], cutoff: float = 5.0
+) -> npt.NDArray[np.floating]:
+    """
+    Distance from each point of ``coord`` to the nearest point of ``targets`` (inf if there are no targets).
+
+    Targets are put in a cell list, so that each point is only compared to the targets within ``cutoff`` of it. Points
+    with no target within the cutoff (e.g. the atoms of a binder still far from its target) are compared to all targets
+    with a matrix product, which only selects the candidates nearest to them. Distances are always computed exactly as
+    ``np.linalg.norm(target - point)``, so that they do not depend on how the nearest target was found.
+    """
+    distances = np.full(len(coord), np.inf, dtype=np.result_type(coord, targets))
+    if len(coord) == 0 or len(targets) == 0:
+        return distances
+    neighbours = CellList(targets, cell_size=cutoff).get_atoms(coord, radius=cutoff)  # [points, max. neighbours]
+    if neighbours.shape[1] > 0:
+        pair_distances = np.linalg.norm(targets[neighbours] - coord[:, np.newaxis, :], axis=-1)
+        distances = np.min(np.where(neighbours >= 0, pair_distances, np.inf), axis=1)  # -1 pads the neighbour lists
+    # a margin guards against rounding in the cell list, for which targets at the cutoff could be missed
+    far = np.flatnonzero(~(distances < cutoff - 1e-3))
+    targets_64 = targets.astype(np.float64)
+    targets_squared = np.sum(targets_64**2, axis=1)
+    chunk_size = max(1, 2**22 // len(targets))  # bounds the memory used by the matrix of distances
+    for start in range(0, len(far), chunk_size):
+        points = far[start : start + chunk_size]
+        points_64 = coord[points].astype(np.float64)
+        # |p - t|^2 = |p|^2 + |t|^2 - 2 p.t, accurate to far less than the tolerance used to select the candidates
+        squared = np.sum(points_64**2, axis=1)[:, np.newaxis] + targets_squared - 2 * points_64 @ targets_64.T
+        approximate = np.sqrt(np.maximum(squared, 0.0))
+        point_ids, target_ids = np.nonzero(approximate <= np.min(approximate, axis=1, keepdims=True) + 1e-3)
+        pair_distances = np.linalg.norm(targets[target_ids] - coord[points[point_ids]], axis=-1)
+        distances[points] = np.minimum.reduceat(pair_distances, np.searchsorted(point_ids, np.arange(len(points))))
+    return distances
+
+
+def pae_block(folding_result: Any, residues: npt.NDArray[np.int_]) -> npt.NDArray[np.floating]:
+    """
+    PAE between the given residues (sorted indexes in the structure), read from the full matrix of the result or from
+    the rows and columns it kept (see :meth:`.ESMFoldResult.restrict_pae`).
+    """
+    assert folding_result.pae.shape[0] == 1, 'batch size equal to 1 is required'
+    kept = getattr(folding_result, 'pae_residues', None)
+    if isinstance(kept, np.ndarray):
+        positions = np.searchsorted(kept, residues)
+        assert np.all(positions < len(kept)) and np.all(kept[positions] == residues), (
+            'PAE of residues that were not kept'
+        )
+        residues = positions
+    return at_least_float32(folding_result.pae[0][np.ix_(residues, residues)])
+
+
 class EnergyTerm(ABC):
     """
     Standard energy term to build the loss (total energy) function to be minimized.
@@ -46,8 +173,14 @@ class EnergyTerm(ABC):
     the new residue will be added to the residues for which this term is calculated. In general, a new residue
     inherits all energy terms of one of its neighbours (chosen randomly to be the left or right neighbour),
     if these terms are inheritable.
+
+    Once a term is bound to the chains of its state (see :meth:`bind`), it stores the residues of these chains by
+    their stable ID (see :class:`~bagel.chain.Chain`) rather than by their index, so that adding or removing a residue
+    costs O(1) for the term. IDs are translated to indexes in ``residue_groups`` once after the chains change.
     """
 
+    reads_pae = False  # whether compute only reads the PAE between residues of its groups, see State.keep_full_pae
+
     def __init__(
         self,
         name: str,
@@ -77,7 +210,10 @@ class EnergyTerm(ABC):
         self.oracle = oracle
         self.weight = weight
         self.inheritable = inheritable
-        self.residue_groups: list[ResidueGroup] = []
+        self._chains: dict[str, Chain] = {}  # chains whose residues are stored by stable ID
+        self._inherited: list[tuple[str, int, int]] = []  # (chain_ID, uid, parent uid) of residues added since
+        self._resolved: tuple[tuple[int, ...], list[ResidueGroup]] | None = None  # residue_groups for chain layouts
+        self.residue_groups = []
 
     def __post_init__(self) -> None:
         """Checks required attributes have been set after class is initialised"""
@@ -113,6 +249,74 @@ class EnergyTerm(ABC):
         """
         pass
 
+    @property
+    def residue_groups(self) -> list[ResidueGroup]:
+        """
+        Groups of residues this energy term is calculated on, as (chain_ids, res_indices) arrays with the current
+        indexes of the residues. For the chains the term is bound to, indexes are looked up from the stable IDs of the
+        residues, once after residues are added to or removed from these chains.
+        """
+        if len(self._chains) == 0:
+            return self._residue_groups
+        layout = tuple(chain.layout_version for chain in self._chains.values())
+        if self._resolved is None or self._resolved[0] != layout:
+            self._resolved = (layout, self._resolve())
+        return self._resolved[1]
+
+    @residue_groups.setter
+    def residue_groups(self, residue_groups: list[ResidueGroup]) -> None:
+        self._inherited = []
+        self._resolved = None
+        self._residue_groups = [self._to_uids(chain_ids, res_indices) for chain_ids, res_indices in residue_groups]
+
+    def _to_uids(self, chain_ids: npt.NDArray[np.str_], res_indices: npt.NDArray[np.int_]) -> ResidueGroup:
+        """Replaces the indexes of the residues of bound chains by their stable IDs."""
+        uids = res_indices
+        for chain_ID, chain in self._chains.items():
+            on_chain = chain_ids == chain_ID
+            if np.any(on_chain):
+                uids = np.array(uids, copy=True) if uids is res_indices else uids
+                uids[on_chain] = chain.residue_uids[res_indices[on_chain]]
+        return (chain_ids, uids)
+
+    def _resolve(self) -> list[ResidueGroup]:
+        """Residue groups with the current indexes of the residues of bound chains, removed residues left out."""
+        for chain_ID, uid, parent_uid in self._inherited:
+            for i, (chain_ids, uids) in enumerate(self._residue_groups):
+                if np.any((chain_ids == chain_ID) & (uids == parent_uid)):
+                    self._residue_groups[i] = (np.append(chain_ids, chain_ID), np.append(uids, uid))
+        self._inherited = []
+
+        residue_groups = []
+        for i, (chain_ids, uids) in enumerate(self._residue_groups):
+            res_indices = np.array(uids, copy=True)
+            for chain_ID, chain in self._chains.items():
+                on_chain = chain_ids == chain_ID
+                if np.any(on_chain):
+                    res_indices[on_chain] = chain.residue_positions(uids[on_chain])
+            kept = res_indices >= 0
+            if not np.all(kept):  # residues removed from their chain are forgotten
+                self._residue_groups[i] = (chain_ids[kept], uids[kept])
+            residue_groups.append((chain_ids[kept], res_indices[kept]))
+        return residue_groups
+
+    def bind(self, chains: list[Chain]) -> None:
+        """
+        Store the residues of the given chains by their stable ID from now on. Called by :class:`.State` for its
+        chains, before any residue is added or removed, as the current ``residue_groups`` must match the chains.
+        """
+        new_chains = {chain.chain_ID: chain for chain in chains if self._chains.get(chain.chain_ID) is not chain}
+        if len(new_chains) == 0:
+            return
+        residue_groups = self.residue_groups
+        for chain_ids, res_indices in residue_groups:
+            for chain_ID, chain in new_chains.items():
+                assert np.all(res_indices[chain_ids == chain_ID] < chain.length), (
+                    f'Energy term {self.name} refers to residues beyond the end of chain {chain_ID}'
+                )
+        self._chains = {**self._chains, **new_chains}
+        self.residue_groups = residue_groups
+
     def shift_residues_indices_after_removal(self, chain_id: str, res_index: int) -> None:
         """
         Shifts internally stored res_indices on a given chain to reflect a residue has been removed from the chain.
@@ -121,70 +325,81 @@ class EnergyTerm(ABC):
         shifted down by 1. Must be called every time a residue is removed from a chain.
 
         For instance, if implementing a new mutation scheme in ``mutation.py``, this method must be called every time
-        a residue is removed from a chain (see :class:`~bagel.mutation.GrandCanonical` for an example).
+        a residue is removed from a chain (see :class:`~bagel.mutation.GrandCanonical` for an example). It does nothing
+        for a chain the term is bound to, as its residues are stored by stable ID.
         """
-        for i, residue_group in enumerate(self.residue_groups):
+        if chain_id in self._chains:
+            return
+        self._resolved = None
+        for i, residue_group in enumerate(self._residue_groups):
             chain_ids, res_indices = residue_group
             shifted_mask = (chain_ids == chain_id) & (res_indices > res_index)
-            self.residue_groups[i][1][shifted_mask] -= 1
+            self._residue_groups[i][1][shifted_mask] -= 1
 
     def shift_residues_indices_before_addition(self, chain_id: str, res_index: int) -> None:
         """
         Shifts internally stored res_indices on a given chain to reflect a residue has been added.
         In practice, all residues with an index >= res_index are shifted by +1.
-        Must be called every time a residue is added.
+        Must be called every time a residue is added. It does nothing for a chain the term is bound to.
         """
-        for i, residue_group in enumerate(self.residue_groups):
+        if chain_id in self._chains:
+            return
+        self._resolved = None
+        for i, residue_group in enumerate(self._residue_groups):
             chain_ids, res_indices = residue_group
             shifted_mask = (chain_ids == chain_id) & (res_indices >= res_index)
-            self.residue_groups[i][1][shifted_mask] += 1
+            self._residue_groups[i][1][shifted_mask] += 1
 
     def remove_residue(self, chain_id: str, res_index: int) -> None:
         """
         Remove residue from this energy term's calculations.
         Helper function called by the state.remove_residue_from_all_energy_terms function.
+        For a chain the term is bound to, the residue must already be removed from the chain, and it is then left out
+        of ``residue_groups`` without any work here.
         """
-        for i, residue_group in enumerate(self.residue_groups):
+        if chain_id in self._chains:
+            return
+        self._resolved = None
+        for i, residue_group in enumerate(self._residue_groups):
             chain_ids, res_indices = residue_group
             remove_mask = (chain_ids == chain_id) & (res_indices == res_index)
-            self.residue_groups[i] = [chain_ids[~remove_mask], res_indices[~remove_mask]]  # type: ignore[call-overload]
+            self._residue_groups[i] = (chain_ids[~remove_mask], res_indices[~remove_mask])
 
     def add_residue(self, chain_id: str, res_index: int, parent_res_index: int) -> None:
         """
         Adds residue to this energy term's calculations, in the same group as its parent residue.
         Helper function called by the state.add_residue_from_all_energy_terms function.
+        For a chain the term is bound to, the residue must already be added to the chain. The new residue is only
+        recorded here, and added to the groups of its parent the next time ``residue_groups`` is read.
         """
-        for i, residue_group in enumerate(self.residue_groups):
+        if chain_id in self._chains:
+            chain = self._chains[chain_id]
+            self._inherited.append((chain_id, chain.residue_uid(res_index), chain.residue_uid(parent_res_index)))
+            self._resolved = None
+            return
+        self._resolved = None
+        for i, residue_group in enumerate(self._residue_groups):
             chain_ids, res_indices = residue_group
             if any((chain_ids == chain_id) & (res_indices == parent_res_index)):
-                self.residue_groups[i] = [np.append(chain_ids, chain_id), np.append(res_indices, res_index)]  # type: ignore[call-overload]
-
-    def get_residue_mask(self, structure: AtomArray, residue_group_index: int) -> npt.NDArray[np.bool_]:
-        """Creates residue mask from residue group. Structure used to find unique residues in state"""
-        residue_group = self.residue_groups[residue_group_index]
-        chain_ids, res_indices = residue_group
-        residue_mask = np.array([], dtype=bool)
-        for chain in pd.unique(structure.chain_id):  # preserves order of chains as fed to input (important)
-            # Note: in an atom_array object like structure .res_id is what we call the residue index and is an integer
-            chain_res_ids = pd.unique(structure.res_id[structure.chain_id == chain])  # preserves order of residues
-            residue_mask = np.append(residue_mask, np.isin(chain_res_ids, res_indices[chain_ids == chain]))
-        return residue_mask
-
-    def get_atom_mask(self, structure: AtomArray, residue_group_index: int) -> npt.NDArray[np.bool_]:
-        """Creates atom mask from residue group. Structure used to find unique atoms in state"""
-        residue_group = self.residue_groups[residue_group_index]
-        chain_ids, res_indices = residue_group
-        atom_mask = np.full(shape=len(structure), fill_value=False)
-        for chain in np.unique(chain_ids):
-            chain_mask = structure.chain_id == chain  # gets all atoms from a given chain
-
-            # Note: in an atom_array object like structure .res_id is what we call the residue index and is an integer
-            chain_res_ids = structure[chain_mask].res_id  # gets all residues indices from a given chain
-            chain_res_ids_in_group = res_indices[chain_ids == chain]  # gets all residue indices in the residue group
-
-            # for that specific chain, check if the residue indices are in the residue group
-            atom_mask[chain_mask] = np.isin(chain_res_ids, chain_res_ids_in_group)
-        return atom_mask
+                self._residue_groups[i] = (np.append(chain_ids, chain_id), np.append(res_indices, res_index))
+
+    def get_residue_mask(
+        self, structure: AtomArray | StructureIndex, residue_group_index: int
+    ) -> npt.NDArray[np.bool_]:
+        """
+        Creates residue mask from residue group. Structure used to find unique residues in state, in the order of chains
+        as fed to input (important). Passing the index of the structure (see
+        :meth:`.OraclesResultDict.get_structure_index`) rather than the structure avoids indexing it again.
+        """
+        index = structure if isinstance(structure, StructureIndex) else StructureIndex(structure)
+        chain_ids, res_indices = self.residue_groups[residue_group_index]
+        return index.residue_mask(chain_ids, res_indices)
+
+    def get_atom_mask(self, structure: AtomArray | StructureIndex, residue_group_index: int) -> npt.NDArray[np.bool_]:
+        """Creates atom mask from residue group. Structure (or its index) used to find unique atoms in state"""
+        index = structure if isinstance(structure, StructureIndex) else StructureIndex(structure)
+        chain_ids, res_indices = self.residue_groups[residue_group_index]
+        return index.atom_mask(chain_ids, res_indices)
 
 
 class PTMEnergy(EnergyTerm):
@@ -222,8 +437,8 @@ class PTMEnergy(EnergyTerm):
     def compute(self, oracles_result: OraclesResultDict) -> tuple[float, float]:
         folding_result = oracles_result[self.oracle]
         assert hasattr(folding_result, 'ptm'), 'PTM metric not returned by folding algorithm'
-        value = -folding_result.ptm
-        return value, value * self.weight
+        value = -at_least_float32(folding_result.ptm)
+        return value, value * self.weight  # type: ignore[return-value]
 
 
 class ChemicalPotentialEnergy(EnergyTerm):
@@ -348,10 +563,10 @@ class PLDDTEnergy(EnergyTerm):
         folding_result = oracles_result[self.oracle]
         assert hasattr(folding_result, 'local_plddt'), 'local_plddt metric not returned by folding algorithm'
         assert folding_result.local_plddt.shape[0] == 1, 'batch size equal to 1 is required'
-        plddt = folding_result.local_plddt[0]  # [n_residues] array
+        plddt = at_least_float32(folding_result.local_plddt[0])  # [n_residues] array
         assert hasattr(folding_result, 'structure'), 'structure not returned by folding algorithm'
         if len(self.residue_groups) != 0:
-            mask = self.get_residue_mask(folding_result.structure, residue_group_index=0)
+            mask = self.get_residue_mask(oracles_result.get_structure_index(self.oracle), residue_group_index=0)
         else:  # if no residues are selected, consider all atoms
             n_residues = sum([c.length for c in folding_result.input_chains])
             mask = np.full(shape=n_residues, fill_value=True)
@@ -397,6 +612,7 @@ class SurfaceAreaEnergy(EnergyTerm):
         residues: list[Residue] | None = None,
         probe_radius: float | None = None,
         max_sasa: float | None = None,
+        point_number: int = 1000,
         weight: float = 1.0,
         name: str | None = None,
     ) -> None:
@@ -416,6 +632,11 @@ class SurfaceAreaEnergy(EnergyTerm):
             The VdW-radius of the solvent molecules used in the SASA calculation. Default is the water VdW-radius.
         max_sasa: float or None, default=None
             The maximum SASA value used if normalization is enabled. Default is the full surface area of a Sulfur atom.
+        point_number: int, default=1000
+            Number of points on the sphere of each atom in the SASA calculation, see :func:`structure_sasa`. Lower it
+            (e.g. to 100) to trade accuracy for speed, the attribute can be changed between phases of a simulation.
+        weight: float = 1.0
+            The weight of the energy term.
         name: str | None = None
             Optional name to append to the energy term name.
         """
@@ -432,6 +653,7 @@ class SurfaceAreaEnergy(EnergyTerm):
         self.residue_groups = [residue_list_to_group(residues)] if residues is not None else []
         self.probe_radius = probe_radius_water if probe_radius is None else probe_radius
         self.max_sasa = max_sasa_values['S'] if max_sasa is None else max_sasa
+        self.point_number = point_number
         assert isinstance(self.oracle, FoldingOracle), 'Oracle must be an instance of FoldingOracle'
         assert 'structure' in self.oracle.result_class.model_fields, (
             'SurfaceAreaEnergy requires oracle to return structure in result_class'
@@ -439,12 +661,14 @@ class SurfaceAreaEnergy(EnergyTerm):
 
     def compute(self, oracles_result: OraclesResultDict) -> tuple[float, float]:
         structure = oracles_result.get_structure(self.oracle)
+        index = oracles_result.get_structure_index(self.oracle)
         if len(self.residue_groups) != 0:
-            atom_mask: npt.NDArray[np.bool_] = self.get_atom_mask(structure, residue_group_index=0)
+            atom_mask: npt.NDArray[np.bool_] = self.get_atom_mask(index, residue_group_index=0)
         else:
             atom_mask = np.full(shape=len(structure), fill_value=True)
 
-        sasa_values = sasa(structure, probe_radius=self.probe_radius)
+        # SASA is only computed for the selected atoms, all atoms being occluders
+        sasa_values = structure_sasa(oracles_result, self.oracle, self.probe_radius, atom_mask, self.point_number)
         value = np.mean(sasa_values[atom_mask]) / self.max_sasa
         return value, value * self.weight
 
@@ -463,6 +687,7 @@ class HydrophobicEnergy(EnergyTerm):
         mode: Literal['surface', 'core', 'all'] = 'all',
         surface_only: bool = False,
         core_only: bool = False,
+        point_number: int = 1000,
         weight: float = 1.0,
         name: str | None = None,
     ) -> None:
@@ -488,6 +713,9 @@ class HydrophobicEnergy(EnergyTerm):
             Deprecated. Use `mode='surface'` instead.
         core_only: bool, default=False
             Deprecated. Use `mode='core'` instead.
+        point_number: int, default=1000
+            Number of points on the sphere of each atom in the SASA calculation of the 'surface' and 'core' modes, see
+            :func:`structure_sasa`.
         weight: float = 1.0
             The weight of the energy term.
         name: str | None = None
@@ -515,6 +743,7 @@ class HydrophobicEnergy(EnergyTerm):
             )
             mode = 'surface' if surface_only else 'core'
         self.mode: Literal['surface', 'core', 'all'] = mode
+        self.point_number = point_number
         assert isinstance(self.oracle, FoldingOracle), 'Oracle must be an instance of FoldingOracle'
         assert 'structure' in self.oracle.result_class.model_fields, (
             'HydrophobicEnergy requires oracle to return structure in result_class'
@@ -522,21 +751,25 @@ class HydrophobicEnergy(EnergyTerm):
 
     def compute(self, oracles_result: OraclesResultDict) -> tuple[float, float]:
         structure = oracles_result.get_structure(self.oracle)
+        index = oracles_result.get_structure_index(self.oracle)
         if len(self.residue_groups) > 0:
-            relevance_mask: npt.NDArray[np.bool_] = self.get_atom_mask(structure, residue_group_index=0)
+            relevance_mask: npt.NDArray[np.bool_] = self.get_atom_mask(index, residue_group_index=0)
         else:
             relevance_mask = np.full(shape=len(structure), fill_value=True)
 
         hydrophobic_mask = np.isin(structure.res_name, hydrophobic_residues)
 
-        value = len(structure[relevance_mask & hydrophobic_mask]) / len(structure[relevance_mask])
+        selected_mask = relevance_mask & hydrophobic_mask
+        value = np.count_nonzero(selected_mask) / np.count_nonzero(relevance_mask)
 
-        if self.mode == 'surface':
-            normalized_sasa = sasa(structure, probe_radius=probe_radius_water) / max_sasa_values['S']
-            value *= np.mean(normalized_sasa[relevance_mask & hydrophobic_mask])
-        elif self.mode == 'core':
-            normalized_sasa = 1.0 - sasa(structure, probe_radius=probe_radius_water) / max_sasa_values['S']
-            value *= np.mean(normalized_sasa[relevance_mask & hydrophobic_mask])
+        if self.mode != 'all':  # SASA is only computed for the selected atoms, all atoms being occluders
+            sasa_values = structure_sasa(
+                oracles_result, self.oracle, probe_radius_water, selected_mask, point_number=self.point_number
+            )
+            normalized_sasa = sasa_values[selected_mask] / max_sasa_values['S']
+            if self.mode == 'core':
+                normalized_sasa = 1.0 - normalized_sasa
+            value = float(value * np.mean(normalized_sasa))  # in the precision of the SASA, as computed by biotite
 
         return value, value * self.weight
 
@@ -547,6 +780,8 @@ class PAEEnergy(EnergyTerm):
     is measured by calculating the average normalised predicted alignment error of all the relevant residue pairs.
     """
 
+    reads_pae = True
+
     def __init__(
         self,
         oracle: FoldingOracle,
@@ -594,14 +829,16 @@ class PAEEnergy(EnergyTerm):
 
     def compute(self, oracles_result: OraclesResultDict) -> tuple[float, float]:
         folding_result = oracles_result[self.oracle]
-        structure = oracles_result.get_structure(self.oracle)
+        index = oracles_result.get_structure_index(self.oracle)
         assert hasattr(folding_result, 'pae'), 'pae metric not returned by folding algorithm'
-        assert folding_result.pae.shape[0] == 1, 'batch size equal to 1 is required'
-        pae = folding_result.pae[0]  # [n_residues, n_residues] pairwise predicted alignment error matrix
         max_pae = 30  # approximate max. Sometimes pae can be higher
 
-        group_1_mask = self.get_residue_mask(structure, residue_group_index=0)
-        group_2_mask = self.get_residue_mask(structure, residue_group_index=1)
+        group_1_mask = self.get_residue_mask(index, residue_group_index=0)
+        group_2_mask = self.get_residue_mask(index, residue_group_index=1)
+        # only the block of the predicted alignment error matrix between residues of the groups is read
+        residues = np.flatnonzero(group_1_mask | group_2_mask)
+        pae = pae_block(folding_result, residues)
+        group_1_mask, group_2_mask = group_1_mask[residues], group_2_mask[residues]
         pae_mask = np.full(shape=pae.shape, fill_value=False)
 
         if self.cross_term_only:  # only PAEs between an atom in group 1 and an atom in group 2
@@ -623,6 +860,8 @@ class LISEnergy(EnergyTerm):
     Energy representing the Local Interaction Score [], a function of the PAE matrix.
     """
 
+    reads_pae = True
+
     def __init__(
         self,
         oracle: FoldingOracle,
@@ -674,13 +913,15 @@ class LISEnergy(EnergyTerm):
 
     def compute(self, oracles_result: OraclesResultDict) -> tuple[float, float]:
         folding_result = oracles_result[self.oracle]
-        structure = oracles_result.get_structure(self.oracle)
+        index = oracles_result.get_structure_index(self.oracle)
         assert hasattr(folding_result, 'pae'), 'pae metric not returned by folding algorithm'
-        assert folding_result.pae.shape[0] == 1, 'batch size equal to 1 is required'
-        pae = folding_result.pae[0]  # [n_residues, n_residues] pairwise predicted alignment error matrix
 
-        group_1_mask = self.get_residue_mask(structure, residue_group_index=0)
-        group_2_mask = self.get_residue_mask(structure, residue_group_index=1)
+        group_1_mask = self.get_residue_mask(index, residue_group_index=0)
+        group_2_mask = self.get_residue_mask(index, residue_group_index=1)
+        # only the block of the predicted alignment error matrix between residues of the groups is read
+        residues = np.flatnonzero(group_1_mask | group_2_mask)
+        pae = pae_block(folding_result, residues)
+        group_1_mask, group_2_mask = group_1_mask[residues], group_2_mask[residues]
         pae_mask = np.full(shape=pae.shape, fill_value=False)
 
         pae_mask[group_1_mask[:, np.newaxis] & group_2_mask[np.newaxis, :]] = True
@@ -766,12 +1007,13 @@ class RingSymmetryEnergy(EnergyTerm):
 
     def compute(self, oracles_result: OraclesResultDict) -> tuple[float, float]:
         structure = oracles_result.get_structure(self.oracle)
+        index = oracles_result.get_structure_index(self.oracle)
         num_groups = len(self.residue_groups)
         centroids = np.zeros(shape=(num_groups, 3))
-        backbone_mask = np.isin(structure.atom_name, backbone_atoms)
+        backbone_mask = structure_backbone_mask(oracles_result, self.oracle)
 
         for i in range(num_groups):
-            symmetry_group_mask = self.get_atom_mask(structure, residue_group_index=i)
+            symmetry_group_mask = self.get_atom_mask(index, residue_group_index=i)
             centroids[i] = np.mean(structure[symmetry_group_mask & backbone_mask].coord, axis=0)
         if self.direct_neighbours_only:
             neighbour_displacements = centroids - np.roll(centroids, shift=1, axis=0)
@@ -838,9 +1080,10 @@ class SeparationEnergy(EnergyTerm):
 
     def compute(self, oracles_result: OraclesResultDict) -> tuple[float, float]:
         structure = oracles_result.get_structure(self.oracle)
-        backbone_mask = np.isin(structure.atom_name, backbone_atoms)
-        group_1_mask = self.get_atom_mask(structure, residue_group_index=0)
-        group_2_mask = self.get_atom_mask(structure, residue_group_index=1)
+        index = oracles_result.get_structure_index(self.oracle)
+        backbone_mask = structure_backbone_mask(oracles_result, self.oracle)
+        group_1_mask = self.get_atom_mask(index, residue_group_index=0)
+        group_2_mask = self.get_atom_mask(index, residue_group_index=1)
 
         group_1_atoms = structure[backbone_mask & group_1_mask]
         group_2_atoms = structure[backbone_mask & group_2_mask]
@@ -923,6 +1166,7 @@ class FlexEvoBindEnergy(EnergyTerm):
 
     def compute(self, oracles_result: OraclesResultDict) -> tuple[float, float]:
         structure = oracles_result.get_structure(self.oracle)
+        index = oracles_result.get_structure_index(self.oracle)
 
         if self.symmetrized:
             indices = [0, 1]
@@ -935,36 +1179,28 @@ class FlexEvoBindEnergy(EnergyTerm):
         for main in indices:
             # Get the mask for all the atoms belonging to any residue in group 2
             partner = 1 if main == 0 else 0
-            partner_mask = self.get_atom_mask(structure, residue_group_index=partner)
-            partner_atoms = structure[partner_mask]
-            if len(partner_atoms) == 0:
+            partner_mask = self.get_atom_mask(index, residue_group_index=partner)
+            partner_coord = structure.coord[partner_mask]
+            if len(partner_coord) == 0:
                 # Nothing to compare against for this direction
                 continue
 
-            # Get the chain_ids and res_ids for the residues in the first group
+            # Get the rows in the structure of the residues in the first group (residues not in the structure skipped)
             chain_ids, res_ids = self.residue_groups[main]
-            
-            min_distances = []  # List to store the minimum distances for each residue in the main group
-
-            # Now iterate over each residue in the first group
-            for chain_id, res_id in zip(chain_ids, res_ids):
-                # Extract from the structure the atoms corresponding to the residues with current chain_id and res_id
-                curr_residue_mask = (structure.chain_id == chain_id) & (structure.res_id == res_id)
-
-                # Get the atoms corresponding to the current residue            
-                curr_residue_atoms = structure[curr_residue_mask]
-                if len(curr_residue_atoms) == 0:
-                    continue
-                # Vectorized min distance between atoms of current residue and all partner atoms
-                diff = partner_atoms.coord[np.newaxis, :, :] - curr_residue_atoms.coord[:, np.newaxis, :]
-                dist_mat = np.linalg.norm(diff, axis=2)
-                min_dist = float(np.min(dist_mat))
-                min_distances.append(min_dist) # Store the minimum distance for this residue
-
-            # Calculate the average of these minimum distances
-            if len(min_distances) == 0:
+            rows = index.residue_rows(chain_ids, res_ids)
+            if len(rows) == 0:
                 # No valid atoms for any residue in this direction; skip contribution
                 continue
+
+            # Distance from every atom of the residues of the first group to the nearest partner atom, then the
+            # minimum over the atoms of each residue, whose atoms are contiguous in atoms (offsets in residue_offsets)
+            atoms = index.atom_indexes(rows)
+            n_atoms = index.residue_starts[rows + 1] - index.residue_starts[rows]
+            residue_offsets = np.cumsum(n_atoms) - n_atoms
+            atom_distances = nearest_distances(structure.coord[atoms], partner_coord)
+            min_distances = np.minimum.reduceat(atom_distances, residue_offsets).astype(np.float64)
+
+            # Calculate the average of these minimum distances
             average_min_distance = float(np.mean(min_distances))
             value = average_min_distance
             
@@ -975,9 +1211,9 @@ class FlexEvoBindEnergy(EnergyTerm):
                 folding_result = oracles_result[self.oracle]
                 assert hasattr(folding_result, 'local_plddt'), 'local_plddt metric not returned by folding algorithm'
                 assert folding_result.local_plddt.shape[0] == 1, 'batch size equal to 1 is required'
-                plddt = folding_result.local_plddt[0]
+                plddt = at_least_float32(folding_result.local_plddt[0])
                 assert hasattr(folding_result, 'structure'), 'structure not returned by folding algorithm'
-                main_mask = self.get_residue_mask(structure, residue_group_index=main)
+                main_mask = self.get_residue_mask(index, residue_group_index=main)
 
                 mask_count = int(np.count_nonzero(main_mask))
                 if mask_count > 0:
@@ -1048,9 +1284,10 @@ class GlobularEnergy(EnergyTerm):
 
     def compute(self, oracles_result: OraclesResultDict) -> tuple[float, float]:
         structure = oracles_result.get_structure(self.oracle)
-        backbone_mask = np.isin(structure.atom_name, backbone_atoms)
+        index = oracles_result.get_structure_index(self.oracle)
+        backbone_mask = structure_backbone_mask(oracles_result, self.oracle)
         if len(self.residue_groups) > 0:
-            selected_mask = self.get_atom_mask(structure, residue_group_index=0)
+            selected_mask = self.get_atom_mask(index, residue_group_index=0)
         else:
             selected_mask = np.full(shape=len(structure), fill_value=True)
 
@@ -1119,7 +1356,8 @@ class TemplateMatchEnergy(EnergyTerm):
 
     def compute(self, oracles_result: OraclesResultDict) -> tuple[float, float]:
         structure = oracles_result.get_structure(self.oracle)
-        structure_atoms = structure[self.get_atom_mask(structure, residue_group_index=0)]
+        index = oracles_result.get_structure_index(self.oracle)
+        structure_atoms = structure[self.get_atom_mask(index, residue_group_index=0)]
         template_atoms = reorder_atoms_in_template(self.template_atoms)
         if self.backbone_only:
             structure_atoms = structure_atoms[np.isin(structure_atoms.atom_name, backbone_atoms)]
@@ -1197,10 +1435,10 @@ class SecondaryStructureEnergy(EnergyTerm):
         )
 
     def compute(self, oracles_result: OraclesResultDict) -> tuple[float, float]:
-        structure = oracles_result.get_structure(self.oracle)
+        index = oracles_result.get_structure_index(self.oracle)
         target_label = self.target_secondary_structure[0]  # How Biotite labels secondary structures
-        calculated_labels = annotate_sse(structure)
-        selection_mask = self.get_residue_mask(structure, residue_group_index=0)
+        calculated_labels = structure_sse(oracles_result, self.oracle)
+        selection_mask = self.get_residue_mask(index, residue_group_index=0)
 
         value = np.mean(calculated_labels[selection_mask] != target_label)
         return value, value * self.weight
@@ -1259,7 +1497,7 @@ class EmbeddingsSimilarityEnergy(EnergyTerm):
         )
 
     def compute(self, oracles_result: OraclesResultDict) -> tuple[float, float]:
-        embeddings = oracles_result.get_embeddings(self.oracle)
+        embeddings = at_least_float32(oracles_result.get_embeddings(self.oracle))
         chains = oracles_result[self.oracle].input_chains
         assert isinstance(embeddings, np.ndarray), (
             f'Embeddings is expected to be a numpy array, not type: {type(embeddings)}'
@@ -7,8 +7,9 @@ Copyright (c) 2025 Jakub Lála, Ayham Al-Saffar, Stefano Angioletti-Uberti
 """
 
 import pathlib as pl
-from .system import System
+from .system import System, SystemSnapshot
 from .mutation import MutationProtocol
+from .oracles import Oracle, OracleRuntime
 from abc import ABC, abstractmethod
 from typing import Callable, Any
 import numpy as np
@@ -70,13 +71,15 @@ class Minimizer(ABC):
             row = [step] + list(kwargs.values())
             writer.writerow(row)
 
-    def log_initial_system(self, system: System, best_system: System) -> None:
+    def log_initial_system(self, system: System, best_system: System | SystemSnapshot) -> None:
         """Logs initial system state."""
         assert isinstance(self.log_path, pl.Path), f'log_path must be a Path, not {type(self.log_path)}'
         system.dump_config(self.log_path)
         self.log_step(-1, system, best_system, False)
 
-    def log_step(self, step: int, system: System, best_system: System, new_best: bool, **kwargs: Any) -> None:
+    def log_step(
+        self, step: int, system: System, best_system: System | SystemSnapshot, new_best: bool, **kwargs: Any
+    ) -> None:
         """Logs step information."""
         real_step = step + 1
         logger.info(f'Step={real_step} - ' + ' - '.join(f'{k}={v}' for k, v in kwargs.items()))
@@ -86,6 +89,43 @@ class Minimizer(ABC):
         system.dump_logs(real_step, self.log_path / 'current', save_structure=real_step % self.log_frequency == 0)
         best_system.dump_logs(real_step, self.log_path / 'best', save_structure=new_best)
 
+    def log_oracle_caches(self, system: System) -> None:
+        """Logs the usage of the oracle caches shared by the states of the system, if any."""
+        caches = {
+            id(state.oracle_cache): state.oracle_cache for state in system.states if state.oracle_cache is not None
+        }
+        for cache in caches.values():
+            logger.info('Oracle cache - ' + ' - '.join(f'{k}={v}' for k, v in cache.stats().items()))
+
+    def oracles_by_name(self, system: System) -> dict[str, Oracle]:
+        """Unique oracles used by the energy terms of the system, named after their class (and an index if needed)."""
+        oracles: dict[str, Oracle] = {}
+        for state in system.states:
+            for term in state.energy_terms:
+                if any(term.oracle is oracle for oracle in oracles.values()):
+                    continue
+                name = type(term.oracle).__name__
+                if name in oracles:
+                    name = f'{name}_{sum(key.startswith(name) for key in oracles)}'
+                oracles[name] = term.oracle
+        return oracles
+
+    def oracle_metrics_columns(self, oracles: dict[str, Oracle]) -> dict[str, float]:
+        """Totals of the metrics of each oracle since the previous call, as '<oracle>:<metric>' columns."""
+        columns: dict[str, float] = {}
+        for name, oracle in oracles.items():
+            if oracle.metrics is not None:
+                columns.update({f'{name}:{key}': value for key, value in oracle.metrics.step_summary().items()})
+        return columns
+
+    def log_oracle_metrics_summary(self, oracles: dict[str, Oracle]) -> None:
+        """Logs a summary of the calls made to each oracle that records metrics."""
+        for name, oracle in oracles.items():
+            if oracle.metrics is not None:
+                logger.info(
+                    f'{name} metrics - ' + ' - '.join(f'{k}={v:.4g}' for k, v in oracle.metrics.summary().items())
+                )
+
     @abstractmethod
     def minimize_system(self, system: System) -> System:
         """
@@ -117,6 +157,10 @@ class MonteCarloMinimizer(Minimizer):
         log_frequency: int = 100,
         preserve_best_system_every_n_steps: int | None = None,
         log_path: pl.Path | str | None = None,
+        n_workers: int | None = None,
+        log_oracle_metrics: bool = False,
+        use_move_journal: bool = False,
+        n_proposals: int = 1,
     ) -> None:
         if experiment_name is None:
             experiment_name = f'mc_minimizer_{time_stamp()}'
@@ -136,6 +180,15 @@ class MonteCarloMinimizer(Minimizer):
 
         self.n_steps = n_steps
         self.preserve_best_system_every_n_steps = preserve_best_system_every_n_steps
+        self.n_workers = n_workers  # if set, overrides the number of threads the system evaluates its states with
+        self.oracle_metrics = log_oracle_metrics  # whether to add the per-step metrics of the oracles to the log
+        # whether to mutate the system in place and undo rejected moves, rather than mutating a copy of it
+        self.use_move_journal = use_move_journal
+        # number of proposals made from the same system and folded together, see :meth:`minimize_one_step`
+        assert n_proposals >= 1, f'n_proposals must be at least 1, not {n_proposals}'
+        assert n_proposals == 1 or not use_move_journal, 'Several proposals per step need a copy of the system each'
+        self.n_proposals = n_proposals
+        self.n_trials = 0  # number of proposals accepted or rejected by the last step
         self.acceptance_criterion = self._get_acceptance_criterion(acceptance_criterion)
         super().__init__(
             mutator=mutator, experiment_name=experiment_name, log_frequency=log_frequency, log_path=log_path
@@ -165,18 +218,52 @@ class MonteCarloMinimizer(Minimizer):
         """Hook called before each Monte Carlo step."""
         return system
 
-    def _after_step(self, system: System, best_system: System, step: int) -> System:
+    def _after_step(self, system: System, best_system: SystemSnapshot, step: int) -> System:
         """Hook called after each Monte Carlo step."""
         if self.preserve_best_system_every_n_steps is not None:
             if (step + 1) % self.preserve_best_system_every_n_steps == 0:
                 logger.debug(f'Starting new cycle with best system from previous cycle')
-                return best_system.__copy__()
+                return best_system.to_system(template=system)
         return system
 
     def minimize_one_step(self, step: int, system: System) -> tuple[System, bool]:
-        """Perform one Monte Carlo step."""
+        """
+        Perform one Monte Carlo step.
+
+        If ``n_proposals`` is larger than 1, that many proposals are made from the current system and their energies
+        are calculated together, with one batched call per oracle (see :meth:`.System.get_total_energies`). They are
+        then accepted or rejected one after another, and the first one accepted is returned. As every proposal
+        considered is made from the system it is compared to, this is the same as up to ``n_proposals`` Monte Carlo
+        steps at the same temperature, except that the proposals after the first accepted one are discarded. A run of
+        ``n_steps`` steps therefore makes up to ``n_proposals * n_steps`` Monte Carlo moves, each entry of the
+        temperature schedule being used for all the moves of a step. The number of moves made by each step is logged
+        in the 'trials' column.
+        """
+        if self.n_proposals > 1:
+            proposals = []
+            for _ in range(self.n_proposals):
+                proposal = system.proposal_copy()
+                self.mutator.reset_system(system=proposal, mutated_chains=self.mutator.apply_moves(proposal))
+                proposals.append(proposal)
+            old_energy = system.get_total_energy()
+            for self.n_trials, (proposal, energy) in enumerate(zip(proposals, System.get_total_energies(proposals)), 1):
+                acceptance_probability = self.acceptance_criterion(energy - old_energy, self.temperature_schedule[step])
+                logger.debug(f'delta_energy={energy - old_energy}, {acceptance_probability=}')
+                if acceptance_probability > np.random.uniform(low=0.0, high=1.0):
+                    return proposal, True
+            return system, False
+
+        if self.use_move_journal:
+            delta_energy, journal = self.mutator.one_step_in_place(system)
+            acceptance_probability = self.acceptance_criterion(delta_energy, self.temperature_schedule[step])
+            logger.debug(f'{delta_energy=}, {acceptance_probability=}')
+            accept = bool(acceptance_probability > np.random.uniform(low=0.0, high=1.0))
+            if not accept:
+                journal.undo()
+            return system, accept
+
         mutated_system, delta_energy = self.mutator.one_step(
-            system=system.__copy__(),
+            system=system.proposal_copy(),
             old_system=system,
         )
         acceptance_probability = self.acceptance_criterion(delta_energy, self.temperature_schedule[step])
@@ -188,12 +275,23 @@ class MonteCarloMinimizer(Minimizer):
 
     def minimize_system(self, system: System) -> System:
         """Minimize system using Monte Carlo method."""
+        if self.use_move_journal or self.n_workers is not None:
+            # the steps mutate the system in place, or its number of workers is overridden: leave that of the caller
+            # untouched
+            system = system.__copy__()
+        if self.n_workers is not None:
+            system.n_workers = self.n_workers  # inherited by all copies of the system
+        oracles = self.oracles_by_name(system)
+        OracleRuntime(oracles.values()).warmup()  # models not loaded yet are loaded in parallel, not one after another
+        if not self.oracle_metrics:
+            oracles = {}
+        for oracle in oracles.values():
+            oracle.enable_metrics()
         system.get_total_energy()  # update the energy internally
-        best_system = system.__copy__()
+        self.oracle_metrics_columns(oracles)  # only count the calls made during the steps
         assert system.total_energy is not None, 'Cannot start without system having a calculated energy'
-        assert best_system.total_energy is not None, (
-            'Cannot start without lowest energy system having a calculated energy'
-        )
+        # the best system is only recorded (sequences, energies, shared oracle results), and rebuilt when returned
+        best_system = system.snapshot()
 
         self.log_initial_system(system, best_system)
 
@@ -207,14 +305,22 @@ class MonteCarloMinimizer(Minimizer):
 
             if system.total_energy < best_system.total_energy:
                 new_best = True
-                best_system = system.__copy__()
+                best_system = system.snapshot()
 
             self.log_step(
-                step, system, best_system, new_best, temperature=self.temperature_schedule[step], accept=accept
+                step,
+                system,
+                best_system,
+                new_best,
+                temperature=self.temperature_schedule[step],
+                accept=accept,
+                **({'trials': self.n_trials} if self.n_proposals > 1 else {}),
+                **self.oracle_metrics_columns(oracles),
             )
 
-        assert best_system.total_energy is not None, f'Best energy {best_system.total_energy} cannot be None!'
-        return best_system
+        self.log_oracle_caches(system)
+        self.log_oracle_metrics_summary(oracles)
+        return best_system.to_system(template=system)
 
 
 class SimulatedAnnealing(MonteCarloMinimizer):
@@ -231,6 +337,10 @@ class SimulatedAnnealing(MonteCarloMinimizer):
         log_frequency: int = 100,
         preserve_best_system_every_n_steps: int | None = None,
         log_path: pl.Path | str | None = None,
+        n_workers: int | None = None,
+        log_oracle_metrics: bool = False,
+        use_move_journal: bool = False,
+        n_proposals: int = 1,
     ) -> None:
         if experiment_name is None:
             experiment_name = f'simulated_annealing_{time_stamp()}'
@@ -243,6 +353,10 @@ class SimulatedAnnealing(MonteCarloMinimizer):
             log_frequency=log_frequency,
             preserve_best_system_every_n_steps=preserve_best_system_every_n_steps,
             log_path=log_path,
+            n_workers=n_workers,
+            log_oracle_metrics=log_oracle_metrics,
+            use_move_journal=use_move_journal,
+            n_proposals=n_proposals,
         )
 
         self.initial_temperature = initial_temperature
@@ -268,6 +382,10 @@ class SimulatedTempering(MonteCarloMinimizer):
         log_frequency: int = 100,
         preserve_best_system_every_n_steps: int | None = None,
         log_path: pl.Path | str | None = None,
+        n_workers: int | None = None,
+        log_oracle_metrics: bool = False,
+        use_move_journal: bool = False,
+        n_proposals: int = 1,
     ) -> None:
         if experiment_name is None:
             experiment_name = f'simulated_tempering_{time_stamp()}'
@@ -281,6 +399,10 @@ class SimulatedTempering(MonteCarloMinimizer):
             log_frequency=log_frequency,
             preserve_best_system_every_n_steps=preserve_best_system_every_n_steps,
             log_path=log_path,
+            n_workers=n_workers,
+            log_oracle_metrics=log_oracle_metrics,
+            use_move_journal=use_move_journal,
+            n_proposals=n_proposals,
         )
 
         self.high_temperature = high_temperature
@@ -11,9 +11,10 @@ import numpy as np
 # from .folding import FoldingAlgorithm
 from .chain import Chain
 from .system import System
+from .energies import EnergyTerm
 from .constants import mutation_bias_no_cystein
 from dataclasses import dataclass, field
-from typing import Dict, Tuple
+from typing import Callable, Dict, Tuple
 from abc import ABC, abstractmethod
 from .oracles.base import OraclesResultDict
 import logging
@@ -21,6 +22,87 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+class MoveJournal:
+    """
+    Record of the changes made to a System by the moves of a single Monte Carlo step, so that they can be undone.
+
+    Each change is recorded right before it is made: substitutions, additions and removals of residues in chains,
+    the residue groups of the energy terms (saved once per step, before their indices are first shifted), and the
+    energies and oracle results of the states (saved before they are reset). :meth:`undo` reverts all of them, in
+    reverse order, and gives back exactly the System as it was before the step, without ever copying it.
+    """
+
+    def __init__(self) -> None:
+        self._undo: list[Callable[[], None]] = []
+        self._saved_terms: set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self._undo)
+
+    def record_mutation(self, chain: Chain, index: int) -> None:
+        """Record the amino acid of a residue about to be substituted."""
+        name = chain.residues[index].name
+
+        def undo() -> None:
+            # by position rather than on the Residue object: if the residue is removed later in the step, undoing the
+            # removal adds a new Residue in its place, and the chain is back to the layout it had when recorded
+            chain.residues[index].name = name
+
+        self._undo.append(undo)
+
+    def record_addition(self, chain: Chain, index: int) -> None:
+        """Record that a residue is about to be added to a chain at the given index."""
+        self._undo.append(lambda: chain.remove_residue(index=index))
+
+    def record_removal(self, chain: Chain, index: int) -> None:
+        """Record a residue about to be removed from a chain."""
+        name = chain.residues[index].name
+        self._undo.append(lambda: chain.add_residue(amino_acid=name, index=index))
+
+    def record_energy_terms(self, system: System) -> None:
+        """Save the residue groups of all energy terms of the system, unless already saved during this step."""
+        for state in system.states:
+            for term in state.energy_terms:
+                if id(term) in self._saved_terms:
+                    continue
+                self._saved_terms.add(id(term))
+                self._undo.append(self._restore_residue_groups(term))
+
+    @staticmethod
+    def _restore_residue_groups(term: EnergyTerm) -> Callable[[], None]:
+        groups = [(chain_ids.copy(), res_indices.copy()) for chain_ids, res_indices in term.residue_groups]
+
+        def undo() -> None:
+            term.residue_groups = groups
+
+        return undo
+
+    def record_energies(self, system: System) -> None:
+        """Save the energies and oracle results of the system and its states, before they are reset."""
+        total_energy = system.total_energy
+        saved = [(state, state._energy, state._energy_terms_value, state._oracles_result) for state in system.states]
+
+        def undo() -> None:
+            system.total_energy = total_energy
+            for state, energy, energy_terms_value, oracles_result in saved:
+                state._energy = energy
+                state._energy_terms_value = energy_terms_value
+                state._oracles_result = oracles_result
+
+        self._undo.append(undo)
+
+    def undo(self) -> None:
+        """Revert all recorded changes, most recent first, and clear the journal."""
+        while len(self._undo) > 0:
+            self._undo.pop()()
+        self._saved_terms.clear()
+
+    def commit(self) -> None:
+        """Keep all recorded changes, and clear the journal."""
+        self._undo.clear()
+        self._saved_terms.clear()
+
+
 @dataclass
 class MutationProtocol(ABC):
     mutation_bias: Dict[str, float] = field(default_factory=lambda: mutation_bias_no_cystein)
@@ -54,36 +136,56 @@ class MutationProtocol(ABC):
         """
         pass
 
+    def apply_moves(self, system: System, journal: MoveJournal | None = None) -> list[Chain]:
+        """
+        Apply the ``n_mutations`` random moves of one step to the system, in place, and return the chains that were
+        changed. Moves are recorded in the ``journal``, if given. Required by :meth:`one_step_in_place`.
+        """
+        raise NotImplementedError(f'{type(self).__name__} does not support in-place steps')
+
+    def one_step_in_place(self, system: System) -> tuple[float, MoveJournal]:
+        """
+        Same as :meth:`one_step`, but the system is mutated in place instead of a copy of it. The returned journal
+        records every change made, so that the step can be reverted with :meth:`MoveJournal.undo` if it is rejected.
+        Random numbers are drawn in the same order as in :meth:`one_step`, so both give exactly the same trajectory.
+
+        Returns
+        -------
+        float
+            The energy difference between the mutated and original system
+        MoveJournal
+            The changes made to the system
+        """
+        old_energy = system.get_total_energy()
+        journal = MoveJournal()
+        mutated_chains = self.apply_moves(system, journal=journal)
+        journal.record_energies(system)
+        self.reset_system(system=system, mutated_chains=mutated_chains)
+        return system.get_total_energy() - old_energy, journal
+
     def choose_chain(self, system: System) -> Chain:
         """
         Choose one of the chains in the whole System that needs to be mutated. This is done by selecting a chain
         proportionally to the number of mutable aminoacid it has compared to the total number of mutable aminoacids
         available within the whole system. Because the number of mutable aminoacids can change during the simulation,
-        probability must be recalculated at each step (i.e. after each mutation).
+        probability must be recalculated at each step (i.e. after each mutation). This is cheap, as the unique chains
+        are registered by the system (see :attr:`.System.unique_chains`) and each chain caches its number of mutable
+        residues (see :attr:`.Chain.n_mutable`).
         """
-        unique_chain_list: list[Chain] = []
-        for state in system.states:
-            for chain in state.chains:
-                # Using a set ensures that each chain is only counted once
-                if chain not in unique_chain_list:
-                    unique_chain_list.append(chain)
-
-        n_total_mutables = sum([len(chain.mutable_residues) for chain in unique_chain_list])
-        probability = np.zeros(len(unique_chain_list))
-        for i, chain in enumerate(unique_chain_list):
-            n_mutables = len(chain.mutable_residues)
-            probability[i] = n_mutables / n_total_mutables
+        unique_chain_list = system.unique_chains
+        n_mutables = np.array([chain.n_mutable for chain in unique_chain_list])
+        probability = n_mutables / n_mutables.sum()
         # Step 2:
         # the chain is mutated according to the protocol chosen. Side note: a chain can be part of multiple states, and
         # mutations need to be made so that they are consistent across all states. This is taken care of by the fact
         # that the same object is used.
         return np.random.choice(unique_chain_list, p=probability)  # type: ignore
 
-    def mutate_random_residue(self, chain: Chain) -> None:
+    def mutate_random_residue(self, chain: Chain, journal: MoveJournal | None = None) -> None:
         # Choose a residue to mutate
         index = np.random.choice(chain.mutable_residue_indexes)
         # Choose a new aminoacid
-        current_aa = chain.residues[index].name
+        current_aa = chain.sequence[index]
         aa_keys = list(self.mutation_bias.keys())
         probs = np.array([self.mutation_bias[a] for a in aa_keys], dtype=float)
         if self.exclude_self:  # exclude the current amino acid from the probability distribution
@@ -97,11 +199,25 @@ class MutationProtocol(ABC):
                 )
             probs = probs / total
         amino_acid = np.random.choice(aa_keys, p=probs)
+        if journal is not None:
+            journal.record_mutation(chain, index)
         chain.mutate_residue(index=index, amino_acid=amino_acid)
 
-    def reset_system(self, system: System) -> System:
+    def reset_system(self, system: System, mutated_chains: list[Chain] | None = None) -> System:
+        """
+        Reset the energies and oracle results of the system, so that they are recalculated.
+
+        If ``mutated_chains`` is given, only the states that contain at least one of these chains (the same objects)
+        are reset, as the oracle results and energies of all the other states cannot have changed. Otherwise, all the
+        states are reset.
+        """
         system.total_energy = None
         for state in system.states:
+            if mutated_chains is not None and not any(
+                chain is mutated for chain in state.chains for mutated in mutated_chains
+            ):
+                continue
+            state._energy = None
             state._energy_terms_value = {}
             state._oracles_result = OraclesResultDict()
         return system
@@ -135,13 +251,20 @@ class Canonical(MutationProtocol):
         system: System,
         old_system: System,
     ) -> tuple[System, float]:
-        for _ in range(self.n_mutations):
-            chain = self.choose_chain(system)
-            self.mutate_random_residue(chain=chain)
-        self.reset_system(system=system)  # Reset the system so it knows it must recalculate fold and energy
+        mutated_chains = self.apply_moves(system)
+        # Reset the states containing the mutated chains so they know they must recalculate fold and energy
+        self.reset_system(system=system, mutated_chains=mutated_chains)
         delta_energy = system.get_total_energy() - old_system.get_total_energy()
         return system, delta_energy
 
+    def apply_moves(self, system: System, journal: MoveJournal | None = None) -> list[Chain]:
+        mutated_chains = []
+        for _ in range(self.n_mutations):
+            chain = self.choose_chain(system)
+            self.mutate_random_residue(chain=chain, journal=journal)
+            mutated_chains.append(chain)
+        return mutated_chains
+
 
 class GrandCanonical(MutationProtocol):
     """
@@ -185,7 +308,7 @@ class GrandCanonical(MutationProtocol):
             logger.warning('Recalculated move probabilties to ensure they sum to 1')
             logger.info(self.move_probabilities)
 
-    def remove_random_residue(self, chain: Chain, system: System) -> None:
+    def remove_random_residue(self, chain: Chain, system: System, journal: MoveJournal | None = None) -> None:
         # First of all, only try this if it does not bring chains to 0 length
         if chain.length > 1:
             # Choose a residue to remove
@@ -193,18 +316,24 @@ class GrandCanonical(MutationProtocol):
             chain_ID = chain.chain_ID
             # Sanity check
             assert chain_ID == chain.residues[index].chain_ID
+            if journal is not None:
+                journal.record_energy_terms(system)
+                journal.record_removal(chain, index)
             # Remove the residue from the chain it is part of
             chain.remove_residue(index=index)
             # Remove the residue from energy terms of all the states in the system
             for state in system.states:
                 state.remove_residue_from_all_energy_terms(chain_ID=chain_ID, residue_index=index)
 
-    def add_random_residue(self, chain: Chain, system: System) -> None:
+    def add_random_residue(self, chain: Chain, system: System, journal: MoveJournal | None = None) -> None:
         # Choose where to add the residue
         index = np.random.choice(range(chain.length + 1))
-        chain_ID = chain.residues[0].chain_ID
+        chain_ID = chain.chain_ID
         # Choose a new aminoacid
         amino_acid = np.random.choice(list(self.mutation_bias.keys()), p=list(self.mutation_bias.values()))
+        if journal is not None:
+            journal.record_energy_terms(system)
+            journal.record_addition(chain, index)
         chain.add_residue(index=index, amino_acid=amino_acid)
         # Now you need to decide which energy terms you want to associate to this residue. You do it based on its
         # neighbours. You look within the same chain and the same state and you add the residue to the same energy terms
@@ -218,8 +347,18 @@ class GrandCanonical(MutationProtocol):
         system: System,
         old_system: System,
     ) -> tuple[System, float]:
+        mutated_chains = self.apply_moves(system)
+        # Reset the states containing the mutated chains so they know they must recalculate fold and energy
+        self.reset_system(system=system, mutated_chains=mutated_chains)
+        delta_energy = system.get_total_energy() - old_system.get_total_energy()
+
+        return system, delta_energy
+
+    def apply_moves(self, system: System, journal: MoveJournal | None = None) -> list[Chain]:
+        mutated_chains = []
         for _ in range(self.n_mutations):
             chain = self.choose_chain(system)
+            mutated_chains.append(chain)
             # Now pick a move to make among removal, addition, or mutation
             assert self.move_probabilities.keys() == {'substitution', 'addition', 'removal'}, (
                 'Move probabilities must be mutation, addition and removal'
@@ -229,13 +368,9 @@ class GrandCanonical(MutationProtocol):
                 p=list(self.move_probabilities.values()),
             )
             if move == 'substitution':
-                self.mutate_random_residue(chain=chain)
+                self.mutate_random_residue(chain=chain, journal=journal)
             elif move == 'addition':
-                self.add_random_residue(chain=chain, system=system)
+                self.add_random_residue(chain=chain, system=system, journal=journal)
             elif move == 'removal':
-                self.remove_random_residue(chain=chain, system=system)
-
-        self.reset_system(system=system)  # Reset the system so it knows it must recalculate fold and energy
-        delta_energy = system.get_total_energy() - old_system.get_total_energy()
-
-        return system, delta_energy
+                self.remove_random_residue(chain=chain, system=system, journal=journal)
+        return mutated_chains
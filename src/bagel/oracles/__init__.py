@@ -1,15 +1,29 @@
 from .base import Oracle, OracleResult, OraclesResultDict
+from .cache import OracleCache
+from .metrics import OracleMetrics
+from .store import OracleResultStore
+from .runtime import OracleRuntime
+from .server import OracleServer, OracleClient, FoldingOracleClient, EmbeddingOracleClient
 from .embedding import EmbeddingOracle, ESM2, ESM2Result
-from .folding import FoldingOracle, ESMFold, ESMFoldResult
+from .folding import FoldingOracle, ESMFold, ESMFoldResult, SyntheticFoldingOracle
 
 __all__ = [
     'Oracle',
     'OracleResult',
     'OraclesResultDict',
+    'OracleCache',
+    'OracleMetrics',
+    'OracleResultStore',
+    'OracleRuntime',
+    'OracleServer',
+    'OracleClient',
+    'FoldingOracleClient',
+    'EmbeddingOracleClient',
     'ESM2',
     'ESM2Result',
     'ESMFold',
     'ESMFoldResult',
     'EmbeddingOracle',
     'FoldingOracle',
+    'SyntheticFoldingOracle',
 ]
@@ -7,15 +7,26 @@ Copyright (c) 2025 Jakub Lála, Ayham Al-Saffar, Stefano Angioletti-Uberti
 """
 
 from abc import ABC, abstractmethod
-from typing import Any, Type
+from typing import Any, Callable, ContextManager, Type, TypeVar
+from contextlib import nullcontext
+import time
+import threading
 import pathlib as pl
 import logging
-from pydantic import BaseModel
+import numpy as np
+import numpy.typing as npt
+from pydantic import BaseModel, PrivateAttr
 from ..chain import Chain
+from .metrics import OracleMetrics, payload_size
 
 
 logger = logging.getLogger(__name__)
 
+R = TypeVar('R')
+
+# dtypes in which oracles can store the floating-point arrays of their results, see Oracle.precision
+PRECISIONS: dict[str, type[np.floating[Any]]] = {'float64': np.float64, 'float32': np.float32, 'float16': np.float16}
+
 
 class OracleResult(BaseModel):
     """
@@ -23,6 +34,7 @@ class OracleResult(BaseModel):
     """
 
     input_chains: list[Chain]
+    _derived: dict[tuple[Any, ...], Any] = PrivateAttr(default_factory=dict)  # see OraclesResultDict.get_derived
 
     @abstractmethod
     def save_attributes(self, filepath: pl.Path) -> None:
@@ -35,6 +47,9 @@ class Oracle(ABC):
     """
 
     result_class: Type[OracleResult] = OracleResult  # holds class, not instance
+    metrics: OracleMetrics | None = None  # only recorded once enable_metrics() is called
+    _loaded: bool = False  # whether _load has been called, see load()
+    precision: str = 'float64'  # dtype of the floating-point arrays of the results, one of PRECISIONS
 
     def __post_init__(self) -> None:
         """Sanity check."""
@@ -58,12 +73,64 @@ class Oracle(ABC):
     def predict(self, chains: list[Chain]) -> OracleResult:
         pass
 
+    def _load(self, config: dict[str, Any] = {}) -> None:
+        """Build the model of the oracle. Oracles backed by a model override this, the default does nothing."""
+        return
+
+    def load(self) -> None:
+        """
+        Build the model of the oracle, unless already done. Oracles call this on their first prediction, so that creating
+        them is cheap, but it can also be called in advance, e.g. by :meth:`.OracleRuntime.warmup`. Thread-safe: the model
+        is only built once, and concurrent callers wait for it.
+        """
+        if self._loaded:
+            return
+        with self.__dict__.setdefault('_load_lock', threading.Lock()):
+            if not self._loaded:
+                self._load(getattr(self, 'config', {}))
+                self._loaded = True
+
+    def _cast(self, array: Any) -> npt.NDArray[Any]:
+        """
+        Floating-point array of a result in the precision of the oracle. Storing results in float32 or float16 halves
+        or quarters the memory they take (and the cost of copying them), e.g. for the PAE matrix of long multimers.
+        """
+        assert self.precision in PRECISIONS, f'precision must be one of {list(PRECISIONS)}, not {self.precision}'
+        return np.asarray(array).astype(PRECISIONS[self.precision], copy=False)
+
+    def enable_metrics(self) -> OracleMetrics:
+        """Start recording the timings and sizes of the calls to this oracle, see :class:`.OracleMetrics`."""
+        if self.metrics is None:
+            self.metrics = OracleMetrics()
+        return self.metrics
+
+    def _time(self, phase: str) -> ContextManager[Any]:
+        """Time a phase of an oracle call, if metrics are enabled."""
+        return nullcontext() if self.metrics is None else self.metrics.time(phase)
+
+    def _record_predictions(self, chains_batch: list[list[Chain]], compute: Callable[[], list[R]]) -> list[R]:
+        """Compute the predictions of a batch of chains, recording the call if metrics are enabled."""
+        if self.metrics is None:
+            return compute()
+        start = time.perf_counter()
+        results = compute()
+        self.metrics.add_time('total', time.perf_counter() - start)
+        for chains, result in zip(chains_batch, results):
+            self.metrics.record_prediction(sum(chain.length for chain in chains), payload_size(result))
+        return results
+
+    def predict_batch(self, chains_batch: list[list[Chain]]) -> list[OracleResult]:
+        """
+        Predict several independent sets of chains (e.g. the same State for different proposals), returning one result
+        per set, in the same order. By default this simply calls :meth:`predict` once per set; oracles whose backend can
+        process many inputs in one call should override it.
+        """
+        return [self.predict(chains=chains) for chains in chains_batch]
 
-from .folding import FoldingResult, FoldingOracle
+
+from .folding import FoldingResult, FoldingOracle, StructureIndex
 from .embedding import EmbeddingResult, EmbeddingOracle
 from biotite.structure import AtomArray
-import numpy as np
-import numpy.typing as npt
 
 
 class OraclesResultDict(dict[Oracle, OracleResult]):
@@ -87,6 +154,33 @@ class OraclesResultDict(dict[Oracle, OracleResult]):
         assert isinstance(result, FoldingResult), 'Result must be a FoldingResult'
         return result.structure
 
+    def get_structure_index(self, oracle: Oracle) -> StructureIndex:
+        """Index of the structure predicted by a FoldingOracle, built on first use and then kept with the result."""
+        assert isinstance(oracle, FoldingOracle), 'Oracle must be a FoldingOracle'
+        result = self[oracle]
+        assert isinstance(result, FoldingResult), 'Result must be a FoldingResult'
+        index = getattr(result, '_structure_index', None)
+        if index is None or index.structure is not result.structure:
+            index = StructureIndex(result.structure)
+            result._structure_index = index
+        return index
+
+    def get_derived(self, oracle: Oracle, quantity: str, compute: Callable[..., R], *parameters: Any) -> R:
+        """
+        Quantity derived from the result of an oracle, e.g. the SASA of its structure for a given probe radius. It is
+        computed as ``compute(*parameters)`` on first use, then kept with the result under the key
+        ``(quantity, *parameters)``, so that all the energy terms (and States) reading it share a single computation.
+        """
+        result = self[oracle]
+        derived = getattr(result, '_derived', None)
+        if derived is None:  # e.g. results mocked in tests
+            derived = {}
+            result._derived = derived
+        key = (quantity, *parameters)
+        if key not in derived:
+            derived[key] = compute(*parameters)
+        return derived[key]  # type: ignore[no-any-return]
+
     def get_embeddings(self, oracle: Oracle) -> npt.NDArray[np.float64]:
         assert isinstance(oracle, EmbeddingOracle), 'Oracle must be a EmbeddingOracle'
         result = self[oracle]
@@ -0,0 +1,153 @@
+"""
+In-process cache of oracle predictions, keyed on the oracle and the sequences of the chains it was called on.
+
+MIT License
+
+Copyright (c) 2025 Jakub Lála, Ayham Al-Saffar, Stefano Angioletti-Uberti
+"""
+
+import time
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Hashable
+from ..chain import Chain
+from .base import Oracle, OracleResult
+
+logger = logging.getLogger(__name__)
+
+# (oracle, ((chain_ID, fingerprint), ...)), the chain order matters as it is the order the oracle sees
+CacheKey = tuple[Oracle, tuple[tuple[str, int], ...]]
+
+
+def chains_sequences(chains: list[Chain]) -> tuple[tuple[str, str], ...]:
+    """Ordered (chain_ID, sequence) pairs of the chains, which identify the input of an oracle exactly."""
+    return tuple((chain.chain_ID, chain.sequence) for chain in chains)
+
+
+def with_input_chains(result: OracleResult, chains: list[Chain]) -> OracleResult:
+    """Shallow copy of an oracle result, computed for the same sequences, bound to the given chains."""
+    if isinstance(result, OracleResult) and result.input_chains is not chains:
+        result = result.model_copy(update={'input_chains': chains})
+    return result
+
+
+class OracleCache:
+    """
+    Least-recently-used cache of :class:`.OracleResult` objects.
+
+    Results are stored under the identity of the oracle that produced them and the ordered (chain_ID, fingerprint)
+    pairs of the chains that were passed to it, the fingerprint (see :attr:`.Chain.fingerprint`) standing for the
+    sequence so that keys are built in O(1) per chain rather than O(length). The sequences are stored with each entry
+    and compared on every hit, so that two inputs with the same fingerprint (a collision) never share a result. Once
+    ``max_size`` entries are stored, the least recently used entry is evicted, so that memory stays bounded during long
+    simulations.
+
+    The same cache can be shared by several :class:`.State` objects (and by several oracles), and it is never copied
+    when a State or a System is copied.
+
+    Parameters
+    ----------
+    max_size : int, default=1024
+        Maximum number of oracle results kept in memory.
+
+    Attributes
+    ----------
+    hits : int
+        Number of predictions served from the cache.
+    misses : int
+        Number of predictions that had to be computed by the oracle.
+    time_saved : float
+        Wall time (in seconds) the oracles took to compute the results that were later served from the cache.
+    """
+
+    def __init__(self, max_size: int = 1024) -> None:
+        assert max_size > 0, 'max_size must be a positive integer'
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.time_saved = 0.0
+        self._entries: OrderedDict[Hashable, tuple[OracleResult, float, tuple[tuple[str, str], ...]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __copy__(self) -> Any:
+        """Return a reference of the cache."""
+        return self
+
+    def __deepcopy__(self, memo: dict) -> Any:
+        """Return a reference of the cache, so that all copies of a State keep sharing it."""
+        return self
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(oracle: Oracle, chains: list[Chain]) -> CacheKey:
+        """Build the key under which the result of ``oracle.predict(chains)`` is stored."""
+        return (oracle, tuple((chain.chain_ID, chain.fingerprint) for chain in chains))
+
+    def __contains__(self, key: CacheKey) -> bool:
+        return key in self._entries
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from the cache."""
+        n_lookups = self.hits + self.misses
+        return self.hits / n_lookups if n_lookups > 0 else 0.0
+
+    def get(self, oracle: Oracle, chains: list[Chain]) -> OracleResult | None:
+        """
+        Return the cached result of ``oracle.predict(chains)``, or None if it has not been stored yet.
+
+        The returned result is a shallow copy whose ``input_chains`` are the given chains, so that energy terms reading
+        them see the chains of the State asking for the result. Arrays are shared with the cached entry.
+        """
+        key = self.make_key(oracle, chains)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2] != chains_sequences(chains):  # not stored, or stored for other sequences
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.time_saved += entry[1]
+        if oracle.metrics is not None:
+            oracle.metrics.record_cache_hit()
+        return with_input_chains(entry[0], chains)
+
+    def put(self, oracle: Oracle, chains: list[Chain], result: OracleResult, elapsed: float = 0.0) -> None:
+        """Store the result of ``oracle.predict(chains)``, evicting the least recently used entry if full."""
+        key = self.make_key(oracle, chains)
+        sequences = chains_sequences(chains)
+        with self._lock:
+            self._entries[key] = (result, elapsed, sequences)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def predict(self, oracle: Oracle, chains: list[Chain]) -> OracleResult:
+        """Return ``oracle.predict(chains)``, computing it only if it is not already in the cache."""
+        result = self.get(oracle, chains)
+        if result is None:
+            start = time.perf_counter()
+            result = oracle.predict(chains=chains)
+            self.put(oracle, chains, result, elapsed=time.perf_counter() - start)
+        return result
+
+    def clear(self) -> None:
+        """Remove all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.time_saved = 0.0
+
+    def stats(self) -> dict[str, float]:
+        """Summary of the cache usage, e.g. to be logged at the end of a simulation."""
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate,
+            'time_saved': self.time_saved,
+        }
@@ -34,7 +34,7 @@ class EmbeddingOracle(Oracle):
     result_class: Type[EmbeddingResult] = EmbeddingResult  # holds class, not instance
 
     def predict(self, chains: list[Chain]) -> EmbeddingResult:
-        return self.embed(chains=chains)
+        return self._record_predictions([chains], lambda: [self.embed(chains=chains)])[0]
 
     @abstractmethod
     def embed(self, chains: list[Chain]) -> EmbeddingResult:
@@ -48,9 +48,10 @@ class EmbeddingOracle(Oracle):
         pass
 
     @abstractmethod
-    def _post_process(self, output: Any) -> EmbeddingResult:
+    def _post_process(self, output: Any, chains: list[Chain]) -> EmbeddingResult:
         """
-        Takes the output from the oracle and post-process it to make it in the right format expected, if needed.
+        Takes the output from the oracle for the given chains and post-process it to make it in the right format
+        expected, if needed.
         For example, a protein language model might return a tensor of shape (N_residues, N_features), but we
         want to have a list of 1D tensors of shape (N_features,).
         """
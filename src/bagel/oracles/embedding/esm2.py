@@ -8,8 +8,10 @@ import numpy as np
 import numpy.typing as npt
 from ...chain import Chain
 from .base import EmbeddingResult, EmbeddingOracle
+from ..base import PRECISIONS
+from ..store import OracleResultStore
+from ..runtime import OracleRuntime
 from typing import List, Any
-from boileroom import app  # type: ignore
 from boileroom.models.esm.esm2 import ESM2Output  # type: ignore
 from boileroom.models.esm.esm2 import ESM2 as ESM2Boiler
 from modal import App
@@ -39,28 +41,31 @@ class ESM2(EmbeddingOracle):
     result_class = ESM2Result
 
     def __init__(
-        self, use_modal: bool = False, config: dict[str, Any] = {}, modal_app_context: App | None = None
+        self,
+        use_modal: bool = False,
+        config: dict[str, Any] = {},
+        modal_app_context: App | None = None,
+        result_store: OracleResultStore | None = None,
+        precision: str = 'float64',
     ) -> None:
         """
-        NOTE this can only be called once. Attempting to initialise this object multiple times in one process creates
-        breaking exceptions.
         Initialise the ESM2 model.
         WIP: For now we will be using ModalFold to do this reliably without much env issues.
+        If a ``result_store`` is given, embeddings already computed with the same configuration are read from disk.
+        The model is only built on the first embedding computed, or when loaded in the background by an
+        :class:`.OracleRuntime`. Without a ``modal_app_context``, the app context shared by all oracles is used.
+        The embeddings are stored in the given ``precision`` ('float64', 'float32' or 'float16').
         """
+        assert precision in PRECISIONS, f'precision must be one of {list(PRECISIONS)}'
+        self.precision = precision
         self.use_modal = use_modal
         self.modal_app_context = modal_app_context
+        self.result_store = result_store
         self.default_config = {
             'output_hidden_states': False,
             'model_name': 'esm2_t33_650M_UR50D',
         }
-        if self.use_modal and self.modal_app_context is None:
-            # Register the cleanup function to be called at exit, so no
-            # ephermal app is left running when the object is destroyed
-            import atexit
-
-            atexit.register(self.__del__)
-
-        self._load(config)
+        self.config = {**self.default_config, **config}
 
     def __del__(self) -> None:
         """Cleanup the app context when the object is destroyed or at exit"""
@@ -70,8 +75,7 @@ class ESM2(EmbeddingOracle):
 
     def _load(self, config: dict[str, Any] = {}) -> None:
         if self.use_modal and self.modal_app_context is None:
-            self.modal_app_context = app.run()
-            self.modal_app_context.__enter__()  # type: ignore
+            OracleRuntime.app_context()  # shared by all oracles, and exited when the process exits
         config = {**self.default_config, **config}
         self.model = ESM2Boiler(config)
 
@@ -86,15 +90,29 @@ class ESM2(EmbeddingOracle):
         """
         Calculate the embeddings of the residues in the chains.
         """
-        self.input_chains = chains
-        processed_chains = self._pre_process(chains)
-
-        if self.use_modal:
-            return self._post_process(self._remote_embed(processed_chains))
-        else:
-            logger.debug('Given that use_modal is False, trying to embed with ESM-2 locally...')
-            assert os.environ.get('MODEL_DIR'), 'MODEL_DIR must be set when using ESM-2 locally'
-            return self._post_process(self._local_embed(processed_chains))
+        if self.result_store is not None:
+            stored = self.result_store.fetch(self, chains)
+            if stored is not None:
+                return stored  # type: ignore
+
+        with self._time('pre_process'):
+            processed_chains = self._pre_process(chains)
+
+        self.load()
+        with self._time('model'):
+            if self.use_modal:
+                output = self._remote_embed(processed_chains)
+            else:
+                logger.debug('Given that use_modal is False, trying to embed with ESM-2 locally...')
+                assert os.environ.get('MODEL_DIR'), 'MODEL_DIR must be set when using ESM-2 locally'
+                output = self._local_embed(processed_chains)
+
+        with self._time('post_process'):
+            result = self._post_process(output, chains)
+
+        if self.result_store is not None:
+            self.result_store.save(self, chains, result)
+        return result
 
     def _remote_embed(self, sequence: List[str]) -> ESM2Output:
         return self.model.embed.remote(sequence)
@@ -109,7 +127,7 @@ class ESM2(EmbeddingOracle):
             )
         return self.model.embed.local(sequence)
 
-    def _post_process(self, output: ESM2Output) -> ESM2Result:
+    def _post_process(self, output: ESM2Output, chains: list[Chain]) -> ESM2Result:
         #! TODO This will need to be reverted back once change in boileroom is done
         # embeddings = output.embeddings[0, 1:-1, :]  # remove first and last token embeddings (not a residue)
         embeddings = output.embeddings[0, :, :]  # remove first and last token embeddings (not a residue)
@@ -117,4 +135,4 @@ class ESM2(EmbeddingOracle):
             f'Embeddings is expected to be a 2D tensor, not shape: {embeddings.shape}. '
             'The ESM2 Oracle does not support batches.'
         )
-        return self.result_class(input_chains=self.input_chains, embeddings=embeddings)
+        return self.result_class(input_chains=chains, embeddings=self._cast(embeddings))
@@ -1,4 +1,5 @@
-from .base import FoldingResult, FoldingOracle
+from .base import FoldingResult, FoldingOracle, StructureIndex
 from .esmfold import ESMFold, ESMFoldResult
+from .synthetic import SyntheticFoldingOracle
 
-__all__ = ['FoldingOracle', 'FoldingResult', 'ESMFold', 'ESMFoldResult']
+__all__ = ['FoldingOracle', 'FoldingResult', 'ESMFold', 'ESMFoldResult', 'SyntheticFoldingOracle', 'StructureIndex']
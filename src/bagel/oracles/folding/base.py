@@ -10,7 +10,90 @@ from abc import abstractmethod
 from ...chain import Chain
 from ..base import Oracle, OracleResult
 from biotite.structure import AtomArray
-from typing import Type
+from pydantic import PrivateAttr
+from typing import Any, Iterable, Type
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+
+class StructureIndex:
+    """
+    Residue and atom lookup tables of a structure, built once so that residue groups are resolved to residue rows and
+    atoms in O(group size), without copying the structure.
+
+    Residues are the unique (chain_id, res_id) pairs of the structure, ordered by chain (in order of first appearance,
+    as fed to the oracle) and then by first appearance within their chain. This is the order of the rows of per-residue
+    results such as the pLDDT and PAE.
+
+    Parameters
+    ----------
+    structure : AtomArray
+        Structure to index.
+
+    Attributes
+    ----------
+    chain_ids : npt.NDArray[np.str_]
+        Unique chain IDs, in order.
+    chain_offsets : npt.NDArray[np.int_]
+        Row of the first residue of each chain, followed by the number of residues.
+    residue_chain_ids, residue_ids : npt.NDArray
+        Chain ID and residue index (res_id) of each residue row.
+    residue_starts : npt.NDArray[np.int_]
+        Start of the atoms of each residue row in ``atom_order``, followed by the number of atoms.
+    atom_order : npt.NDArray[np.int_]
+        Atom indexes sorted by residue row, i.e. the identity for structures whose residues are contiguous.
+    """
+
+    def __init__(self, structure: AtomArray) -> None:
+        self.structure = structure
+        self.n_atoms = len(structure)
+        chain_codes, self.chain_ids = pd.factorize(np.asarray(structure.chain_id))
+        pairs, first_atoms, atom_pairs = np.unique(
+            np.stack([chain_codes, np.asarray(structure.res_id)]), axis=1, return_index=True, return_inverse=True
+        )
+        order = np.lexsort((first_atoms, pairs[0]))  # by chain, then by first appearance in the chain
+        rows = np.empty_like(order)
+        rows[order] = np.arange(len(order))
+        self.residue_chain_ids = self.chain_ids[pairs[0, order]]
+        self.residue_ids = pairs[1, order]
+        self.chain_offsets = np.searchsorted(pairs[0, order], np.arange(len(self.chain_ids) + 1))
+        atom_rows = rows[np.ravel(atom_pairs)]
+        self.atom_order = np.argsort(atom_rows, kind='stable')
+        self.residue_starts = np.searchsorted(atom_rows[self.atom_order], np.arange(len(order) + 1))
+        self._rows = {
+            (chain_ID, int(res_id)): row
+            for row, (chain_ID, res_id) in enumerate(zip(self.residue_chain_ids, self.residue_ids))
+        }
+
+    @property
+    def n_residues(self) -> int:
+        return len(self.residue_ids)
+
+    def residue_rows(self, chain_ids: Iterable[Any], res_ids: Iterable[Any]) -> npt.NDArray[np.int_]:
+        """Rows of the given residues (in the order given), skipping those that are not in the structure."""
+        rows = [self._rows.get((chain_ID, int(res_id)), -1) for chain_ID, res_id in zip(chain_ids, res_ids)]
+        return np.array([row for row in rows if row >= 0], dtype=int)
+
+    def residue_mask(self, chain_ids: Iterable[Any], res_ids: Iterable[Any]) -> npt.NDArray[np.bool_]:
+        """Mask over the residue rows of the given residues."""
+        mask = np.full(self.n_residues, fill_value=False)
+        mask[self.residue_rows(chain_ids, res_ids)] = True
+        return mask
+
+    def atom_indexes(self, rows: npt.NDArray[np.int_]) -> npt.NDArray[np.int_]:
+        """Indexes of the atoms of the given residue rows."""
+        starts, ends = self.residue_starts[rows], self.residue_starts[rows + 1]
+        lengths = ends - starts
+        # position in atom_order of every atom: the start of its residue plus its rank within the residue
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        return np.asarray(self.atom_order[offsets], dtype=int)
+
+    def atom_mask(self, chain_ids: Iterable[Any], res_ids: Iterable[Any]) -> npt.NDArray[np.bool_]:
+        """Mask over the atoms of the structure of the given residues."""
+        mask = np.full(self.n_atoms, fill_value=False)
+        mask[self.atom_indexes(self.residue_rows(chain_ids, res_ids))] = True
+        return mask
 
 
 class FoldingResult(OracleResult):
@@ -20,6 +103,7 @@ class FoldingResult(OracleResult):
 
     input_chains: list[Chain]
     structure: AtomArray
+    _structure_index: StructureIndex | None = PrivateAttr(default=None)  # see OraclesResultDict.get_structure_index
 
     class Config:
         arbitrary_types_allowed = True  # This is needed for numpy array support
@@ -36,8 +120,21 @@ class FoldingOracle(Oracle):
         """
         Predict new structure of chains.
         """
-        return self.fold(chains=chains)
+        return self._record_predictions([chains], lambda: [self.fold(chains=chains)])[0]
+
+    def predict_batch(self, chains_batch: list[list[Chain]]) -> list[FoldingResult]:  # type: ignore[override]
+        """
+        Predict new structures of several independent sets of chains.
+        """
+        return self._record_predictions(chains_batch, lambda: self.fold_batch(chains_batch=chains_batch))
 
     @abstractmethod
     def fold(self, chains: list[Chain]) -> FoldingResult:
         raise NotImplementedError('This method should be implemented by the folding algorithm')
+
+    def fold_batch(self, chains_batch: list[list[Chain]]) -> list[FoldingResult]:
+        """
+        Fold several independent sets of chains, returning one result per set. Folding algorithms that can fold many
+        complexes in a single call should override this, by default each set is folded separately.
+        """
+        return [self.fold(chains=chains) for chains in chains_batch]
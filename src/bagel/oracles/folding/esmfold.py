@@ -11,13 +11,15 @@ from ...constants import atom_order
 from .utils import reindex_chains
 from pydantic import field_validator
 from .base import FoldingOracle, FoldingResult
+from ..base import PRECISIONS
+from ..store import OracleResultStore
+from ..runtime import OracleRuntime
 from typing import List, Any, Type
-from boileroom import app  # type: ignore
 from boileroom.models.esm.esmfold import ESMFoldOutput  # type: ignore
 from boileroom.models.esm.esmfold import ESMFold as ESMFoldBoiler
 from modal import App
 
-from biotite.structure import AtomArray
+from biotite.structure import AtomArray, get_residue_starts
 import logging
 
 logger = logging.getLogger(__name__)
@@ -52,6 +54,8 @@ class ESMFoldResult(FoldingResult):
     local_plddt: npt.NDArray[np.float64]  # local ( per residue ) predicted LDDT score (0 to 1)
     ptm: npt.NDArray[np.float64]  # (global) predicted template modelling score (0 to 1)
     pae: npt.NDArray[np.float64]  # pairwise predicted alignment error
+    # residues (indexes in the structure) whose rows and columns pae is restricted to, all residues if None
+    pae_residues: npt.NDArray[np.int_] | None = None
 
     # for ptm: see Zhang Y and Skolnick J (2004). "Scoring function for automated assessment of
     # protein structure template quality". Proteins. 57 (4): 702–710. doi:10.1002/prot.20264
@@ -72,9 +76,29 @@ class ESMFoldResult(FoldingResult):
     def validate_ptm(cls, v: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
         return validate_array_range(v, 'ptm', 0, 1)
 
+    def restrict_pae(self, residues: npt.NDArray[np.int_]) -> 'ESMFoldResult':
+        """
+        Copy of the result whose PAE only keeps the rows and columns of the given residues (sorted indexes in the
+        structure), e.g. those read by the energy terms. Its size then scales with the number of these residues rather
+        than with the square of the length of the complex. The other fields are shared with this result.
+        """
+        positions = residues
+        if self.pae_residues is not None:
+            positions = np.searchsorted(self.pae_residues, residues)
+            assert np.all(positions < len(self.pae_residues)) and np.all(self.pae_residues[positions] == residues), (
+                'PAE of residues that were not kept'
+            )
+        pae = self.pae[:, positions[:, np.newaxis], positions[np.newaxis, :]]
+        return self.model_copy(update={'pae': pae, 'pae_residues': np.asarray(residues)})
+
     def save_attributes(self, filepath: pl.Path) -> None:
         np.savetxt(filepath.with_suffix('.plddt'), self.local_plddt[0], fmt='%.6f', header='plddt')
-        np.savetxt(filepath.with_suffix('.pae'), self.pae[0], fmt='%.6f', header='pae')
+        header = 'pae'
+        if self.pae_residues is not None:
+            if len(self.pae_residues) == 0:
+                return  # no PAE kept, see State.keep_full_pae
+            header = f'pae of residues {" ".join(str(residue) for residue in self.pae_residues)}'
+        np.savetxt(filepath.with_suffix('.pae'), self.pae[0], fmt='%.6f', header=header)
 
 
 class ESMFold(FoldingOracle):
@@ -86,13 +110,28 @@ class ESMFold(FoldingOracle):
 
     result_class: Type[ESMFoldResult] = ESMFoldResult
 
-    def __init__(self, use_modal: bool = False, config: dict[str, Any] = {}, modal_app_context: App | None = None):
+    def __init__(
+        self,
+        use_modal: bool = False,
+        config: dict[str, Any] = {},
+        modal_app_context: App | None = None,
+        result_store: OracleResultStore | None = None,
+        precision: str = 'float64',
+    ):
         """
-        NOTE this can only be called once. Attempting to initialise this object multiple times in one process creates
-        breaking exceptions.
+        If a ``result_store`` is given, structures already folded with the same configuration (in this or any previous
+        run sharing the store) are read from disk instead of being folded again.
+
+        The model is only built on the first structure that has to be folded, or when loaded in the background by
+        an :class:`.OracleRuntime`. Without a ``modal_app_context``, the app context shared by all oracles is used.
+
+        The pLDDT, pTM and PAE of the results are stored in the given ``precision`` ('float64', 'float32' or 'float16').
         """
+        assert precision in PRECISIONS, f'precision must be one of {list(PRECISIONS)}'
+        self.precision = precision
         self.use_modal = use_modal
         self.modal_app_context = modal_app_context
+        self.result_store = result_store
         self.default_config = {
             'output_pdb': False,
             'output_cif': False,
@@ -100,14 +139,7 @@ class ESMFold(FoldingOracle):
             'glycine_linker': '',
             'position_ids_skip': 512,
         }
-        self._load(config)
-
-        if self.use_modal and self.modal_app_context is None:
-            # Register the cleanup function to be called at exit, so no
-            # ephermal app is left running when the object is destroyed
-            import atexit
-
-            atexit.register(self.__del__)
+        self.config = {**self.default_config, **config}
 
     def __del__(self) -> None:
         """Cleanup the app context when the object is destroyed or at exit"""
@@ -117,8 +149,7 @@ class ESMFold(FoldingOracle):
 
     def _load(self, config: dict[str, Any] = {}) -> None:
         if self.use_modal and self.modal_app_context is None:
-            self.modal_app_context = app.run()
-            self.modal_app_context.__enter__()  # type: ignore
+            OracleRuntime.app_context()  # shared by all oracles, and exited when the process exits
         config = {**self.default_config, **config}
         self.model = ESMFoldBoiler(config)
 
@@ -135,12 +166,41 @@ class ESMFold(FoldingOracle):
         """
         Fold a list of chains using ESMFold.
         """
-        if self.use_modal:
-            return self._reduce_output(self._remote_fold(self._pre_process(chains)), chains)
-        else:
-            logger.debug('Given that use_modal is False, trying to fold with ESMFold locally...')
-            assert os.environ.get('MODEL_DIR'), 'MODEL_DIR must be set when using ESMFold locally'
-            return self._reduce_output(self._local_fold(self._pre_process(chains)), chains)
+        return self.fold_batch([chains])[0]
+
+    def fold_batch(self, chains_batch: List[List[Chain]]) -> List[ESMFoldResult]:  # type: ignore[override]
+        """
+        Fold several independent lists of chains (e.g. several candidate complexes) using ESMFold.
+
+        All complexes that are not already in the result store are sent to ESMFold as a single batch, i.e. in one
+        remote (or local) call, and the batched output is then split into one ESMFoldResult per complex.
+        """
+        results: List[ESMFoldResult | None] = [None] * len(chains_batch)
+        if self.result_store is not None:
+            for i, chains in enumerate(chains_batch):
+                results[i] = self.result_store.fetch(self, chains)  # type: ignore
+        to_fold = [i for i, result in enumerate(results) if result is None]
+        if len(to_fold) == 0:
+            return results  # type: ignore
+
+        with self._time('pre_process'):
+            sequences = [sequence for i in to_fold for sequence in self._pre_process(chains_batch[i])]
+        self.load()
+        with self._time('model'):
+            if self.use_modal:
+                output = self._remote_fold(sequences)
+            else:
+                logger.debug('Given that use_modal is False, trying to fold with ESMFold locally...')
+                assert os.environ.get('MODEL_DIR'), 'MODEL_DIR must be set when using ESMFold locally'
+                output = self._local_fold(sequences)
+
+        with self._time('post_process'):
+            for batch_index, i in enumerate(to_fold):
+                results[i] = self._reduce_output(output, chains_batch[i], batch_index=batch_index)
+        if self.result_store is not None:
+            for i in to_fold:
+                self.result_store.save(self, chains_batch[i], results[i])  # type: ignore
+        return results  # type: ignore
 
     def _remote_fold(self, sequence: List[str]) -> ESMFoldOutput:
         return self.model.fold.remote(sequence)
@@ -155,19 +215,27 @@ class ESMFold(FoldingOracle):
             )
         return self.model.fold.local(sequence)
 
-    def _reduce_output(self, output: ESMFoldOutput, chains: List[Chain]) -> ESMFoldResult:
+    def _reduce_output(self, output: ESMFoldOutput, chains: List[Chain], batch_index: int = 0) -> ESMFoldResult:
         """
         Reduce ESMFoldOutput (from boileroom.esmfold) to a ESMFoldResult object.
         In principle, any other metric from ESMFoldOutput can be passed down into the ESMFoldResult object.
         For instance, one could pass the distogram_logits to create an EnergyTerm related to that.
+
+        For a batched output, only the complex at ``batch_index`` is extracted. ESMFold pads all complexes of a batch to
+        the length of the longest one, so the padding is cropped away and the result has a batch size of 1.
         """
-        atoms = output.atom_array
-        atoms = reindex_chains(atoms, [chain.chain_ID for chain in chains])
+        n_residues = sum(chain.length for chain in chains)
+        atoms = output.atom_array[batch_index]
+        residue_starts = get_residue_starts(atoms)
+        if len(residue_starts) > n_residues:
+            atoms = atoms[: residue_starts[n_residues]]
+        atoms = reindex_chains([atoms], [chain.chain_ID for chain in chains])
+        index = slice(batch_index, batch_index + 1)
         results = self.result_class(
             input_chains=chains,
             structure=atoms,
-            local_plddt=output.plddt[..., atom_order['CA']],  # we only get CA atoms' plddt
-            ptm=output.ptm,
-            pae=output.predicted_aligned_error,
+            local_plddt=self._cast(output.plddt[index, :n_residues, atom_order['CA']]),  # we only get CA atoms' plddt
+            ptm=self._cast(output.ptm[index]),
+            pae=self._cast(output.predicted_aligned_error[index, :n_residues, :n_residues]),
         )
         return results
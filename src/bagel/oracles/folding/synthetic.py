@@ -0,0 +1,374 @@
+"""
+Synthetic folding oracle, deterministically deriving a plausible structure and confidence metrics from the sequence.
+
+MIT License
+
+Copyright (c) 2025 Jakub Lála, Ayham Al-Saffar, Stefano Angioletti-Uberti
+"""
+
+import time
+import hashlib
+import numpy as np
+import numpy.typing as npt
+from typing import Any, Type
+from biotite.structure import AtomArray
+from ...chain import Chain
+from ...constants import aa_dict
+from .base import FoldingOracle
+from ..base import PRECISIONS
+from .esmfold import ESMFoldResult
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Heavy atoms of each amino acid, in ESMFold (atom37) order, with their coordinates in the local frame of the residue:
+# CA at the origin, C along x and N in the xy plane. Taken from the ideal coordinates of the Chemical Component
+# Dictionary, which is too large to load for the sake of 20 residues.
+residue_atoms: dict[str, tuple[tuple[str, float, float, float], ...]] = {
+    'ALA': (
+        ('N', -0.491, 1.383, 0.000),
+        ('CA', 0.000, 0.000, 0.000),
+        ('C', 1.505, 0.000, 0.000),
+        ('CB', -0.509, -0.721, -1.249),
+        ('O', 2.110, 0.906, -0.521),
+    ),
+    'ARG': (
+        ('N', -0.455, 1.389, 0.000),
+        ('CA', 0.000, 0.000, 0.000),
+        ('C', 1.518, 0.000, 0.000),
+        ('CB', -0.575, -0.782, -1.191),
+        ('O', 2.229, 0.994, -0.068),
+        ('CG', -0.118, -0.275, -2.568),
+        ('CD', -0.671, -1.121, -3.713),
+        ('NE', -2.115, -1.108, -3.716),
+        ('NH1', -4.274, -1.763, -4.627),
+        ('NH2', -2.254, -2.548, -5.656),
+        ('CZ', -2.885, -1.805, -4.664),
+    ),
+    'ASN': (
+        ('N', -0.490, 1.384, 0.000),
+        ('CA', 0.000, 0.000, 0.000),
+        ('C', 1.507, 0.000, 0.000),
+        ('CB', -0.510, -0.722, -1.250),
+        ('O', 2.111, 0.983, -0.357),
+        ('CG', -2.011, -0.830, -1.191),
+        ('ND2', -2.684, -1.432, -2.191),
+        ('OD1', -2.615, -0.375, -0.241),
+    ),
+    'ASP': (
+        ('N', -0.490, 1.385, 0.000),
+        ('CA', 0.000, 0.000, 0.000),
+        ('C', 1.507, 0.000, 0.000),
+        ('CB', -0.510, -0.722, -1.249),
+        ('O', 2.111, 0.984, -0.359),
+        ('CG', -2.012, -0.830, -1.188),
+        ('OD1', -2.612, -0.377, -0.243),
+        ('OD2', -2.682, -1.430, -2.184),
+    ),
+    'CYS': (
+        ('N', -0.488, 1.386, 0.000),
+        ('CA', 0.000, 0.000, 0.000),
+        ('C', 1.506, 0.000, 0.000),
+        ('CB', -0.511, -0.720, -1.248),
+        ('O', 2.111, 0.904, -0.523),
+        ('SG', -2.325, -0.719, -1.248),
+    ),
+    'GLN': (
+        ('N', -0.489, 1.385, 0.000),
+        ('CA', 0.000, 0.000, 0.000),
+        ('C', 1.506, 0.000, 0.000),
+        ('CB', -0.511, -0.721, -1.248),
+        ('O', 2.111, 0.905, -0.523),
+        ('CG', -2.040, -0.719, -1.248),
+        ('CD', -2.544, -1.430, -2.477),
+        ('NE2', -3.868, -1.552, -2.691),
+        ('OE1', -1.756, -1.891, -3.275),
+    ),
+    'GLU': (
+        ('N', -0.490, 1.385, 0.000),
+        ('CA', 0.000, 0.000, 0.000),
+        ('C', 1.508, 0.000, 0.000),
+        ('CB', -0.509, -0.721, -1.250),
+        ('O', 2.112, 0.984, -0.358),
+        ('CG', -2.034, -0.831, -1.188),
+        ('CD', -2.537, -1.541, -2.419),
+        ('OE1', -1.755, -1.920, -3.259),
+        ('OE2', -3.852, -1.752, -2.583),
+    ),
+    'GLY': (
+        ('N', -0.489, 1.386, 0.000),
+        ('CA', 0.000, 0.000, 0.000),
+        ('C', 1.507, 0.000, 0.000),
+        ('O', 2.112, 1.046, 0.000),
+    ),
+    'HIS': (
+        ('N', -0.520, 1.344, 0.000),
+        ('CA', 0.000, 0.000, 0.000),
+        ('C', 1.522, 0.000, 0.000),
+        ('CB', -0.523, -0.795, -1.203),
+        ('O', 2.190, 0.849, -0.582),
+        ('CG', -0.459, -2.289, -0.995),
+        ('CD2', -1.366, -3.123, -0.473),
+        ('ND1', 0.643, -2.982, -1.356),
+        ('CE1', 0.433, -4.269, -1.061),
+        ('NE2', -0.787, -4.367, -0.523),
+    ),
+    'ILE': (
+        ('N', -0.490, 1.385, 0.000),
+        ('CA', 0.000, 0.000, 0.000),
+        ('C', 1.506, 0.000, 0.000),
+        ('CB', -0.511, -0.720, -1.248),
+        ('O', 2.110, 0.905, -0.524),
+        ('CG1', -2.041, -0.721, -1.247),
+        ('CG2', -0.002, -2.163, -1.248),
+        ('CD1', -2.552, -1.441, -2.495),
+    ),
+    'LEU': (
+        ('N', -0.489, 1.385, 0.000),
+        ('CA', 0.000, 0.000, 0.000),
+        ('C', 1.506, 0.000, 0.000),
+        ('CB', -0.510, -0.719, -1.249),
+        ('O', 2.112, 0.905, -0.522),
+        ('CG', -2.040, -0.719, -1.249),
+        ('CD1', -2.551, -1.438, -2.499),
+        ('CD2', -2.551, -1.440, -0.001),
+    ),
+    'LYS': (
+        ('N', -0.490, 1.385, 0.000),
+        ('CA', 0.000, 0.000, 0.000),
+        ('C', 1.507, 0.000, 0.000),
+        ('CB', -0.510, -0.721, -1.250),
+        ('O', 2.111, 0.983, -0.358),
+        ('CG', -2.035, -0.830, -1.188),
+        ('CD', -2.546, -1.551, -2.438),
+        ('CE', -4.070, -1.660, -2.376),
+        ('NZ', -4.560, -2.353, -3.576),
+    ),
+    'MET': (
+        ('N', -0.489, 1.385, 0.000),
+        ('CA', 0.000, 0.000, 0.000),
+        ('C', 1.506, 0.000, 0.000),
+        ('CB', -0.512, -0.720, -1.249),
+        ('O', 2.111, 0.905, -0.523),
+        ('CG', -2.040, -0.720, -1.249),
+        ('SD', -2.646, -1.574, -2.730),
+        ('CE', -4.434, -1.424, -2.472),
+    ),
+    'PHE': (
+        ('N', -0.490, 1.384, 0.000),
+        ('CA', 0.000, 0.000, 0.000),
+        ('C', 1.507, 0.000, 0.000),
+        ('CB', -0.511, -0.722, -1.247),
+        ('O', 2.110, 0.905, -0.524),
+        ('CG', -2.017, -0.721, -1.247),
+        ('CD1', -2.709, 0.314, -1.845),
+        ('CD2', -2.708, -1.761, -0.652),
+        ('CE1', -4.091, 0.314, -1.844),
+        ('CE2', -4.090, -1.758, -0.649),
+        ('CZ', -4.781, -0.722, -1.247),
+    ),
+    'PRO': (
+        ('N', -0.518, 1.393, 0.000),
+        ('CA', 0.000, 0.000, 0.000),
+        ('C', 1.508, 0.000, 0.000),
+        ('CB', -0.538, -0.618, -1.308),
+        ('O', 2.112, 1.001, -0.306),
+        ('CG', -1.788, 0.215, -1.661),
+        ('CD', -1.898, 1.267, -0.537),
+    ),
+    'SER': (
+        ('N', -0.489, 1.385, 0.000),
+        ('CA', 0.000, 0.000, 0.000),
+        ('C', 1.507, 0.000, 0.000),
+        ('CB', -0.510, -0.720, -1.248),
+        ('O', 2.111, 0.905, -0.522),
+        ('OG', -1.939, -0.719, -1.249),
+    ),
+    'THR': (
+        ('N', -0.488, 1.386, 0.000),
+        ('CA', 0.000, 0.000, 0.000),
+        ('C', 1.506, 0.000, 0.000),
+        ('CB', -0.511, -0.719, -1.249),
+        ('O', 2.111, 0.904, -0.522),
+        ('CG2', -2.041, -0.717, -1.250),
+        ('OG1', -0.034, -0.046, -2.415),
+    ),
+    'TRP': (
+        ('N', -0.489, 1.385, 0.000),
+        ('CA', 0.000, 0.000, 0.000),
+        ('C', 1.507, 0.000, 0.000),
+        ('CB', -0.510, -0.722, -1.247),
+        ('O', 2.111, 0.906, -0.523),
+        ('CG', -2.017, -0.721, -1.246),
+        ('CD1', -2.815, 0.214, -1.787),
+        ('CD2', -2.888, -1.742, -0.663),
+        ('CE2', -4.206, -1.314, -0.905),
+        ('CE3', -2.659, -2.932, 0.031),
+        ('NE1', -4.127, -0.124, -1.592),
+        ('CH2', -5.019, -3.265, 0.222),
+        ('CZ2', -5.268, -2.092, -0.456),
+        ('CZ3', -3.717, -3.680, 0.463),
+    ),
+    'TYR': (
+        ('N', -0.490, 1.385, 0.000),
+        ('CA', 0.000, 0.000, 0.000),
+        ('C', 1.507, 0.000, 0.000),
+        ('CB', -0.510, -0.721, -1.248),
+        ('O', 2.111, 0.905, -0.522),
+        ('CG', -2.017, -0.721, -1.248),
+        ('CD1', -2.707, 0.316, -1.847),
+        ('CD2', -2.707, -1.761, -0.653),
+        ('CE1', -4.088, 0.319, -1.848),
+        ('CE2', -4.088, -1.760, -0.648),
+        ('OH', -6.141, -0.721, -1.248),
+        ('CZ', -4.783, -0.720, -1.249),
+    ),
+    'VAL': (
+        ('N', -0.489, 1.385, 0.000),
+        ('CA', 0.000, 0.000, 0.000),
+        ('C', 1.506, 0.000, 0.000),
+        ('CB', -0.510, -0.720, -1.248),
+        ('O', 2.110, 0.905, -0.523),
+        ('CG1', -2.040, -0.720, -1.249),
+        ('CG2', 0.000, 0.000, -2.497),
+    ),
+}
+
+
+def _local_frames(x_axis: npt.NDArray[np.float64], xy_plane: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    """Orthonormal frames (..., 3, 3), with rows the axes, from a first axis and a vector in the xy plane."""
+    e1 = x_axis / np.linalg.norm(x_axis, axis=-1, keepdims=True)
+    e2 = xy_plane - np.sum(xy_plane * e1, axis=-1, keepdims=True) * e1
+    e2 /= np.linalg.norm(e2, axis=-1, keepdims=True)
+    return np.stack([e1, e2, np.cross(e1, e2)], axis=-2)
+
+
+class SyntheticFoldingOracle(FoldingOracle):
+    """
+    Folding oracle returning a synthetic but plausible :class:`.ESMFoldResult`, without any model.
+
+    All outputs are derived deterministically from a hash of the chain sequences, so that identical inputs always give
+    identical results, while any mutation gives a different structure and different scores. The structure has the full
+    heavy-atom topology of every residue, in the same atom order as ESMFold, placed along a compact random walk of the
+    C-alpha atoms. Confidence metrics (pLDDT, pTM and PAE) are smooth random profiles with realistic ranges.
+
+    Computing a result is cheap (well under a second for thousands of residues), which makes this oracle suited to tests and
+    to profiling the minimizers, energy terms and logging at realistic sequence lengths. An artificial latency can be
+    added to mimic a real folding model, as ``latency + latency_per_residue * n_residues ** latency_exponent`` seconds
+    per call (per batch when using :meth:`fold_batch`, with ``n_residues`` that of the longest complex).
+
+    Parameters
+    ----------
+    latency : float, default=0.0
+        Fixed time (in seconds) each call takes, e.g. the round trip to a remote model.
+    latency_per_residue : float, default=0.0
+        Additional time (in seconds) per residue, scaled by ``latency_exponent``.
+    latency_exponent : float, default=1.0
+        How the latency scales with the number of residues, e.g. 2.0 for a model with pairwise representations.
+    seed : int, default=0
+        Mixed into the hash of the sequences, to get a different (but still deterministic) set of results.
+    precision : str, default='float64'
+        Precision in which the pLDDT, pTM and PAE are stored, 'float64', 'float32' or 'float16'.
+    """
+
+    result_class: Type[ESMFoldResult] = ESMFoldResult
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        latency_per_residue: float = 0.0,
+        latency_exponent: float = 1.0,
+        seed: int = 0,
+        precision: str = 'float64',
+    ) -> None:
+        assert latency >= 0 and latency_per_residue >= 0, 'latencies must be non-negative'
+        assert precision in PRECISIONS, f'precision must be one of {list(PRECISIONS)}'
+        self.precision = precision
+        self.latency = latency
+        self.latency_per_residue = latency_per_residue
+        self.latency_exponent = latency_exponent
+        self.seed = seed
+        self.config: dict[str, Any] = {'seed': seed}
+
+    def _sleep(self, n_residues: int) -> None:
+        delay = self.latency + self.latency_per_residue * n_residues**self.latency_exponent
+        if delay > 0:
+            time.sleep(delay)
+
+    def _rng(self, chains: list[Chain]) -> np.random.Generator:
+        content = f'{self.seed}|' + ':'.join(chain.sequence for chain in chains)
+        return np.random.default_rng(int.from_bytes(hashlib.sha256(content.encode()).digest()[:8], 'little'))
+
+    def fold(self, chains: list[Chain]) -> ESMFoldResult:
+        """
+        Fold a list of chains synthetically.
+        """
+        with self._time('model'):
+            self._sleep(sum(chain.length for chain in chains))
+            return self._synthesize(chains)
+
+    def fold_batch(self, chains_batch: list[list[Chain]]) -> list[ESMFoldResult]:  # type: ignore[override]
+        """
+        Fold several lists of chains synthetically, with the latency of a single call.
+        """
+        with self._time('model'):
+            self._sleep(max([sum(chain.length for chain in chains) for chains in chains_batch], default=0))
+            return [self._synthesize(chains) for chains in chains_batch]
+
+    def _synthesize(self, chains: list[Chain]) -> ESMFoldResult:
+        rng = self._rng(chains)
+        n_residues = sum(chain.length for chain in chains)
+        chain_index = np.repeat(np.arange(len(chains)), [chain.length for chain in chains])
+
+        # C-alpha trace: a persistent random walk with 3.8 Å steps, pulled back towards its centre to stay globular.
+        # Chains follow each other along the same walk, so that the chains of a complex are in contact.
+        ca = np.zeros((n_residues + 2 * len(chains), 3))
+        noise = rng.normal(size=(len(ca), 3))
+        direction = rng.normal(size=3)
+        position = np.zeros(3)
+        for i in range(len(ca)):
+            direction = direction / np.linalg.norm(direction) + 0.6 * noise[i] - 0.01 * position
+            direction /= np.linalg.norm(direction)
+            position = position + 3.8 * direction
+            ca[i] = position
+        # each chain uses one extra point at both of its ends, to define the frames of its terminal residues
+        offsets = np.arange(n_residues) + 2 * chain_index + 1
+        frames = _local_frames(ca[offsets + 1] - ca[offsets], ca[offsets - 1] - ca[offsets])
+
+        res_names = [aa_dict[name] for chain in chains for name in chain.sequence]
+        templates = [residue_atoms[res_name] for res_name in res_names]
+        atom_residue = np.repeat(np.arange(n_residues), [len(template) for template in templates])
+        template_atoms = [atom for template in templates for atom in template]
+        local_coord = np.array([atom[1:] for atom in template_atoms])
+        atom_names = np.array([atom[0] for atom in template_atoms])
+
+        # confidence metrics: smooth per-residue profiles, lower at the termini, and the PAE follows from them
+        smooth = np.convolve(rng.normal(size=n_residues + 8), np.ones(9) / 9, mode='valid')
+        position_in_chain = np.concatenate([np.arange(chain.length) for chain in chains])
+        chain_length = np.array([chains[c].length for c in chain_index])
+        termini = np.minimum(position_in_chain, chain_length - 1 - position_in_chain)
+        plddt = np.clip(rng.uniform(0.6, 0.9) + 0.3 * smooth - 0.15 * np.exp(-termini / 3), 0.05, 0.98)
+        ptm = np.array([np.clip(np.mean(plddt) ** 2 + rng.normal(scale=0.05), 0.05, 0.95)])
+        uncertainty = 1 - np.sqrt(np.outer(plddt, plddt))
+        separation = np.abs(np.subtract.outer(np.arange(n_residues), np.arange(n_residues)))
+        inter_chain = chain_index[:, None] != chain_index[None, :]
+        pae = np.clip(1.0 + 25 * uncertainty + 0.02 * separation + 8.0 * inter_chain, 0.0, 31.75)
+
+        atoms = AtomArray(len(atom_residue))
+        atoms.coord = np.einsum('aj,ajk->ak', local_coord, frames[atom_residue]) + ca[offsets][atom_residue]
+        atoms.chain_id = np.array([chain.chain_ID for chain in chains])[chain_index][atom_residue]
+        atoms.res_id = position_in_chain[atom_residue]
+        atoms.res_name = np.array(res_names)[atom_residue]
+        atoms.atom_name = atom_names
+        atoms.element = np.array([name[0] for name in atom_names])  # N, C, O or S, as in ESMFold
+        atoms.add_annotation('b_factor', dtype=float)
+        atoms.b_factor = plddt[atom_residue]
+
+        return self.result_class(
+            input_chains=chains,
+            structure=atoms,
+            local_plddt=self._cast(plddt[None, :]),
+            ptm=self._cast(ptm),
+            pae=self._cast(pae[None, :, :]),
+        )
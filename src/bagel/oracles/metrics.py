@@ -0,0 +1,126 @@
+"""
+Instrumentation of oracle calls: timings of their different phases, sizes of their inputs and outputs, and cache hits.
+
+MIT License
+
+Copyright (c) 2025 Jakub Lála, Ayham Al-Saffar, Stefano Angioletti-Uberti
+"""
+
+import time
+import threading
+import numpy as np
+import numpy.typing as npt
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+# phases of an oracle call that are timed separately, 'total' being the whole call as seen by the caller
+PHASES = ('pre_process', 'model', 'post_process', 'total')
+
+
+class OracleMetrics:
+    """
+    In-memory record of the calls made to an oracle.
+
+    For every prediction, it stores the wall time of each phase of the call (see :data:`PHASES`), the number of
+    residues folded or embedded, and the size in bytes of the arrays in the result. Hits of the
+    :class:`.OracleCache` and :class:`.OracleResultStore` are counted too. All samples are kept, so that they can be
+    summarised (:meth:`summary`) or binned (:meth:`histogram`) at any time, e.g. at the end of a simulation. Counters
+    since the last call to :meth:`step_summary` are also kept, to log the cost of each step of a minimizer.
+
+    Metrics are only recorded for oracles on which :meth:`.Oracle.enable_metrics` has been called, otherwise the oracle
+    calls are left untouched.
+    """
+
+    def __init__(self) -> None:
+        self.timings: dict[str, list[float]] = {phase: [] for phase in PHASES}
+        self.sequence_lengths: list[int] = []
+        self.payload_sizes: list[int] = []
+        self.cache_hits = 0
+        self.store_hits = 0
+        self._step: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._reset_step()
+
+    def _reset_step(self) -> None:
+        self._step = {'calls': 0, 'cache_hits': 0, 'residues': 0, 'payload': 0}
+        self._step.update({f'{phase}_time': 0.0 for phase in PHASES})
+
+    @property
+    def n_calls(self) -> int:
+        """Number of predictions returned by the oracle (including those it read from its result store)."""
+        return len(self.sequence_lengths)
+
+    @contextmanager
+    def time(self, phase: str) -> Iterator[None]:
+        """Context manager recording the wall time spent in one phase of an oracle call."""
+        assert phase in PHASES, f'Unknown phase {phase}, must be one of {PHASES}'
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase, time.perf_counter() - start)
+
+    def add_time(self, phase: str, elapsed: float) -> None:
+        with self._lock:
+            self.timings[phase].append(elapsed)
+            self._step[f'{phase}_time'] += elapsed
+
+    def record_prediction(self, n_residues: int, payload_size: int) -> None:
+        """Record the input and output sizes of a prediction computed by the oracle."""
+        with self._lock:
+            self.sequence_lengths.append(n_residues)
+            self.payload_sizes.append(payload_size)
+            self._step['calls'] += 1
+            self._step['residues'] += n_residues
+            self._step['payload'] += payload_size
+
+    def record_cache_hit(self, store: bool = False) -> None:
+        """Record a prediction served by the in-memory cache, or by the on-disk store if ``store`` is True."""
+        with self._lock:
+            if store:
+                self.store_hits += 1
+            else:
+                self.cache_hits += 1
+            self._step['cache_hits'] += 1
+
+    def histogram(self, name: str, bins: int | npt.ArrayLike = 10) -> tuple[npt.NDArray[Any], npt.NDArray[Any]]:
+        """
+        Histogram (counts, bin edges) of the samples of a metric: any phase of :data:`PHASES`, 'sequence_length' or
+        'payload_size'.
+        """
+        samples = {'sequence_length': self.sequence_lengths, 'payload_size': self.payload_sizes, **self.timings}[name]
+        return np.histogram(np.asarray(samples, dtype=float), bins=bins)
+
+    def summary(self) -> dict[str, float]:
+        """Number of calls and hits, and mean/median/95th percentile of every metric, over the whole run."""
+        summary: dict[str, float] = {
+            'calls': self.n_calls,
+            'cache_hits': self.cache_hits,
+            'store_hits': self.store_hits,
+        }
+        samples: dict[str, list[Any]] = {f'{phase}_time': values for phase, values in self.timings.items()}
+        samples.update({'sequence_length': self.sequence_lengths, 'payload_size': self.payload_sizes})
+        for name, values in samples.items():
+            if len(values) == 0:
+                continue
+            summary[f'{name}_mean'] = float(np.mean(values))
+            summary[f'{name}_p50'] = float(np.percentile(values, 50))
+            summary[f'{name}_p95'] = float(np.percentile(values, 95))
+        return summary
+
+    def step_summary(self) -> dict[str, float]:
+        """Totals since the previous call (e.g. over the last minimizer step), with the same keys at every call."""
+        with self._lock:
+            step = dict(self._step)
+            self._reset_step()
+        return step
+
+
+def payload_size(result: Any) -> int:
+    """Size in bytes of all the arrays held by an oracle result."""
+    from .store import result_to_arrays
+
+    try:
+        return sum(array.nbytes for array in result_to_arrays(result).values())
+    except AttributeError:  # not an OracleResult, e.g. in tests
+        return 0
@@ -0,0 +1,126 @@
+"""
+Runtime shared by the oracles of a process: a single Modal app context, and background loading of the models.
+
+MIT License
+
+Copyright (c) 2025 Jakub Lála, Ayham Al-Saffar, Stefano Angioletti-Uberti
+"""
+
+import atexit
+import threading
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Iterable, TypeVar
+from .base import Oracle
+
+logger = logging.getLogger(__name__)
+
+O = TypeVar('O', bound=Oracle)
+
+
+class OracleRuntime:
+    """
+    Registry of the oracles used in a run, which loads their models in parallel, in the background.
+
+    Oracles such as :class:`.ESMFold` and :class:`.ESM2` only build their model on their first prediction (see
+    :meth:`.Oracle.load`). Calling :meth:`warmup` right after creating them loads all models at once in background
+    threads, while the rest of the run (chains, states, system, minimizer) is being set up, so that the first step of a
+    minimizer does not pay for loading them one after the other.
+
+    Oracles running on Modal without an explicit ``modal_app_context`` all share a single app context, opened on first
+    use with :meth:`app_context` and closed when the process exits, instead of each opening (and closing) their own.
+    :meth:`warmup` opens it on the calling thread, before loading the models in the background.
+
+    Example
+    -------
+    ::
+
+        runtime = OracleRuntime()
+        esmfold = runtime.register(ESMFold(use_modal=True))
+        esm2 = runtime.register(ESM2(use_modal=True))
+        runtime.warmup()  # returns immediately
+        ...  # build the system and the minimizer
+        minimizer.minimize_system(system)  # waits for a model only if it is still loading
+
+    Parameters
+    ----------
+    oracles : Iterable[:class:`.Oracle`], default=()
+        Oracles to register straight away.
+    """
+
+    _app_context: Any = None  # shared by all the oracles of the process
+    _app_lock = threading.Lock()
+
+    def __init__(self, oracles: Iterable[Oracle] = ()) -> None:
+        self.oracles: list[Oracle] = []
+        self.futures: list[Future[None]] = []
+        for oracle in oracles:
+            self.register(oracle)
+
+    def register(self, oracle: O) -> O:
+        """Add an oracle to the runtime, and return it."""
+        if not any(oracle is registered for registered in self.oracles):
+            self.oracles.append(oracle)
+        return oracle
+
+    def warmup(self, block: bool = False) -> list[Future[None]]:
+        """
+        Load the models of all registered oracles, in parallel, in background threads.
+
+        Parameters
+        ----------
+        block : bool, default=False
+            Whether to wait for all models to be loaded before returning. Errors raised while loading are raised here
+            if True, otherwise on the first prediction of the oracle (or by the returned futures).
+
+        Returns
+        -------
+        list[Future[None]]
+            One future per oracle being loaded, done once its model is loaded.
+        """
+        # oracles without a model to load, e.g. SyntheticFoldingOracle, are skipped
+        to_load = [oracle for oracle in self.oracles if not oracle._loaded and type(oracle)._load is not Oracle._load]
+        if any(
+            getattr(oracle, 'use_modal', False) and getattr(oracle, 'modal_app_context', None) is None
+            for oracle in to_load
+        ):
+            self.app_context()  # entered (and later exited) on this thread rather than on a loading one
+        if len(to_load) > 0:
+            logger.info(f'Loading {", ".join(type(oracle).__name__ for oracle in to_load)} in the background')
+            executor = ThreadPoolExecutor(max_workers=len(to_load), thread_name_prefix='oracle-warmup')
+            self.futures = [executor.submit(oracle.load) for oracle in to_load]
+            executor.shutdown(wait=False)
+        if block:
+            self.wait()
+        return self.futures
+
+    def wait(self) -> None:
+        """Wait for the models being loaded by :meth:`warmup`."""
+        wait(self.futures)
+        for future in self.futures:
+            future.result()
+
+    @classmethod
+    def app_context(cls) -> Any:
+        """
+        Running context of the boileroom Modal app, entered on the first call and then shared by all the oracles of the
+        process. It is exited when the process exits.
+        """
+        with cls._app_lock:
+            if cls._app_context is None:
+                from boileroom import app  # type: ignore
+
+                logger.debug('Starting the shared Modal app context')
+                context = app.run()
+                context.__enter__()
+                cls._app_context = context
+                atexit.register(cls.close_app_context)
+            return cls._app_context
+
+    @classmethod
+    def close_app_context(cls) -> None:
+        """Exit the shared Modal app context, if it was started."""
+        with cls._app_lock:
+            if cls._app_context is not None:
+                cls._app_context.__exit__(None, None, None)
+                cls._app_context = None
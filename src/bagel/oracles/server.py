@@ -0,0 +1,310 @@
+"""
+Local server hosting a single loaded oracle, shared by any number of client processes, with request micro-batching.
+
+MIT License
+
+Copyright (c) 2025 Jakub Lála, Ayham Al-Saffar, Stefano Angioletti-Uberti
+"""
+
+import os
+import time
+import queue
+import ipaddress
+import threading
+import logging
+from multiprocessing.connection import Listener, Client, Connection
+from typing import Any, Type
+from ..chain import Chain
+from .base import Oracle, OracleResult
+from .cache import with_input_chains
+from .folding import FoldingOracle, FoldingResult
+from .embedding import EmbeddingOracle, EmbeddingResult
+
+logger = logging.getLogger(__name__)
+
+
+def _is_loopback(host: str) -> bool:
+    """Whether a TCP host only accepts connections from the same machine."""
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class _Request:
+    """A single prediction waiting to be processed by the server."""
+
+    def __init__(self, chains: list[Chain]) -> None:
+        self.chains = chains
+        self.result: OracleResult | None = None
+        self.error: Exception | None = None
+        self.done = threading.Event()
+
+
+class OracleServer:
+    """
+    Hosts an oracle (e.g. :class:`.ESMFold` or :class:`.ESM2`) in the current process and serves predictions to clients
+    connecting through a local socket, so that several minimizers running on the same node can share one loaded model.
+
+    Requests arriving at the same time, from one or many clients, are grouped into micro-batches and passed together to
+    :meth:`.Oracle.predict_batch`. A batch is sent to the oracle as soon as it holds ``max_batch_size`` requests, or
+    ``max_wait`` seconds after its first request arrived, whichever comes first.
+
+    Requests and results are exchanged as pickles, and unpickling data can run arbitrary code. The server and its
+    clients must therefore trust each other: only processes holding the ``authkey`` can connect, so keep it secret (by
+    default a random one is generated) and only share it with the processes of the same user. For the same reason, TCP
+    sockets are restricted to the loopback interface unless ``allow_remote`` is set.
+
+    Example
+    -------
+    In a dedicated process::
+
+        server = OracleServer(ESMFold(use_modal=True), address='/tmp/esmfold.sock')
+        pl.Path('/tmp/esmfold.key').write_bytes(server.authkey)  # e.g. in a file only the user can read
+        server.serve_forever()
+
+    and in each of the processes running a minimizer::
+
+        esmfold = FoldingOracleClient(address='/tmp/esmfold.sock', authkey=pl.Path('/tmp/esmfold.key').read_bytes())
+
+    Parameters
+    ----------
+    oracle : :class:`.Oracle`
+        The oracle to serve.
+    address : str | tuple[str, int] | None, default=None
+        Address to listen on: a path for a Unix socket, or a (host, port) tuple for a TCP socket. If None, a Unix socket
+        in a new temporary directory only the user can access is used, and its path can be read from :attr:`address`.
+    authkey : bytes | None, default=None
+        Key clients must present to connect. If None, a random 32-byte key is generated, and can be read from
+        :attr:`authkey`.
+    max_batch_size : int, default=8
+        Maximum number of requests sent to the oracle in a single call.
+    max_wait : float, default=0.05
+        Maximum time (in seconds) a request waits for others to be batched with.
+    allow_remote : bool, default=False
+        Whether a TCP socket can listen on an interface other than the loopback one, i.e. accept connections from
+        other machines.
+    """
+
+    def __init__(
+        self,
+        oracle: Oracle,
+        address: str | tuple[str, int] | None = None,
+        authkey: bytes | None = None,
+        max_batch_size: int = 8,
+        max_wait: float = 0.05,
+        allow_remote: bool = False,
+    ) -> None:
+        assert max_batch_size > 0, 'max_batch_size must be a positive integer'
+        assert max_wait >= 0, 'max_wait must be non-negative'
+        assert allow_remote or not isinstance(address, tuple) or _is_loopback(address[0]), (
+            f'{address[0]} is not a loopback address, set allow_remote=True to accept connections from other machines'
+        )
+        self.oracle = oracle
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batch_sizes: list[int] = []  # size of every batch sent to the oracle so far
+        self.authkey = os.urandom(32) if authkey is None else authkey
+        self._listener = Listener(address, family='AF_UNIX' if address is None else None, authkey=self.authkey)
+        self._queue: queue.Queue[_Request] = queue.Queue()
+        self._closed = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    @property
+    def address(self) -> Any:
+        """Address clients should connect to."""
+        return self._listener.address
+
+    def start(self) -> 'OracleServer':
+        """Start serving in background threads of the current process, and return immediately."""
+        for target in (self._accept_loop, self._batch_loop):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f'Serving {type(self.oracle).__name__} on {self.address}')
+        return self
+
+    def serve_forever(self) -> None:
+        """Serve until :meth:`close` is called (e.g. from a signal handler) or the process is interrupted."""
+        self.start()
+        try:
+            while not self._closed.wait(timeout=1.0):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """Stop accepting connections and processing requests."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        try:
+            Client(self.address, authkey=self.authkey).close()  # wakes up the accept loop, blocked on the socket
+        except OSError:
+            pass
+        self._listener.close()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout=5.0)
+
+    def __enter__(self) -> 'OracleServer':
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def _accept_loop(self) -> None:
+        while not self._closed.is_set():
+            try:
+                connection = self._listener.accept()
+            except Exception as exc:
+                if not self._closed.is_set():
+                    logger.warning(f'Failed to accept connection: {exc}')
+                continue
+            if self._closed.is_set():
+                connection.close()
+                return
+            threading.Thread(target=self._handle_connection, args=(connection,), daemon=True).start()
+
+    def _handle_connection(self, connection: Connection) -> None:
+        """Answer the messages of one client until it disconnects."""
+        with connection:
+            while not self._closed.is_set():
+                try:
+                    command, payload = connection.recv()
+                except (EOFError, OSError):
+                    return
+                if command == 'info':
+                    connection.send(('ok', self.oracle.result_class))
+                elif command == 'predict':
+                    requests = [_Request(chains) for chains in payload]
+                    for request in requests:
+                        self._queue.put(request)
+                    for request in requests:
+                        request.done.wait()
+                    errors = [request.error for request in requests if request.error is not None]
+                    if len(errors) > 0:
+                        connection.send(('error', errors[0]))
+                    else:
+                        connection.send(('ok', [request.result for request in requests]))
+                else:
+                    connection.send(('error', ValueError(f'Unknown command {command}')))
+
+    def _batch_loop(self) -> None:
+        """Group the queued requests into micro-batches and send them to the oracle."""
+        while not self._closed.is_set():
+            try:
+                batch = [self._queue.get(timeout=0.1)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: list[_Request]) -> None:
+        logger.debug(f'Sending a batch of {len(batch)} requests to {type(self.oracle).__name__}')
+        self.batch_sizes.append(len(batch))
+        try:
+            results = self.oracle.predict_batch([request.chains for request in batch])
+            assert len(results) == len(batch), f'{type(self.oracle).__name__} returned the wrong number of results'
+            for request, result in zip(batch, results):
+                request.result = result
+        except Exception as exc:
+            logger.exception(f'{type(self.oracle).__name__} failed to predict a batch of {len(batch)} requests')
+            for request in batch:
+                request.error = exc
+        for request in batch:
+            request.done.set()
+
+
+class OracleClient(Oracle):
+    """
+    Oracle forwarding all predictions to an :class:`OracleServer`, possibly running in another process.
+
+    The ``result_class`` is that of the oracle hosted by the server, so energy terms can use the client exactly like
+    the oracle itself. Use :class:`FoldingOracleClient` or :class:`EmbeddingOracleClient` for energy terms that require a
+    folding or an embedding oracle.
+
+    Parameters
+    ----------
+    address : str | tuple[str, int]
+        Address of the server, see :attr:`OracleServer.address`.
+    authkey : bytes
+        Key of the server, see :attr:`OracleServer.authkey`. Results are unpickled, so only connect to a server you
+        trust.
+    """
+
+    def __init__(self, address: str | tuple[str, int], authkey: bytes) -> None:
+        self.address = address
+        self._connection = Client(address, authkey=authkey)
+        self._lock = threading.Lock()  # a connection can only carry one request/response exchange at a time
+        self.result_class = self._send('info', None)
+
+    def __del__(self) -> None:
+        if hasattr(self, '_connection'):
+            self._connection.close()
+
+    def _send(self, command: str, payload: Any) -> Any:
+        with self._lock:
+            self._connection.send((command, payload))
+            status, response = self._connection.recv()
+        if status == 'error':
+            raise response
+        return response
+
+    def predict(self, chains: list[Chain]) -> OracleResult:
+        return self.predict_batch([chains])[0]
+
+    def predict_batch(self, chains_batch: list[list[Chain]]) -> list[OracleResult]:
+        """Send the requests to the server, which batches them with those of other clients."""
+        results = self._send('predict', chains_batch)
+        # results come back with copies of the chains, bind them to the chains of the caller instead
+        return [with_input_chains(result, chains) for result, chains in zip(results, chains_batch)]
+
+
+class FoldingOracleClient(OracleClient, FoldingOracle):  # type: ignore[misc]
+    """:class:`OracleClient` of a server hosting a :class:`.FoldingOracle`."""
+
+    result_class: Type[FoldingResult]
+
+    def __init__(self, address: str | tuple[str, int], authkey: bytes) -> None:
+        super().__init__(address=address, authkey=authkey)
+        assert issubclass(self.result_class, FoldingResult), 'The server does not host a FoldingOracle'
+
+    def fold(self, chains: list[Chain]) -> FoldingResult:
+        return self.predict(chains)  # type: ignore
+
+    def fold_batch(self, chains_batch: list[list[Chain]]) -> list[FoldingResult]:
+        return self.predict_batch(chains_batch)  # type: ignore
+
+
+class EmbeddingOracleClient(OracleClient, EmbeddingOracle):  # type: ignore[misc]
+    """:class:`OracleClient` of a server hosting an :class:`.EmbeddingOracle`."""
+
+    result_class: Type[EmbeddingResult]
+
+    def __init__(self, address: str | tuple[str, int], authkey: bytes) -> None:
+        super().__init__(address=address, authkey=authkey)
+        assert issubclass(self.result_class, EmbeddingResult), 'The server does not host an EmbeddingOracle'
+
+    def embed(self, chains: list[Chain]) -> EmbeddingResult:
+        return self.predict(chains)  # type: ignore
+
+    def _pre_process(self, chains: list[Chain]) -> Any:
+        """Pre-processing happens on the server."""
+        return chains
+
+    def _post_process(self, output: Any, chains: list[Chain]) -> EmbeddingResult:
+        """Post-processing happens on the server."""
+        return output  # type: ignore
@@ -0,0 +1,167 @@
+"""
+Persistent, content-addressed on-disk store of oracle results.
+
+MIT License
+
+Copyright (c) 2025 Jakub Lála, Ayham Al-Saffar, Stefano Angioletti-Uberti
+"""
+
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import pathlib as pl
+import logging
+from typing import Any, Type
+import numpy as np
+import numpy.typing as npt
+from biotite.structure import AtomArray
+from ..chain import Chain
+from .base import Oracle, OracleResult
+
+logger = logging.getLogger(__name__)
+
+
+class OracleResultStore:
+    """
+    Disk-backed store of :class:`.OracleResult` objects, shared across runs and processes.
+
+    Each result is saved under a key derived from the oracle (its class and configuration) and the ordered
+    (chain_ID, sequence) pairs it was called on. Every array field of the result is written to its own ``.npy`` file,
+    and an ``AtomArray`` field is split into its coordinates and one ``.npy`` file per annotation, so that large arrays
+    (e.g. the PAE of long complexes, embeddings) can be memory-mapped when read back, if requested.
+
+    Entries are first written to a private temporary directory and then renamed into place, which is atomic on POSIX
+    filesystems. Several processes can therefore read from and write to the same store: readers only ever see complete
+    entries, and when two writers race on the same key the second one simply discards its copy.
+
+    Parameters
+    ----------
+    root : pl.Path | str
+        Directory in which the results are stored. Created if it does not exist.
+    mmap : bool, default=False
+        Whether to memory-map the arrays of at least ``mmap_min_bytes`` when loading them, rather than reading them
+        fully into memory. Memory-mapped arrays are read-only, and each keeps its file open for as long as it is used
+        (e.g. held by an :class:`.OracleCache`), which counts towards the limit of open files of the process.
+    mmap_min_bytes : int, default=1 MiB
+        Size from which arrays are memory-mapped, if ``mmap`` is True. Smaller arrays are always read into memory.
+    """
+
+    def __init__(self, root: pl.Path | str, mmap: bool = False, mmap_min_bytes: int = 1 << 20) -> None:
+        self.root = pl.Path(root).expanduser().resolve()
+        self.mmap = mmap
+        self.mmap_min_bytes = mmap_min_bytes
+        (self.root / 'tmp').mkdir(parents=True, exist_ok=True)
+
+    def __copy__(self) -> Any:
+        """Return a reference of the store."""
+        return self
+
+    def __deepcopy__(self, memo: dict) -> Any:
+        """Return a reference of the store."""
+        return self
+
+    @staticmethod
+    def make_key(oracle: Oracle, chains: list[Chain]) -> str:
+        """Hash of the oracle configuration (and precision) and the sequences of the chains it is called on."""
+        content = {
+            'oracle': type(oracle).__name__,
+            'config': getattr(oracle, 'config', {}),
+            'chains': [[chain.chain_ID, chain.sequence] for chain in chains],
+        }
+        if oracle.precision != 'float64':  # keys of results stored in full precision are unchanged
+            content['precision'] = oracle.precision
+        return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+
+    def path(self, key: str) -> pl.Path:
+        """Directory of a given entry. The first two characters of the key are used to shard the store."""
+        return self.root / key[:2] / key
+
+    def __contains__(self, key: str) -> bool:
+        return self.path(key).is_dir()
+
+    def fetch(self, oracle: Oracle, chains: list[Chain]) -> OracleResult | None:
+        """Load the result of ``oracle.predict(chains)`` if it is in the store, otherwise return None."""
+        key = self.make_key(oracle, chains)
+        if key not in self:
+            return None
+        try:
+            arrays = self.load_arrays(key)
+        except (OSError, ValueError) as exc:  # e.g. entry removed by another process while reading
+            logger.warning(f'Could not read stored result {key}: {exc}')
+            return None
+        logger.debug(f'Loaded {type(oracle).__name__} result {key} from {self.root}')
+        if oracle.metrics is not None:
+            oracle.metrics.record_cache_hit(store=True)
+        return arrays_to_result(oracle.result_class, arrays, input_chains=chains)
+
+    def save(self, oracle: Oracle, chains: list[Chain], result: OracleResult) -> None:
+        """Store the result of ``oracle.predict(chains)``."""
+        key = self.make_key(oracle, chains)
+        if key in self:
+            return
+        metadata = {
+            'oracle': type(oracle).__name__,
+            'result_class': type(result).__name__,
+            'chains': [[chain.chain_ID, chain.sequence] for chain in chains],
+        }
+        self.save_arrays(key, result_to_arrays(result), metadata)
+
+    def load_arrays(self, key: str) -> dict[str, npt.NDArray[Any]]:
+        """Load all arrays of an entry, the large ones memory-mapped if ``self.mmap`` is True."""
+        arrays = {}
+        for file in sorted(self.path(key).glob('*.npy')):
+            mmap_mode: Any = 'r' if self.mmap and file.stat().st_size >= self.mmap_min_bytes else None
+            arrays[file.stem] = np.load(file, mmap_mode=mmap_mode)
+        return arrays
+
+    def save_arrays(self, key: str, arrays: dict[str, npt.NDArray[Any]], metadata: dict[str, Any]) -> None:
+        """Atomically write all arrays of an entry."""
+        tmp_path = self.root / 'tmp' / f'{key}.{os.getpid()}.{uuid.uuid4().hex}'
+        tmp_path.mkdir(parents=True)
+        try:
+            for name, array in arrays.items():
+                np.save(tmp_path / f'{name}.npy', np.ascontiguousarray(array), allow_pickle=False)
+            with open(tmp_path / 'metadata.json', mode='w') as file:
+                json.dump(metadata, file)
+            final_path = self.path(key)
+            final_path.parent.mkdir(parents=True, exist_ok=True)
+            os.rename(tmp_path, final_path)
+        except OSError:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            if not self.path(key).is_dir():  # otherwise another process stored the same entry first
+                raise
+
+
+def result_to_arrays(result: OracleResult) -> dict[str, npt.NDArray[Any]]:
+    """Flattens all array and AtomArray fields of an OracleResult into a dictionary of numpy arrays."""
+    arrays: dict[str, npt.NDArray[Any]] = {}
+    for name in type(result).model_fields:
+        value = getattr(result, name)
+        if isinstance(value, AtomArray):
+            arrays[f'{name}.coord'] = value.coord
+            for category in value.get_annotation_categories():
+                arrays[f'{name}.{category}'] = value.get_annotation(category)
+        elif isinstance(value, np.ndarray):
+            arrays[name] = value
+    return arrays
+
+
+def arrays_to_result(
+    result_class: Type[OracleResult], arrays: dict[str, npt.NDArray[Any]], input_chains: list[Chain]
+) -> OracleResult:
+    """Inverse of :func:`result_to_arrays`."""
+    fields: dict[str, Any] = {}
+    for key, array in arrays.items():
+        name, _, category = key.partition('.')
+        if category == '':
+            fields[name] = array
+            continue
+        if name not in fields:
+            fields[name] = AtomArray(len(arrays[f'{name}.coord']))
+        if category == 'coord':
+            fields[name].coord = array
+        else:
+            fields[name].set_annotation(category, array)
+    return result_class(input_chains=input_chains, **fields)
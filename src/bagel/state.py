@@ -6,20 +6,26 @@ MIT License
 Copyright (c) 2025 Jakub Lála, Ayham Al-Saffar, Stefano Angioletti-Uberti
 """
 
-from .chain import Chain
-from .oracles import Oracle, FoldingOracle, OraclesResultDict
+from .chain import Chain, chains_fingerprint
+from .oracles import Oracle, OracleResult, FoldingOracle, OraclesResultDict, OracleCache
+from .oracles.cache import with_input_chains, chains_sequences
+from .oracles.folding import ESMFoldResult
 from .energies import EnergyTerm
 from typing import Optional
 from pathlib import Path
 from biotite.structure.io.pdbx import CIFFile, set_structure
 from dataclasses import dataclass, field
-from typing import List, Any
+from typing import List, Any, Callable, TypeVar
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
 import numpy as np
+import time
 import logging
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar('T')
+
 
 @dataclass
 class State:
@@ -35,6 +41,21 @@ class State:
         List of single monomeric Chains in this State.
     energy_terms : List[:class:`.EnergyTerm`]
         Collection of EnergyTerms that define the State.
+    oracle_cache : Optional[:class:`.OracleCache`], default=None
+        Cache consulted before calling an oracle. It can be shared between States, and is never copied with them.
+    concurrent_oracles : bool, default=False
+        Whether to call the different oracles of this State concurrently (one thread each) rather than one after the
+        other. Useful when oracles are remote, e.g. ESMFold and ESM-2 on Modal, as the time to get all results is then
+        that of the slowest oracle instead of the sum of all of them.
+    keep_full_pae : bool, default=True
+        Whether to keep (and log) the full PAE matrices of the folding results of this State. If False, only the rows
+        and columns of the residues read by its PAE-based energy terms (e.g. :class:`.PAEEnergy`, :class:`.LISEnergy`)
+        are kept, see :meth:`.ESMFoldResult.restrict_pae`, so that the memory held by a State (and by the copies made at
+        every step) scales with the size of the interface rather than with the square of the length of the complex. The
+        '.pae' files logged then only hold these rows and columns, and are not written if there are none.
+
+    The energy terms are bound to the chains when the State is created (see :meth:`.EnergyTerm.bind`), so that adding
+    or removing a residue does not shift the residue indexes stored by every term.
 
     Attributes
     ----------
@@ -49,13 +70,21 @@ class State:
     name: str
     chains: List[Chain]
     energy_terms: List[EnergyTerm]
+    oracle_cache: Optional[OracleCache] = None
+    concurrent_oracles: bool = False
+    keep_full_pae: bool = True
     _energy: Optional[float] = field(default=None, init=False)
     _oracles_result: OraclesResultDict = field(default_factory=lambda: OraclesResultDict(), init=False)
     _energy_terms_value: dict[(str, float)] = field(default_factory=lambda: {}, init=False)
 
     def __post_init__(self) -> None:
         """Sanity check."""
-        return
+        self.bind_energy_terms()
+
+    def bind_energy_terms(self) -> None:
+        """Let the energy terms refer to the residues of the chains of this state by their stable ID."""
+        for term in self.energy_terms:
+            term.bind(self.chains)
 
     def __copy__(self) -> Any:
         """Copy the state object, setting the structure and energy to None."""
@@ -65,17 +94,35 @@ class State:
     def oracles_list(self) -> list[Oracle]:
         return list(set([term.oracle for term in self.energy_terms]))
 
+    @property
+    def fingerprint(self) -> int:
+        """64-bit fingerprint of the ordered chain IDs and sequences of the state, see :attr:`.Chain.fingerprint`."""
+        return chains_fingerprint(self.chains)
+
     @property
     def total_sequence(self) -> List[str]:
         return [chain.sequence for chain in self.chains]
 
+    def _predict(self, oracle: Oracle) -> OracleResult:
+        """Get the prediction of an oracle for the chains of this State, going through the cache if there is one."""
+        if self.oracle_cache is None:
+            return oracle.predict(chains=self.chains)
+        return self.oracle_cache.predict(oracle, self.chains)
+
     def get_energy(self) -> float:
         """Calculate energy of state using energy terms ."""
+        if self._energy is not None and self._energy_terms_value != {}:  # If energies already calculated
+            return self._energy
+        self.bind_energy_terms()  # in case chains were added to the state
+
         if self._energy_terms_value == {}:  # If energies not yet calculated
             # Check if the output of the oracle is already calculated, otherwise calculate it
-            for oracle in self.oracles_list:
-                if oracle not in self._oracles_result:
-                    self._oracles_result[oracle] = oracle.predict(chains=self.chains)
+            missing_oracles = [oracle for oracle in self.oracles_list if oracle not in self._oracles_result]
+            results = map_oracles(self._predict, missing_oracles, concurrent=self.concurrent_oracles)
+            for oracle, result in zip(missing_oracles, results):
+                self._oracles_result[oracle] = result
+        if not self.keep_full_pae:
+            self.restrict_pae()
 
         # Check that all energy term names are unique
         energy_term_names = [term.name for term in self.energy_terms]
@@ -96,6 +143,25 @@ class State:
 
         return self._energy
 
+    def restrict_pae(self) -> None:
+        """
+        Keep only the rows and columns of the PAE matrices read by the energy terms of the State. Results are replaced
+        by restricted copies, so that results shared with other States or with an :class:`.OracleCache` are untouched.
+        """
+        for oracle, result in self._oracles_result.items():
+            if not isinstance(result, ESMFoldResult) or not isinstance(result.pae, np.ndarray) or result.pae.ndim != 3:
+                continue
+            index = self._oracles_result.get_structure_index(oracle)
+            masks = [
+                term.get_residue_mask(index, residue_group_index=i)
+                for term in self.energy_terms
+                if term.reads_pae and term.oracle is oracle
+                for i in range(len(term.residue_groups))
+            ]
+            residues = np.flatnonzero(np.logical_or.reduce(masks)) if len(masks) > 0 else np.array([], dtype=int)
+            if result.pae_residues is None or not np.array_equal(result.pae_residues, residues):
+                self._oracles_result[oracle] = result.restrict_pae(residues)
+
     def to_cif(self, oracle: FoldingOracle, filepath: Path) -> bool:
         """
         Write the state to a CIF file of a specific FoldingOracle.
@@ -121,7 +187,7 @@ class State:
             return True
 
     def total_residues(self) -> int:
-        return sum([len(chain.residues) for chain in self.chains])
+        return sum([chain.length for chain in self.chains])
 
     def remove_residue_from_all_energy_terms(self, chain_ID: str, residue_index: int) -> None:
         """Remove the residue from the energy terms associated to it in the current state."""
@@ -179,9 +245,71 @@ class State:
             # Add the residue to the energy term if the parent residue is part of it and the term is inheritable
             # The function automatically checks if the parent is also in it, or not.
             if term.inheritable:
-                # Just a double check here before proceeding
-                parent_index = parent_residue.index
+                # The parent is next to the added residue, its index is known without renumbering the whole chain
+                parent_index = residue_index - 1 if parent_residue is left_residue else residue_index + 1
                 assert parent_residue.chain_ID == chain_ID, (
                     'The parent residue is not in the same chain, should not happen!'
                 )
                 term.add_residue(chain_ID, residue_index, parent_index)
+
+
+def map_oracles(function: Callable[[Oracle], T], oracles: List[Oracle], concurrent: bool = False) -> List[T]:
+    """
+    Apply ``function`` to each oracle, returning the outputs in the same order. If ``concurrent`` is True, each oracle
+    is handled in its own thread, so that calls that mostly wait on remote oracles overlap with each other.
+    """
+    if not concurrent or len(oracles) < 2:
+        return [function(oracle) for oracle in oracles]
+    with ThreadPoolExecutor(max_workers=len(oracles)) as executor:
+        return list(executor.map(function, oracles))
+
+
+def predict_states(states: List[State]) -> None:
+    """
+    Fill in the missing oracle results of several States, making a single batched call per oracle.
+
+    This lets oracles that support batching (see :meth:`.Oracle.predict_batch`) process many States at once, e.g. all
+    States of a System, or the same State in several proposed Systems, instead of one round trip per State. Identical
+    requests, i.e. the same oracle called on chains with the same IDs and sequences, are only sent once and their result
+    is shared by all the States asking for it. Results found in the oracle caches of the States are reused, and newly
+    computed results are added to them. If any of the States has ``concurrent_oracles`` set, the different oracles are
+    called concurrently.
+    """
+    # oracle -> (chain_ID, sequence) pairs -> States waiting for that prediction
+    pending: dict[Oracle, dict[tuple[tuple[str, str], ...], List[State]]] = {}
+    for state in states:
+        if state._energy_terms_value != {}:  # energies already calculated
+            continue
+        for oracle in state.oracles_list:
+            if oracle in state._oracles_result:
+                continue
+            if state.oracle_cache is not None:
+                cached = state.oracle_cache.get(oracle, state.chains)
+                if cached is not None:
+                    state._oracles_result[oracle] = cached
+                    continue
+            key = chains_sequences(state.chains)  # not the fingerprints, as two sequences may share one
+            pending.setdefault(oracle, {}).setdefault(key, []).append(state)
+
+    def predict_pending(oracle: Oracle) -> tuple[List[OracleResult], float]:
+        start = time.perf_counter()
+        results = oracle.predict_batch([key_states[0].chains for key_states in pending[oracle].values()])
+        return results, (time.perf_counter() - start) / len(pending[oracle])
+
+    oracles = list(pending.keys())
+    concurrent = any(state.concurrent_oracles for state in states)
+    for oracle, (results, elapsed) in zip(oracles, map_oracles(predict_pending, oracles, concurrent=concurrent)):
+        requests = list(pending[oracle].values())
+        assert len(results) == len(requests), f'{type(oracle).__name__} returned the wrong number of results'
+        logger.debug(
+            f'Predicted {len(requests)} unique requests of {sum(len(r) for r in requests)} states '
+            f'with a single call to {type(oracle).__name__}'
+        )
+        for key_states, result in zip(requests, results):
+            for state in key_states:
+                state._oracles_result[oracle] = with_input_chains(result, state.chains)
+            caches = {
+                id(state.oracle_cache): state.oracle_cache for state in key_states if state.oracle_cache is not None
+            }
+            for cache in caches.values():
+                cache.put(oracle, key_states[0].chains, result, elapsed=elapsed)
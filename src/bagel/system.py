@@ -7,13 +7,17 @@ Copyright (c) 2025 Jakub Lála, Ayham Al-Saffar, Stefano Angioletti-Uberti
 """
 
 from . import __version__ as bagel_version
-from .state import State
-from .chain import Chain, Residue
-from dataclasses import dataclass
+from .state import State, predict_states
+from .chain import Chain, CompactChain, Residue, combine_fingerprints
+from .energies import ResidueGroup
+from .oracles import OraclesResultDict
+from dataclasses import dataclass, field
+from typing import Any
 
 from .oracles.folding import FoldingOracle, FoldingResult
 from .constants import aa_dict
 from copy import deepcopy
+from concurrent.futures import ThreadPoolExecutor
 import pathlib as pl
 import numpy as np
 
@@ -25,21 +29,80 @@ logger = logging.getLogger(__name__)
 @dataclass
 class System:
     """Top level object defining the input for a protein design pipeline. In practice, a system will be a collection of
-    states, each representing a (potentially different) collection of chains."""
+    states, each representing a (potentially different) collection of chains.
+
+    If ``n_workers`` is larger than 1, the states are evaluated in parallel by a pool of that many threads, each state
+    calling its own oracles and computing its own energy terms, rather than being batched together."""
 
     states: list[State]
     name: str | None = None
     total_energy: float | None = None
+    n_workers: int = 1
+    _chain_registry: tuple[tuple[int, ...], list[Chain]] | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     def __copy__(self) -> 'System':
         """Copy the system object, setting the energy to None"""
         return deepcopy(self)
 
+    def proposal_copy(self) -> 'System':
+        """
+        Copy the system to propose a move on. Chains, energy terms (with their residue groups) and energies are copied
+        as in :meth:`__copy__`, but the oracle results of the states are shared with this system instead of being
+        deep-copied: those of the states affected by the move are discarded right after (see
+        :meth:`.MutationProtocol.reset_system`), and those of the other states are never modified. The cost of a copy
+        therefore does not depend on the size of the structures, PAE matrices or embeddings held by the system.
+        """
+        memo: dict[int, Any] = {
+            id(result): result for state in self.states for result in state._oracles_result.values()
+        }
+        return deepcopy(self, memo)
+
+    def snapshot(self) -> 'SystemSnapshot':
+        """Lightweight record of the system, e.g. of the best system found by a minimizer, see :class:`SystemSnapshot`."""
+        return SystemSnapshot(self)
+
+    @property
+    def unique_chains(self) -> list[Chain]:
+        """
+        Chains of all the states, each counted once (by identity, as a chain shared by several states is the same
+        object), in order of first appearance. Cached until the chains of a state change.
+        """
+        key = tuple(id(chain) for state in self.states for chain in state.chains)
+        if self._chain_registry is None or self._chain_registry[0] != key:
+            chains = {id(chain): chain for state in self.states for chain in state.chains}
+            self._chain_registry = (key, list(chains.values()))
+        return self._chain_registry[1]
+
+    @property
+    def fingerprint(self) -> int:
+        """
+        64-bit fingerprint of the sequences of all the states, in order, e.g. to keep track of the visited systems or
+        deduplicate proposals. It is updated in O(1) per mutated residue, see :attr:`.Chain.fingerprint`.
+        """
+        return combine_fingerprints(state.fingerprint for state in self.states)
+
     def get_total_energy(self) -> float:
         if self.total_energy is None:
-            self.total_energy = np.sum([state.get_energy() for state in self.states])
+            if self.n_workers > 1 and len(self.states) > 1:
+                with ThreadPoolExecutor(max_workers=min(self.n_workers, len(self.states))) as executor:
+                    state_energies = list(executor.map(State.get_energy, self.states))
+            else:
+                predict_states(self.states)  # one call per oracle for all the states
+                state_energies = [state.get_energy() for state in self.states]
+            self.total_energy = np.sum(state_energies)
         return self.total_energy
 
+    @staticmethod
+    def get_total_energies(systems: list['System']) -> list[float]:
+        """
+        Calculate the total energy of several Systems (e.g. K proposals of the same step), sending all their States to
+        each oracle in a single batched call rather than one call per State.
+        """
+        predict_states([state for system in systems if system.total_energy is None for state in system.states])
+        return [system.get_total_energy() for system in systems]
+
     def dump_logs(self, step: int, path: pl.Path, save_structure: bool = True) -> None:
         r"""
         Saves logging information for the system under the given directory path. This folder contains:
@@ -87,7 +150,7 @@ class System:
                 file.write(f'{":".join(state.total_sequence)}\n')
 
             mask_per_chain = [
-                ''.join(['M' if residue.mutable else 'I' for residue in chain.residues]) for chain in state.chains
+                ''.join(['M' if mutable else 'I' for mutable in chain.mutability]) for chain in state.chains
             ]
             with open(path / f'{state.name}.mask.fasta', mode='a') as mask_file:
                 mask_file.write(f'>{step}\n')
@@ -161,3 +224,85 @@ class System:
         # Add the chain to the states it is part of
         for st_idx in state_index:
             self.states[st_idx].chains.append(new_chain)
+
+
+class SystemSnapshot:
+    """
+    Lightweight record of a :class:`System`: the sequences and mutability masks of its chains, the residue groups of
+    its energy terms, its energies, and references to the oracle results of its states. Oracle results are never
+    modified once computed, so they are shared with the system rather than copied, and taking a snapshot costs a
+    fraction of a copy of the system.
+
+    A snapshot can log itself like a System (:meth:`dump_logs`), and is turned back into a full System with
+    :meth:`to_system` only when needed, e.g. to restart a minimization from it or to return it.
+
+    Parameters
+    ----------
+    system : System
+        System to record. Its energy must be calculated.
+    """
+
+    def __init__(self, system: System) -> None:
+        assert system.total_energy is not None, 'System energy not calculated. Call get_total_energy() first.'
+        self.total_energy = system.total_energy
+        # chains shared by several states are recorded once, and shared again by the states of the snapshot
+        self._chains = {id(chain): CompactChain.from_chain(chain) for chain in system.unique_chains}
+        self.states: list[State] = []
+        self.residue_groups: list[list[list[ResidueGroup]]] = []  # for each state, for each energy term
+        for state in system.states:
+            slim_state = State(
+                name=state.name, chains=[self._chains[id(chain)] for chain in state.chains], energy_terms=[]
+            )
+            slim_state._energy = state._energy
+            slim_state._energy_terms_value = dict(state._energy_terms_value)
+            slim_state._oracles_result = OraclesResultDict(state._oracles_result)
+            self.states.append(slim_state)
+            self.residue_groups.append(
+                [
+                    [(chain_ids.copy(), res_indices.copy()) for chain_ids, res_indices in term.residue_groups]
+                    for term in state.energy_terms
+                ]
+            )
+        # system without energy terms, only used for logging
+        self._system = System(states=self.states, name=system.name, total_energy=system.total_energy)
+
+    def dump_logs(self, step: int, path: pl.Path, save_structure: bool = True) -> None:
+        """Same logs as :meth:`System.dump_logs` for the recorded system."""
+        self._system.dump_logs(step, path, save_structure=save_structure)
+
+    def to_system(self, template: System) -> System:
+        """
+        Full System with the recorded sequences, residue groups, energies and oracle results.
+
+        Parameters
+        ----------
+        template : System
+            System the snapshot was taken from, or any system obtained from it by moves (e.g. the current system of a
+            minimizer). Its energy terms and settings are copied, while its chains are replaced by the recorded ones.
+            It is left untouched.
+        """
+        chains = list(self._chains.values())
+        template_chains = template.unique_chains
+        assert len(template_chains) == len(chains), 'template must have the same chains as the recorded system'
+        # chains are built from the record, and oracle results are shared, instead of being copied from the template
+        memo: dict[int, Any] = {
+            id(result): result for state in template.states for result in state._oracles_result.values()
+        }
+        for template_chain, chain in zip(template_chains, chains):
+            memo[id(template_chain)] = type(template_chain)(
+                [
+                    Residue(name=name, chain_ID=chain.chain_ID, index=i, mutable=mutable)
+                    for i, (name, mutable) in enumerate(zip(chain.sequence, chain.mutability))
+                ]
+            )
+        system: System = deepcopy(template, memo)
+        system.total_energy = self.total_energy
+        for state, slim_state, residue_groups in zip(system.states, self.states, self.residue_groups):
+            state._energy = slim_state._energy
+            state._energy_terms_value = dict(slim_state._energy_terms_value)
+            state._oracles_result = OraclesResultDict(slim_state._oracles_result)
+            for term, term_residue_groups in zip(state.energy_terms, residue_groups):
+                term.residue_groups = [
+                    (chain_ids.copy(), res_indices.copy()) for chain_ids, res_indices in term_residue_groups
+                ]
+        return system
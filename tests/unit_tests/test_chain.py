@@ -1,5 +1,9 @@
 import pytest
+import sys
+import threading
+import numpy as np
 import bagel as bg
+from typing import Iterator
 
 
 def test_remove_residue_from_start_of_chain(short_chain: bg.Chain) -> None:
@@ -58,3 +62,137 @@ def test_custom_chain_ids(base_sequence: str) -> None:
             bg.Residue(name=aa, chain_ID='TOO_LONG_CHAIN_ID', index=i, mutable=True)
             for i, aa in enumerate(base_sequence)
         ]
+
+
+@pytest.mark.parametrize('edit', ['mutate', 'add', 'remove'])
+def test_compact_chain_matches_chain_after_edit(short_chain: bg.Chain, edit: str) -> None:
+    compact = bg.CompactChain.from_chain(short_chain)
+    assert compact == short_chain and compact.sequence == short_chain.sequence
+    for chain in (short_chain, compact):
+        if edit == 'mutate':
+            chain.mutate_residue(index=1, amino_acid='W')
+        elif edit == 'add':
+            chain.add_residue(amino_acid='W', index=1)
+        else:
+            chain.remove_residue(index=1)
+    assert compact.sequence == short_chain.sequence, 'cached sequence not updated'
+    assert compact.mutability == short_chain.mutability
+    assert compact.mutable_residue_indexes == short_chain.mutable_residue_indexes
+    assert compact.residues == short_chain.residues
+
+
+def test_compact_chain_residue_views_write_through_to_chain() -> None:
+    chain = bg.CompactChain.from_sequence('GSVK', chain_ID='B', mutable=[False, True, True, True])
+    residue = chain.residues[2]
+    assert (residue.name, residue.chain_ID, residue.index, residue.mutable) == ('V', 'B', 2, True)
+    residue.name = 'L'
+    residue.mutable = False
+    assert chain.sequence == 'GSLK'
+    assert chain.mutable_residue_indexes == [1, 3]
+    with pytest.raises(AssertionError):
+        chain.mutate_residue(index=0, amino_acid='A')
+
+
+def test_residue_indexes_are_renumbered_when_read_after_several_edits(monkeypatch) -> None:
+    chain = bg.Chain([bg.Residue(name='A', chain_ID='A', index=i) for i in range(1000)])
+    last = chain.residues[-1]
+    chain.add_residue(amino_acid='G', index=500)
+    chain.remove_residue(index=10)
+    chain.add_residue(amino_acid='V', index=0)
+    assert chain._renumber_from == 1, 'residues were renumbered before any index was read'
+    assert last.index == 1000
+    assert [residue.index for residue in chain.residues] == list(range(chain.length))
+
+    monkeypatch.setattr(bg.Chain, 'debug_checks', True)
+    chain.residues[3].index = 7
+    with pytest.raises(AssertionError):
+        chain.remove_residue(index=999)
+
+
+@pytest.fixture
+def frequent_thread_switches() -> Iterator[None]:
+    """Make the interpreter switch threads as often as possible, so that races show up."""
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(switch_interval)
+
+
+def test_residue_indexes_read_concurrently_after_an_edit_are_up_to_date(frequent_thread_switches) -> None:
+    chain = bg.Chain([bg.Residue(name='A', chain_ID='A', index=i, mutable=True) for i in range(3000)])
+    for trial in range(20):
+        chain.add_residue(amino_acid='G', index=0) if trial % 2 == 0 else chain.remove_residue(index=0)
+        barrier = threading.Barrier(8)
+        indexes: list[list[int]] = []
+
+        def read_indexes() -> None:
+            barrier.wait(timeout=5)
+            indexes.append([residue.index for residue in reversed(chain.residues)])
+
+        threads = [threading.Thread(target=read_indexes) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert all(read == list(range(chain.length))[::-1] for read in indexes)
+
+
+def test_residue_positions_looked_up_concurrently_after_an_edit_are_up_to_date(frequent_thread_switches) -> None:
+    for chain_class in (bg.Chain, bg.CompactChain):
+        chain = chain_class([bg.Residue(name='A', chain_ID='A', index=i, mutable=True) for i in range(3000)])
+        for _ in range(10):
+            chain.add_residue(amino_acid='G', index=0)
+            uids = chain.residue_uids
+            barrier = threading.Barrier(8)
+            positions: list[np.ndarray] = []
+
+            def look_up_positions() -> None:
+                barrier.wait(timeout=5)
+                positions.append(chain.residue_positions(uids))
+
+            threads = [threading.Thread(target=look_up_positions) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert all(np.array_equal(found, np.arange(chain.length)) for found in positions)
+
+
+def test_chain_number_of_mutable_residues_is_kept_up_to_date(short_chain: bg.Chain) -> None:
+    assert short_chain.n_mutable == 5
+    short_chain.residues[0].mutable = False
+    assert short_chain.n_mutable == 4
+    short_chain.add_residue(amino_acid='A', index=2)
+    short_chain.remove_residue(index=4)
+    short_chain.add_residue(amino_acid='A', index=0)
+    assert short_chain.n_mutable == len(short_chain.mutable_residue_indexes) == 5
+
+
+def test_chain_fingerprint_is_updated_with_the_sequence(short_chain: bg.Chain) -> None:
+    compact = bg.CompactChain.from_chain(short_chain)
+    fingerprint = short_chain.fingerprint
+    assert compact.fingerprint == fingerprint
+    for chain in (short_chain, compact):
+        chain.mutate_residue(index=1, amino_acid='W')
+        assert chain._fingerprint is not None, 'fingerprint was not updated in place'
+        assert chain.fingerprint != fingerprint
+        chain.residues[1].name = 'C'
+        assert chain.fingerprint == fingerprint
+        chain.add_residue(amino_acid='A', index=0)
+        chain.remove_residue(index=3)
+        chain.mutate_residue(index=2, amino_acid='W')
+        assert chain.sequence == 'ACWCC'
+    fresh = bg.Chain([bg.Residue(name=name, chain_ID='A', index=i) for i, name in enumerate('ACWCC')])
+    assert short_chain.fingerprint == compact.fingerprint == fresh.fingerprint
+
+
+@pytest.mark.parametrize('chain_class', [bg.Chain, bg.CompactChain])
+def test_chain_fingerprint_is_updated_when_mutating_with_negative_index(chain_class) -> None:
+    chain = chain_class([bg.Residue(name=aa, chain_ID='A', index=i, mutable=True) for i, aa in enumerate('GSVKLE')])
+    chain.fingerprint  # cached, then updated in place
+    chain.mutate_residue(index=-1, amino_acid='W')
+    chain.mutate_residue(index=-6, amino_acid='A')
+    assert chain.sequence == 'ASVKLW'
+    assert chain.fingerprint == bg.chain.sequence_fingerprint(
+        bg.chain._letter_codes[np.frombuffer(b'ASVKLW', np.uint8)]
+    )
@@ -293,6 +293,54 @@ def test_SurfaceAreaEnergy(
     assert np.isclose(weighted_energy, value * 2), 'weighted energy is incorrect'
 
 
+@patch('bagel.energies.sasa', wraps=sasa)
+def test_sasa_is_computed_once_per_atom_folding_result_and_probe_radius(
+    mock_sasa: Mock,
+    fake_esmfold: bg.oracles.folding.ESMFold,
+    small_structure_residues: list[bg.Residue],
+    small_structure: AtomArray,
+) -> None:
+    energies = [
+        bg.energies.SurfaceAreaEnergy(oracle=fake_esmfold, residues=small_structure_residues[:1]),
+        bg.energies.SurfaceAreaEnergy(oracle=fake_esmfold, name='all'),
+        bg.energies.HydrophobicEnergy(oracle=fake_esmfold, mode='surface'),
+        bg.energies.HydrophobicEnergy(oracle=fake_esmfold, mode='core'),
+        bg.energies.SurfaceAreaEnergy(oracle=fake_esmfold, probe_radius=2.0, name='large_probe'),
+    ]
+    mock_folding_result = Mock(bg.oracles.folding.ESMFoldResult)
+    mock_folding_result.structure = small_structure
+    oracles_result = OraclesResultDict({fake_esmfold: mock_folding_result})
+    values = [energy.compute(oracles_result=oracles_result) for energy in energies]
+    assert values == [energy.compute(oracles_result=oracles_result) for energy in energies]
+
+    targets: dict[float, list[np.ndarray]] = {}
+    for call in mock_sasa.call_args_list:
+        targets.setdefault(call.kwargs['probe_radius'], []).append(call.kwargs['atom_filter'])
+    assert [len(calls) for calls in targets.values()] == [2, 1], 'the first term only computes its own atoms'
+    assert np.array_equal(np.sum(targets[bg.constants.probe_radius_water], axis=0), np.ones(len(small_structure)))
+
+    selected_sasa = energies[0].compute(oracles_result=oracles_result)[0] * energies[0].max_sasa
+    assert np.isclose(selected_sasa, np.mean(sasa(small_structure)[:2]))  # same as computing all atoms
+
+
+def test_sasa_energies_are_identical_to_computing_the_sasa_of_all_atoms() -> None:
+    oracle = bg.oracles.SyntheticFoldingOracle()
+    chain = bg.Chain([bg.Residue(name=aa, chain_ID='A', index=i) for i, aa in enumerate('GAVLIFMWSTKEVLAG' * 2)])
+    oracles_result = OraclesResultDict({oracle: oracle.predict([chain])})
+    structure = oracles_result.get_structure(oracle)
+    all_sasa = sasa(structure, probe_radius=bg.constants.probe_radius_water)
+    for residues in (chain.residues[4:20], None):
+        surface = bg.energies.SurfaceAreaEnergy(oracle, residues=residues)
+        mask = surface.get_atom_mask(structure, 0) if residues is not None else np.full(len(structure), True)
+        assert surface.compute(oracles_result)[0] == np.mean(all_sasa[mask]) / surface.max_sasa
+        selected = mask & np.isin(structure.res_name, bg.constants.hydrophobic_residues)
+        fraction = np.count_nonzero(selected) / np.count_nonzero(mask)
+        normalized_sasa = all_sasa[selected] / bg.constants.max_sasa_values['S']
+        for mode, expected in (('surface', normalized_sasa), ('core', 1.0 - normalized_sasa)):
+            hydrophobic = bg.energies.HydrophobicEnergy(oracle, residues=residues, mode=mode)
+            assert hydrophobic.compute(oracles_result)[0] == fraction * np.mean(expected)
+
+
 @patch('bagel.energies.sasa')
 def test_HydrophobicEnergy(
     mock_sasa: Mock,
@@ -455,6 +503,42 @@ def test_FlexEvobindEnergy_Symmetrized(
     assert np.isclose(weighted_energy, np.sqrt(5.0)), 'no-plddt and weighted energy is incorrect'
 
 
+def test_nearest_distances_match_brute_force_for_near_and_far_points() -> None:
+    rng = np.random.default_rng(0)
+    targets = rng.uniform(0, 20, size=(300, 3)).astype(np.float32)
+    coord = np.concatenate([rng.uniform(0, 20, size=(50, 3)), rng.uniform(40, 60, size=(50, 3))]).astype(np.float32)
+    expected = np.min(np.linalg.norm(targets[np.newaxis, :, :] - coord[:, np.newaxis, :], axis=2), axis=1)
+    assert np.array_equal(bg.energies.nearest_distances(coord, targets), expected), 'distances should be identical'
+    assert np.all(np.isinf(bg.energies.nearest_distances(coord, targets[:0])))
+
+
+def test_FlexEvoBindEnergy_matches_brute_force_minimum_distances() -> None:
+    oracle = bg.oracles.SyntheticFoldingOracle()
+    chains = [
+        bg.Chain([bg.Residue(name=aa, chain_ID='A', index=i) for i, aa in enumerate('MKTAYIAKQRQISFVKSHFSRQ' * 3)]),
+        bg.Chain([bg.Residue(name=aa, chain_ID='B', index=i) for i, aa in enumerate('GWEVLKDAC')]),
+    ]
+    result = oracle.predict(chains)
+    groups = (chains[1].residues, chains[0].residues[::4])
+    for shift in (0.0, 50.0):  # binder next to and far from its target
+        structure = result.structure.copy()
+        structure.coord[structure.chain_id == 'B'] += shift
+        energy = bg.energies.FlexEvoBindEnergy(oracle=oracle, residues=groups, symmetrized=True)
+        value, _ = energy.compute(OraclesResultDict({oracle: result.model_copy(update={'structure': structure})}))
+
+        def atoms_of(residues: list[bg.Residue]) -> AtomArray:
+            masks = [(structure.chain_id == res.chain_ID) & (structure.res_id == res.index) for res in residues]
+            return structure[np.logical_or.reduce(masks)]
+
+        min_distances = []
+        for main, partner in ((0, 1), (1, 0)):
+            partner_atoms = atoms_of(groups[partner])
+            for residue in groups[main]:
+                diff = partner_atoms.coord[np.newaxis, :, :] - atoms_of([residue]).coord[:, np.newaxis, :]
+                min_distances.append(float(np.min(np.linalg.norm(diff, axis=2))))
+        assert np.isclose(value, np.mean(min_distances))
+
+
 def test_RingSymmetryEnergy(
     fake_esmfold: bg.oracles.folding.ESMFold,
     square_structure_residues: list[bg.Residue],
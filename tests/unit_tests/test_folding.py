@@ -47,3 +47,71 @@ def test_trimer_folding(esmfold, trimer):
 
     # Test custom chain IDs
     assert np.all(np.unique(results.structure.chain_id) == ['C-A', 'C-B', 'C-C']), 'Chain IDs should be C-A, C-B, C-C'
+
+
+def test_synthetic_folding_oracle_is_deterministic_and_plausible() -> None:
+    oracle = bg.oracles.SyntheticFoldingOracle()
+    chains = [
+        bg.Chain([bg.Residue(name=aa, chain_ID='A', index=i) for i, aa in enumerate('MKWVG')]),
+        bg.Chain([bg.Residue(name=aa, chain_ID='B', index=i) for i, aa in enumerate('CDY')]),
+    ]
+    results = oracle.fold(chains)
+
+    assert isinstance(results, bg.oracles.folding.ESMFoldResult)
+    assert np.array_equal(results.structure.coord, oracle.fold(chains).structure.coord), 'folding is not deterministic'
+    assert results.local_plddt.shape == (1, 8) and results.pae.shape == (1, 8, 8) and results.ptm.shape == (1,)
+
+    structure = results.structure
+    assert list(np.unique(structure.chain_id)) == ['A', 'B']
+    assert np.all(structure[structure.chain_id == 'B'].res_id < 3), 'residue IDs should be 0-indexed per chain'
+    # full heavy-atom topology, e.g. tryptophan has 14 heavy atoms and glycine 4 (without OXT)
+    assert np.sum((structure.chain_id == 'A') & (structure.res_id == 2)) == 14
+    assert np.sum((structure.chain_id == 'A') & (structure.res_id == 4)) == 4
+    ca = structure[structure.atom_name == 'CA'].coord
+    assert np.allclose(np.linalg.norm(np.diff(ca[:5], axis=0), axis=1), 3.8, atol=1e-3)
+
+    chains[0].mutate_residue(index=0, amino_acid='A')
+    assert not np.isclose(oracle.fold(chains).ptm[0], results.ptm[0]), 'different sequences should give new results'
+
+
+def test_synthetic_folding_oracle_can_be_used_by_energy_terms() -> None:
+    oracle = bg.oracles.SyntheticFoldingOracle()
+    residues = [bg.Residue(name=aa, chain_ID='A', index=i) for i, aa in enumerate('MKWVGLLE')]
+    target = [bg.Residue(name=aa, chain_ID='B', index=i) for i, aa in enumerate('CDYHPR')]
+    state = bg.State(
+        name='complex',
+        chains=[bg.Chain(residues), bg.Chain(target)],
+        energy_terms=[
+            bg.energies.PTMEnergy(oracle=oracle),
+            bg.energies.PLDDTEnergy(oracle=oracle, residues=residues),
+            bg.energies.PAEEnergy(oracle=oracle, residues=[residues, target]),
+            bg.energies.HydrophobicEnergy(oracle=oracle),
+            bg.energies.SurfaceAreaEnergy(oracle=oracle),
+        ],
+    )
+    assert np.isfinite(state.get_energy())
+
+
+def test_structure_index_is_built_once_per_result_and_matches_the_structure() -> None:
+    oracle = bg.oracles.SyntheticFoldingOracle()
+    chains = [
+        bg.Chain([bg.Residue(name=aa, chain_ID='B', index=i) for i, aa in enumerate('MKTAY')]),
+        bg.Chain([bg.Residue(name=aa, chain_ID='A', index=i) for i, aa in enumerate('GWEV')]),
+    ]
+    result = oracle.predict(chains)
+    oracles_result = bg.oracles.OraclesResultDict({oracle: result})
+    index = oracles_result.get_structure_index(oracle)
+    assert oracles_result.get_structure_index(oracle) is index, 'the index should be kept with the result'
+
+    structure = result.structure
+    assert list(index.chain_ids) == ['B', 'A'] and list(index.chain_offsets) == [0, 5, 9]
+    assert list(index.residue_chain_ids) == list('BBBBBAAAA') and list(index.residue_ids) == [0, 1, 2, 3, 4, 0, 1, 2, 3]
+
+    rows = index.residue_rows(['A', 'B', 'C'], [2, 4, 0])  # residues not in the structure are skipped
+    assert list(rows) == [7, 4]
+    atoms = index.atom_indexes(rows)
+    expected = ((structure.chain_id == 'A') & (structure.res_id == 2)) | (
+        (structure.chain_id == 'B') & (structure.res_id == 4)
+    )
+    assert np.array_equal(np.sort(atoms), np.flatnonzero(expected))
+    assert np.array_equal(index.atom_mask(['A', 'B', 'C'], [2, 4, 0]), expected)
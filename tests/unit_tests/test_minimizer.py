@@ -207,3 +207,148 @@ def test_SimulatedTempering_temperature_schedule():
             minimizer.temperature_schedule[cycle_start + n_steps_low : cycle_start + n_steps_low + n_steps_high]
             == high_temp
         ), f'High temperature phase incorrect in cycle {i}'
+
+
+def test_MonteCarloMinimizer_logs_oracle_metrics_per_step(tmp_path) -> None:
+    np.random.seed(0)
+    oracle = bg.oracles.SyntheticFoldingOracle()
+    residues = [bg.Residue(name='A', chain_ID='A', index=i, mutable=True) for i in range(10)]
+    system = bg.System(
+        states=[
+            bg.State(
+                name='state',
+                chains=[bg.Chain(residues)],
+                energy_terms=[bg.energies.PTMEnergy(oracle=oracle), bg.energies.HydrophobicEnergy(oracle=oracle)],
+            )
+        ]
+    )
+    minimizer = bg.minimizer.MonteCarloMinimizer(
+        mutator=bg.mutation.Canonical(),
+        temperature=1.0,
+        n_steps=3,
+        experiment_name='test_oracle_metrics',
+        log_path=tmp_path,
+        log_oracle_metrics=True,
+    )
+    minimizer.minimize_system(system)
+
+    log = pd.read_csv(tmp_path / 'test_oracle_metrics' / 'optimization.log')
+    assert list(log['SyntheticFoldingOracle:calls']) == [1, 1, 1], 'each step folds one new sequence'
+    assert np.all(log['SyntheticFoldingOracle:model_time'] > 0)
+    assert np.all(log['SyntheticFoldingOracle:residues'] == 10)
+
+    metrics = oracle.metrics
+    assert metrics is not None and metrics.n_calls == 4  # initial system, then one call per step
+    counts, _ = metrics.histogram('total', bins=3)
+    assert counts.sum() == 4
+    assert metrics.summary()['payload_size_mean'] > 0
+
+
+def test_MonteCarloMinimizer_with_move_journal_follows_same_trajectory(tmp_path) -> None:
+    def run(use_move_journal: bool) -> tuple[pd.DataFrame, list[str], bg.System]:
+        np.random.seed(1)
+        oracle = bg.oracles.SyntheticFoldingOracle()
+        binder = bg.Chain([bg.Residue(name=aa, chain_ID='A', index=i, mutable=True) for i, aa in enumerate('GVLKEAIS')])
+        target = bg.Chain([bg.Residue(name='K', chain_ID='B', index=i, mutable=False) for i in range(6)])
+        system = bg.System(
+            states=[
+                bg.State(
+                    name='complex',
+                    chains=[binder, target],
+                    energy_terms=[
+                        bg.energies.PLDDTEnergy(oracle=oracle, residues=binder.residues + target.residues),
+                        bg.energies.HydrophobicEnergy(oracle=oracle, residues=binder.residues[:4]),
+                    ],
+                ),
+                bg.State(
+                    name='binder', chains=[binder], energy_terms=[bg.energies.PLDDTEnergy(oracle, binder.residues)]
+                ),
+            ]
+        )
+        initial_sequences = [chain.sequence for chain in system.states[0].chains]
+        minimizer = bg.minimizer.MonteCarloMinimizer(
+            mutator=bg.mutation.GrandCanonical(n_mutations=2),
+            temperature=0.05,
+            n_steps=12,
+            experiment_name=f'journal_{use_move_journal}',
+            log_frequency=1,
+            log_path=tmp_path,
+            use_move_journal=use_move_journal,
+        )
+        best_system = minimizer.minimize_system(system)
+        assert [chain.sequence for chain in system.states[0].chains] == initial_sequences, 'input system was mutated'
+        log = pd.read_csv(tmp_path / f'journal_{use_move_journal}' / 'optimization.log')
+        energies = pd.read_csv(tmp_path / f'journal_{use_move_journal}' / 'current' / 'energies.csv')
+        return (
+            pd.concat([log, energies], axis=1),
+            [chain.sequence for chain in best_system.states[0].chains],
+            best_system,
+        )
+
+    copied_log, copied_best, _ = run(use_move_journal=False)
+    journal_log, journal_best, best_system = run(use_move_journal=True)
+
+    assert not copied_log['accept'].all() and copied_log['accept'].any()
+    assert list(journal_log['accept']) == list(copied_log['accept'])
+    assert np.allclose(journal_log['system_energy'], copied_log['system_energy'])
+    assert np.allclose(journal_log['binder:local_pLDDT'], copied_log['binder:local_pLDDT'])
+    assert journal_best == copied_best
+    fasta = [(tmp_path / f'journal_{journal}' / 'current' / 'complex.fasta').read_text() for journal in (False, True)]
+    assert fasta[0] == fasta[1]
+    hydrophobic = best_system.states[0].energy_terms[1]
+    assert np.all(hydrophobic.residue_groups[0][1] < best_system.states[0].chains[0].length)
+
+
+def test_MonteCarloMinimizer_folds_all_proposals_of_a_step_in_one_call(tmp_path) -> None:
+    np.random.seed(2)
+    oracle = bg.oracles.SyntheticFoldingOracle()
+    residues = [bg.Residue(name='A', chain_ID='A', index=i, mutable=True) for i in range(10)]
+    system = bg.System(
+        states=[bg.State(name='state', chains=[bg.Chain(residues)], energy_terms=[bg.energies.PTMEnergy(oracle)])]
+    )
+    minimizer = bg.minimizer.MonteCarloMinimizer(
+        mutator=bg.mutation.Canonical(),
+        temperature=0.1,
+        n_steps=5,
+        experiment_name='test_proposals',
+        log_path=tmp_path,
+        log_oracle_metrics=True,
+        n_proposals=3,
+    )
+    with patch.object(oracle, 'fold_batch', wraps=oracle.fold_batch) as fold_batch:
+        best_system = minimizer.minimize_system(system)
+
+    assert [len(call.kwargs['chains_batch']) for call in fold_batch.call_args_list] == [1] + [3] * 5
+    log = pd.read_csv(tmp_path / 'test_proposals' / 'optimization.log')
+    assert list(log['SyntheticFoldingOracle:calls']) == [3] * 5
+    assert np.all((log['trials'] >= 1) & (log['trials'] <= 3)), 'the number of moves of each step should be logged'
+    assert np.all(log['trials'][~log['accept']] == 3)
+    energies = pd.read_csv(tmp_path / 'test_proposals' / 'current' / 'energies.csv')
+    assert log['accept'].any()
+    assert best_system.total_energy == energies['system_energy'].min()
+    with pytest.raises(AssertionError):
+        bg.minimizer.MonteCarloMinimizer(
+            mutator=bg.mutation.Canonical(),
+            temperature=0.1,
+            n_steps=1,
+            log_path=tmp_path,
+            n_proposals=2,
+            use_move_journal=True,
+        )
+
+
+def test_MonteCarloMinimizer_n_workers_does_not_change_the_input_system(tmp_path) -> None:
+    oracle = bg.oracles.SyntheticFoldingOracle()
+    residues = [bg.Residue(name='A', chain_ID='A', index=i, mutable=True) for i in range(5)]
+    system = bg.System(
+        states=[
+            bg.State(name=name, chains=[bg.Chain(residues)], energy_terms=[bg.energies.PTMEnergy(oracle)])
+            for name in 'ab'
+        ]
+    )
+    minimizer = bg.minimizer.MonteCarloMinimizer(
+        mutator=bg.mutation.Canonical(), temperature=0.1, n_steps=2, log_path=tmp_path, n_workers=2
+    )
+    best_system = minimizer.minimize_system(system)
+    assert system.n_workers == 1
+    assert best_system.n_workers == 2
@@ -123,3 +123,106 @@ def test_mutate_random_residue_includes_self_at_expected_rate_when_flag_false()
     expected = 1.0 / 19.0
     # Loose tolerance to avoid flakiness but still meaningful
     assert abs(observed - expected) < 0.05, f'self-substitution rate {observed} deviates from expected {expected}'
+
+
+def test_mutation_protocol_only_resets_states_containing_mutated_chains() -> None:
+    class SequenceOracle(bg.oracles.Oracle):
+        result_class = str
+
+        def __init__(self):
+            self.calls = []
+
+        def predict(self, chains):
+            sequence = ':'.join(chain.sequence for chain in chains)
+            self.calls.append(sequence)
+            return sequence
+
+    class LengthEnergy(bg.energies.EnergyTerm):
+        def compute(self, oracles_result):
+            value = float(len(oracles_result[self.oracle]))
+            return value, value * self.weight
+
+    oracle = SequenceOracle()
+    binder = bg.Chain([bg.Residue(name='A', chain_ID='A', index=i, mutable=True) for i in range(3)])
+    target = bg.Chain([bg.Residue(name='G', chain_ID='B', index=i, mutable=False) for i in range(4)])
+    system = bg.System(
+        states=[
+            bg.State(
+                name=name,
+                chains=chains,
+                energy_terms=[LengthEnergy(name='length', oracle=oracle, weight=1.0, inheritable=True)],
+            )
+            for name, chains in [('complex', [binder, target]), ('target', [target])]
+        ]
+    )
+    system.get_total_energy()
+    assert oracle.calls == ['AAA:GGGG', 'GGGG']
+
+    mutator = bg.mutation.Canonical()
+    mutated_system, _ = mutator.one_step(system=system.__copy__(), old_system=system)
+
+    assert len(oracle.calls) == 3, 'only the state containing the mutated chain should be predicted again'
+    assert oracle.calls[-1] != 'AAA:GGGG'
+    assert mutated_system.states[1]._energy == system.states[1]._energy
+
+    mutator.reset_system(mutated_system)
+    assert all(len(state._oracles_result) == 0 for state in mutated_system.states), 'all states should be reset'
+
+
+@patch.object(bg.System, 'get_total_energy')  # prevents unnecessary folding
+def test_GrandCanonical_MutationProtocol_moves_are_undone_by_journal(
+    mocked_calculate_method: Mock,
+    energies_system: bg.System,
+) -> None:
+    original = energies_system.__copy__()
+    mutator = bg.mutation.GrandCanonical(n_mutations=6)
+    np.random.seed(3)
+    journal = bg.mutation.MoveJournal()
+    mutated_chains = mutator.apply_moves(energies_system, journal=journal)
+    assert len(mutated_chains) == 6 and len(journal) > 0
+    assert any(
+        state.chains[0].sequence != original_state.chains[0].sequence
+        for state, original_state in zip(energies_system.states, original.states)
+    )
+
+    journal.undo()
+    assert len(journal) == 0
+    for state, original_state in zip(energies_system.states, original.states):
+        assert state.chains[0].residues == original_state.chains[0].residues
+        for term, original_term in zip(state.energy_terms, original_state.energy_terms):
+            for group, original_group in zip(term.residue_groups, original_term.residue_groups):
+                assert np.array_equal(group[0], original_group[0]) and np.array_equal(group[1], original_group[1])
+
+
+def test_journal_restores_sequences_after_residues_are_mutated_then_removed() -> None:
+    chain = bg.Chain([bg.Residue(name=aa, chain_ID='A', index=i, mutable=True) for i, aa in enumerate('GSVKLE')])
+    journal = bg.mutation.MoveJournal()
+    journal.record_mutation(chain, 2)
+    chain.mutate_residue(index=2, amino_acid='W')
+    journal.record_removal(chain, 2)
+    chain.remove_residue(index=2)
+    journal.undo()
+    assert chain.sequence == 'GSVKLE'
+
+    oracle = bg.oracles.SyntheticFoldingOracle()
+    mutator = bg.mutation.GrandCanonical(n_mutations=4)
+    for seed in range(300):
+        np.random.seed(seed)
+        chains = [
+            bg.Chain([bg.Residue(name=aa, chain_ID=c, index=i, mutable=True) for i, aa in enumerate('GSVKLE')])
+            for c in 'AB'
+        ]
+        system = bg.System(
+            states=[
+                bg.State(
+                    name='state', chains=chains, energy_terms=[bg.energies.PLDDTEnergy(oracle, chains[0].residues)]
+                )
+            ]
+        )
+        sequences = [chain.sequence for chain in chains]
+        fingerprints = [chain.fingerprint for chain in chains]
+        journal = bg.mutation.MoveJournal()
+        mutator.apply_moves(system, journal=journal)
+        journal.undo()
+        assert [chain.sequence for chain in chains] == sequences, f'seed {seed}'
+        assert [chain.fingerprint for chain in chains] == fingerprints, f'seed {seed}'
@@ -1,5 +1,19 @@
 import pytest
+import os
+import sys
+import threading
+from multiprocessing import AuthenticationError
+import numpy as np
+from types import SimpleNamespace
+from biotite.structure import Atom, AtomArray, array
+import bagel as bg
 from bagel.oracles.base import OraclesResultDict, Oracle, OracleResult
+from bagel.oracles.cache import OracleCache
+from bagel.oracles.store import OracleResultStore
+from bagel.oracles.embedding import ESM2, ESM2Result
+from bagel.oracles.folding import FoldingOracle, ESMFold, ESMFoldResult, SyntheticFoldingOracle
+from bagel.oracles.server import OracleServer, OracleClient, FoldingOracleClient
+from bagel.oracles.runtime import OracleRuntime
 from bagel.chain import Chain, Residue
 
 
@@ -42,3 +56,398 @@ def test_get_input_chains_missing_oracle_raises():
     oracle = DummyOracle()
     with pytest.raises(KeyError):
         _ = oracles_result.get_input_chains(oracle)
+
+
+class CountingOracle(Oracle):
+    result_class = DummyResult
+
+    def __init__(self):
+        self.n_calls = 0
+
+    def predict(self, chains):
+        self.n_calls += 1
+        return DummyResult(input_chains=chains)
+
+
+def test_oracle_cache_serves_repeated_sequences_from_memory():
+    oracle = CountingOracle()
+    cache = OracleCache(max_size=4)
+    chains = [Chain(residues=[Residue(name='A', chain_ID='X', index=0), Residue(name='G', chain_ID='X', index=1)])]
+    same_chains = [Chain(residues=[Residue(name='A', chain_ID='X', index=0), Residue(name='G', chain_ID='X', index=1)])]
+
+    first = cache.predict(oracle, chains)
+    second = cache.predict(oracle, same_chains)
+
+    assert oracle.n_calls == 1, 'oracle should only be called for the first prediction'
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert second.input_chains[0] is same_chains[0], 'cached result should refer to the chains that asked for it'
+    assert first.input_chains[0] is chains[0]
+
+    same_chains[0].mutate_residue(index=1, amino_acid='V')
+    cache.predict(oracle, same_chains)
+    assert oracle.n_calls == 2, 'a different sequence must not be served from the cache'
+
+
+def test_oracle_cache_and_batched_predictions_do_not_mix_up_sequences_with_the_same_fingerprint():
+    oracle = CountingOracle()
+    cache = OracleCache()
+    chains = [Chain(residues=[Residue(name='A', chain_ID='X', index=0)])]
+    colliding = [Chain(residues=[Residue(name='G', chain_ID='X', index=0)])]
+    colliding[0]._fingerprint = chains[0].fingerprint  # as if the two sequences had the same fingerprint
+
+    cache.predict(oracle, chains)
+    assert cache.get(oracle, colliding) is None, 'a fingerprint collision must not be served from the cache'
+    assert cache.predict(oracle, colliding).input_chains[0] is colliding[0] and oracle.n_calls == 2
+
+    folder = SyntheticFoldingOracle()
+    states = [
+        bg.State(name=str(i), chains=c, energy_terms=[bg.energies.PTMEnergy(folder)])
+        for i, c in enumerate([chains, colliding])
+    ]
+    bg.state.predict_states(states)
+    assert [state._oracles_result[folder].structure.res_name[0] for state in states] == ['ALA', 'GLY']
+
+
+def test_oracle_cache_evicts_least_recently_used_entry():
+    oracle = CountingOracle()
+    cache = OracleCache(max_size=2)
+    chains = {aa: [Chain(residues=[Residue(name=aa, chain_ID='X', index=0)])] for aa in 'AGV'}
+
+    cache.predict(oracle, chains['A'])
+    cache.predict(oracle, chains['G'])
+    cache.predict(oracle, chains['A'])  # A is now the most recently used
+    cache.predict(oracle, chains['V'])  # evicts G
+
+    assert len(cache) == 2
+    assert OracleCache.make_key(oracle, chains['A']) in cache
+    assert OracleCache.make_key(oracle, chains['G']) not in cache
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 3
+
+
+def test_oracle_result_store_round_trips_esmfold_result(
+    tmp_path, fake_esmfold, small_structure, small_structure_chains
+):
+    L = sum(chain.length for chain in small_structure_chains)
+    result = ESMFoldResult(
+        input_chains=small_structure_chains,
+        structure=small_structure,
+        local_plddt=np.full((1, L), 0.5),
+        ptm=np.array([0.7]),
+        pae=np.arange(L * L, dtype=float).reshape(1, L, L),
+    )
+    store = OracleResultStore(tmp_path / 'store')
+    assert store.fetch(fake_esmfold, small_structure_chains) is None
+
+    store.save(fake_esmfold, small_structure_chains, result)
+    loaded = store.fetch(fake_esmfold, small_structure_chains)
+
+    assert isinstance(loaded, ESMFoldResult)
+    assert loaded.input_chains == small_structure_chains
+    assert loaded.structure == small_structure
+    assert not isinstance(loaded.pae, np.memmap) and loaded.pae.flags.writeable
+    assert np.array_equal(loaded.pae, result.pae)
+    assert np.array_equal(loaded.local_plddt, result.local_plddt)
+    assert np.array_equal(loaded.ptm, result.ptm)
+    assert list(store.root.joinpath('tmp').iterdir()) == [], 'temporary files should have been moved into place'
+
+    other_chains = [Chain(residues=[Residue(name='A', chain_ID='A', index=0)])]
+    assert store.fetch(fake_esmfold, other_chains) is None
+
+    pae_file = store.path(store.make_key(fake_esmfold, small_structure_chains)) / 'pae.npy'
+    mapped = OracleResultStore(tmp_path / 'store', mmap=True, mmap_min_bytes=pae_file.stat().st_size)
+    loaded = mapped.fetch(fake_esmfold, small_structure_chains)
+    assert isinstance(loaded.pae, np.memmap), 'large arrays should be memory-mapped on request'
+    assert not isinstance(loaded.local_plddt, np.memmap)
+    assert np.array_equal(loaded.pae, result.pae)
+
+
+def test_oracle_result_store_does_not_keep_files_open_for_fetched_results(tmp_path):
+    oracle = SyntheticFoldingOracle()
+    store = OracleResultStore(tmp_path)
+    amino_acids = 'ACDEFGHIKLMNPQRSTVWY'
+    sequences = [amino_acids[n % 20] + amino_acids[n // 20] + 'G' for n in range(300)]
+    chains_list = [
+        [Chain(residues=[Residue(name=aa, chain_ID='A', index=i) for i, aa in enumerate(seq)])] for seq in sequences
+    ]
+    for chains in chains_list:
+        store.save(oracle, chains, oracle.predict(chains))
+    n_open = len(os.listdir('/proc/self/fd')) if os.path.isdir('/proc/self/fd') else None
+    fetched = [store.fetch(oracle, chains) for chains in chains_list]
+    assert all(result is not None for result in fetched)
+    if n_open is not None:
+        assert len(os.listdir('/proc/self/fd')) <= n_open + 5
+
+
+def test_oracle_result_store_key_depends_on_oracle_config(tmp_path, fake_esm2, small_structure_chains):
+    store = OracleResultStore(tmp_path)
+    key = store.make_key(fake_esm2, small_structure_chains)
+    fake_esm2.config = {**fake_esm2.config, 'model_name': 'esm2_t6_8M_UR50D'}
+    assert store.make_key(fake_esm2, small_structure_chains) != key
+
+
+def test_esm2_with_result_store_embeds_each_sequence_once(tmp_path, fake_esm2, small_structure_chains, monkeypatch):
+    calls = []
+
+    def mock_local_embed(self, sequence):
+        calls.append(sequence)
+        return None
+
+    def mock_post_process(self, output, chains):
+        return ESM2Result(input_chains=chains, embeddings=np.ones((3, 4)))
+
+    monkeypatch.setenv('MODEL_DIR', str(tmp_path))
+    monkeypatch.setattr(ESM2, '_local_embed', mock_local_embed)
+    monkeypatch.setattr(ESM2, '_post_process', mock_post_process)
+    fake_esm2.result_store = OracleResultStore(tmp_path / 'store')
+
+    first = fake_esm2.embed(small_structure_chains)
+    second = fake_esm2.embed(small_structure_chains)
+
+    assert len(calls) == 1
+    assert second.input_chains == small_structure_chains
+    assert np.array_equal(first.embeddings, second.embeddings)
+
+
+def test_esm2_concurrent_embeddings_are_bound_to_their_own_chains(tmp_path, fake_esm2, monkeypatch):
+    barrier = threading.Barrier(2)
+
+    def mock_local_embed(self, sequence):
+        barrier.wait(timeout=5)  # both calls are in flight at the same time
+        return SimpleNamespace(embeddings=np.ones((1, len(sequence[0]), 4)))
+
+    monkeypatch.setenv('MODEL_DIR', str(tmp_path))
+    monkeypatch.setattr(ESM2, '_local_embed', mock_local_embed)
+    chains_list = [[Chain(residues=[Residue(name='G', chain_ID=chain_ID, index=0)])] for chain_ID in 'AB']
+    results: dict[str, ESM2Result] = {}
+
+    def embed(chains):
+        results[chains[0].chain_ID] = fake_esm2.embed(chains)
+
+    threads = [threading.Thread(target=embed, args=(chains,)) for chains in chains_list]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(results[chains[0].chain_ID].input_chains[0] is chains[0] for chains in chains_list)
+
+
+def test_esmfold_fold_batch_splits_output_into_one_result_per_complex(fake_esmfold, monkeypatch, tmp_path):
+    dimer = [
+        Chain(residues=[Residue(name='G', chain_ID='X', index=i) for i in range(2)]),
+        Chain(residues=[Residue(name='V', chain_ID='Y', index=0)]),
+    ]
+    monomer = [Chain(residues=[Residue(name='V', chain_ID='Z', index=i) for i in range(2)])]
+
+    def ca_atoms(chain_ids, res_ids):
+        return array(
+            [
+                Atom(coord=[i, 0, 0], chain_id=c, res_id=r, res_name='GLY', atom_name='CA', element='C')
+                for i, (c, r) in enumerate(zip(chain_ids, res_ids))
+            ]
+        )
+
+    # ESMFold pads all complexes of a batch to the longest one, with -1 values
+    output = SimpleNamespace(
+        atom_array=[ca_atoms('AAB', [0, 1, 0]), ca_atoms('AA@', [0, 1, -1])],
+        plddt=np.stack([np.full((3, 37), 0.5), np.pad(np.full((2, 37), 0.9), ((0, 1), (0, 0)), constant_values=-1)]),
+        ptm=np.array([0.6, 0.8]),
+        predicted_aligned_error=np.stack([np.ones((3, 3)), np.pad(np.ones((2, 2)), (0, 1), constant_values=-1)]),
+    )
+    calls = []
+
+    def mock_local_fold(self, sequences):
+        calls.append(sequences)
+        return output
+
+    monkeypatch.setenv('MODEL_DIR', str(tmp_path))
+    monkeypatch.setattr(ESMFold, '_local_fold', mock_local_fold)
+
+    results = fake_esmfold.fold_batch([dimer, monomer])
+
+    assert calls == [['GG:V', 'VV']], 'all complexes should be folded in a single call'
+    assert [result.input_chains for result in results] == [dimer, monomer]
+    assert list(results[0].structure.chain_id) == ['X', 'X', 'Y']
+    assert list(results[1].structure.chain_id) == ['Z', 'Z'], 'padding should be cropped away'
+    assert results[1].local_plddt.shape == (1, 2) and np.all(results[1].local_plddt == 0.9)
+    assert results[1].pae.shape == (1, 2, 2) and np.all(results[1].pae == 1)
+    assert np.array_equal(results[0].ptm, [0.6]) and np.array_equal(results[1].ptm, [0.8])
+
+
+class BatchRecordingFolder(FoldingOracle):
+    result_class = ESMFoldResult
+
+    def __init__(self):
+        self.batches = []
+
+    def fold(self, chains):
+        return self.fold_batch([chains])[0]
+
+    def fold_batch(self, chains_batch):
+        self.batches.append([[chain.sequence for chain in chains] for chains in chains_batch])
+        return [
+            ESMFoldResult(
+                input_chains=chains,
+                structure=AtomArray(0),
+                local_plddt=np.full((1, chains[0].length), 0.5),
+                ptm=np.array([0.1 * chains[0].length]),
+                pae=np.zeros((1, chains[0].length, chains[0].length)),
+            )
+            for chains in chains_batch
+        ]
+
+
+def test_oracle_server_batches_concurrent_requests_of_several_clients():
+    folder = BatchRecordingFolder()
+    with OracleServer(folder, max_batch_size=4, max_wait=2.0) as server:
+        clients = [FoldingOracleClient(server.address, server.authkey) for _ in range(4)]
+        assert all(client.result_class is ESMFoldResult for client in clients)
+
+        chains = [[Chain(residues=[Residue(name='A', chain_ID='A', index=j) for j in range(n)])] for n in range(1, 5)]
+        results = [None] * 4
+        barrier = threading.Barrier(4)
+
+        def request(i):
+            barrier.wait()
+            results[i] = clients[i].predict(chains[i])
+
+        threads = [threading.Thread(target=request, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+
+    assert server.batch_sizes == [4], 'concurrent requests should be sent to the oracle as one batch'
+    assert sorted(len(batch) for batch in folder.batches) == [4]
+    for i, result in enumerate(results):
+        assert isinstance(result, ESMFoldResult)
+        assert result.input_chains[0] is chains[i][0], 'results should be bound to the chains of the caller'
+        assert np.isclose(result.ptm[0], 0.1 * (i + 1))
+
+
+def test_oracle_server_forwards_oracle_errors_to_client():
+    class FailingOracle(DummyOracle):
+        def predict(self, chains):
+            raise ValueError('model crashed')
+
+    with OracleServer(FailingOracle(), max_wait=0.0) as server:
+        client = OracleClient(server.address, server.authkey)
+        with pytest.raises(ValueError, match='model crashed'):
+            client.predict([Chain(residues=[Residue(name='A', chain_ID='A', index=0)])])
+
+
+def test_oracle_server_only_accepts_clients_with_its_random_authkey():
+    with OracleServer(DummyOracle(), max_wait=0.0) as server, OracleServer(DummyOracle()) as other_server:
+        assert isinstance(server.address, str), 'the server should listen on a Unix socket by default'
+        assert len(server.authkey) == 32 and server.authkey != other_server.authkey
+        with pytest.raises(AuthenticationError):
+            OracleClient(server.address, b'bagel')
+        assert OracleClient(server.address, server.authkey).result_class is OracleResult
+    with pytest.raises(AssertionError, match='loopback'):
+        OracleServer(DummyOracle(), address=('0.0.0.0', 0))
+
+
+def test_oracle_metrics_record_calls_and_cache_hits_only_when_enabled():
+    oracle = SyntheticFoldingOracle()
+    chains = [Chain(residues=[Residue(name='A', chain_ID='A', index=i) for i in range(4)])]
+    cache = OracleCache()
+
+    cache.predict(oracle, chains)
+    assert oracle.metrics is None, 'metrics should be disabled by default'
+
+    metrics = oracle.enable_metrics()
+    cache.predict(oracle, chains)
+    chains[0].mutate_residue(index=0, amino_acid='G')
+    cache.predict(oracle, chains)
+
+    assert metrics.n_calls == 1 and metrics.cache_hits == 1
+    assert metrics.sequence_lengths == [4]
+    assert len(metrics.timings['model']) == 1 and len(metrics.timings['total']) == 1
+    assert metrics.payload_sizes[0] > 0
+    step = metrics.step_summary()
+    assert step['calls'] == 1 and step['cache_hits'] == 1 and step['total_time'] > 0
+    assert metrics.step_summary()['calls'] == 0, 'step counters should be reset'
+
+
+def test_oracle_results_are_stored_in_the_precision_of_the_oracle(tmp_path):
+    chains = [Chain(residues=[Residue(name=name, chain_ID='A', index=i) for i, name in enumerate('GSVKLHEWAC')])]
+    full, reduced = SyntheticFoldingOracle(), SyntheticFoldingOracle(precision='float16')
+    full_result, reduced_result = full.predict(chains), reduced.predict(chains)
+    assert full_result.pae.dtype == np.float64
+    assert reduced_result.pae.dtype == reduced_result.local_plddt.dtype == reduced_result.ptm.dtype == np.float16
+    assert reduced_result.pae.nbytes * 4 == full_result.pae.nbytes
+
+    energies = []
+    for oracle, result in ((full, full_result), (reduced, reduced_result)):
+        energy = bg.energies.PLDDTEnergy(oracle=oracle, residues=chains[0].residues[:5])
+        oracles_result = OraclesResultDict()
+        oracles_result[oracle] = result
+        energies.append(energy.compute(oracles_result)[0])
+    assert energies[1].dtype == np.float32, 'energy terms should not compute in float16'
+    assert energies[1] == pytest.approx(energies[0], abs=1e-3)
+
+    store = OracleResultStore(tmp_path)
+    assert store.make_key(full, chains) != store.make_key(reduced, chains)
+    with pytest.raises(AssertionError):
+        SyntheticFoldingOracle(precision='float8')
+
+
+class SlowLoadingOracle(CountingOracle):
+    def __init__(self, barrier):
+        super().__init__()
+        self.barrier = barrier
+        self.n_loads = 0
+
+    def _load(self, config={}):
+        self.barrier.wait(timeout=5.0)  # only passes if the other oracle is loading at the same time
+        self.n_loads += 1
+
+    def predict(self, chains):
+        self.load()
+        return super().predict(chains)
+
+
+def test_oracle_runtime_loads_models_lazily_and_in_parallel(small_structure_chains):
+    barrier = threading.Barrier(2)
+    runtime = OracleRuntime()
+    oracles = [runtime.register(SlowLoadingOracle(barrier)) for _ in range(2)]
+    assert not any(oracle._loaded for oracle in oracles)
+
+    futures = runtime.warmup()
+    for oracle in oracles:
+        oracle.predict(small_structure_chains)  # waits for the model being loaded in the background
+    runtime.wait()
+
+    assert len(futures) == 2
+    assert [oracle.n_loads for oracle in oracles] == [1, 1]
+    assert runtime.warmup() == futures  # nothing left to load
+    assert [oracle.n_loads for oracle in oracles] == [1, 1]
+
+
+def test_oracle_runtime_enters_shared_modal_context_on_calling_thread(monkeypatch):
+    entered_on = []
+
+    class FakeContext:
+        def __enter__(self):
+            entered_on.append(threading.current_thread())
+
+    monkeypatch.setitem(sys.modules, 'boileroom', SimpleNamespace(app=SimpleNamespace(run=FakeContext)))
+    monkeypatch.setattr(OracleRuntime, '_app_context', None)
+    monkeypatch.setattr(OracleRuntime, 'close_app_context', classmethod(lambda cls: None))
+    oracle = SlowLoadingOracle(threading.Barrier(1))
+    oracle.use_modal, oracle.modal_app_context = True, None
+    oracle._load = lambda config={}: OracleRuntime.app_context()
+
+    OracleRuntime([oracle]).warmup(block=True)
+    assert entered_on == [threading.current_thread()]
+
+
+def test_esmfold_only_loads_model_when_folding(fake_esmfold, monkeypatch):
+    loads = []
+    monkeypatch.setattr(ESMFold, '_load', lambda self, config={}: loads.append(config))
+    esmfold = ESMFold(use_modal=False)
+    assert loads == [] and not esmfold._loaded
+
+    esmfold.load()
+    esmfold.load()
+    assert len(loads) == 1 and esmfold._loaded
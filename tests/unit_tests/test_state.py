@@ -2,6 +2,7 @@ import bagel as bg
 import numpy as np
 from biotite.structure import AtomArray
 import pytest
+import threading
 
 
 def test_state_remove_residue_from_all_energy_terms_removes_correct_residue(mixed_structure_state: bg.State) -> None:
@@ -46,6 +47,27 @@ def test_state_add_residue_to_all_energy_terms_adds_residue_to_residue_group(mix
     assert np.all(res_ids == [0, 1, 2, 3])  # index of original residue shifted up
 
 
+def test_state_energy_terms_follow_residues_by_stable_id_over_several_moves(mixed_structure_state: bg.State) -> None:
+    chains = {chain.chain_ID: chain for chain in mixed_structure_state.chains}
+    term = mixed_structure_state.energy_terms[0]  # inheritable energy, all residues of chains C, D and E
+    tracked = [chains[chain_ID].residues[index] for chain_ID, index in zip(*term.residue_groups[0])]
+    stored_ids = term._residue_groups[0][1].copy()
+
+    chains['E'].add_residue(amino_acid='A', index=0)
+    mixed_structure_state.add_residue_to_all_energy_terms(chain_ID='E', residue_index=0)
+    tracked.append(chains['E'].residues[0])
+    chains['E'].remove_residue(index=4)  # last residue of chain E before the addition
+    mixed_structure_state.remove_residue_from_all_energy_terms(chain_ID='E', residue_index=4)
+    tracked = [residue for residue in tracked if residue._chain is not None]
+    chains['D'].add_residue(amino_acid='G', index=2)
+    mixed_structure_state.add_residue_to_all_energy_terms(chain_ID='D', residue_index=2)
+    tracked.append(chains['D'].residues[2])
+    assert np.all(term._residue_groups[0][1] == stored_ids), 'stored residue IDs were shifted by the moves'
+
+    chain_ids, res_ids = term.residue_groups[0]
+    assert list(zip(chain_ids, res_ids)) == [(residue.chain_ID, residue.index) for residue in tracked]
+
+
 def test_state_get_energy(fake_esmfold: bg.oracles.folding.ESMFold, monkeypatch) -> None:
     """Test the get_energy method of State class."""
 
@@ -200,3 +222,111 @@ def test_state_get_energy(fake_esmfold: bg.oracles.folding.ESMFold, monkeypatch)
     assert len(multi_oracle_state._oracles_result) == 2  # Should have results from both oracles
     assert oracle_a in multi_oracle_state._oracles_result
     assert oracle_b in multi_oracle_state._oracles_result
+
+
+def test_state_get_energy_uses_shared_oracle_cache(fake_esmfold: bg.oracles.folding.ESMFold, monkeypatch) -> None:
+    calls = []
+
+    def mock_predict(self, chains):
+        calls.append([chain.sequence for chain in chains])
+        return bg.oracles.folding.ESMFoldResult(
+            input_chains=chains,
+            structure=AtomArray(0),
+            ptm=np.array([0.7]),
+            pae=np.zeros((0, 0)),
+            local_plddt=np.array([]),
+        )
+
+    monkeypatch.setattr(bg.oracles.folding.ESMFold, 'predict', mock_predict)
+
+    cache = bg.oracles.OracleCache()
+    states = [
+        bg.State(
+            name=f'state_{i}',
+            chains=[bg.Chain([bg.Residue(name='A', chain_ID='A', index=j) for j in range(3)])],
+            energy_terms=[bg.energies.PTMEnergy(oracle=fake_esmfold)],
+            oracle_cache=cache,
+        )
+        for i in range(2)
+    ]
+    energies = [state.get_energy() for state in states]
+
+    assert len(calls) == 1, 'identical sequences should only be folded once'
+    assert np.allclose(energies[0], energies[1])
+    assert cache.hits == 1 and cache.misses == 1
+    assert states[1]._oracles_result[fake_esmfold].input_chains[0] is states[1].chains[0]
+
+    copied_state = states[0].__copy__()
+    assert copied_state.oracle_cache is cache, 'copies of a state must share the same cache'
+
+
+def test_state_get_energy_calls_oracles_concurrently() -> None:
+    barrier = threading.Barrier(2, timeout=10)  # only passed if both oracles are waiting at the same time
+
+    class RemoteOracle(bg.oracles.Oracle):
+        result_class = str
+
+        def predict(self, chains):
+            barrier.wait()
+            return 'result'
+
+    class ConstantEnergy(bg.energies.EnergyTerm):
+        def compute(self, oracles_result):
+            assert oracles_result[self.oracle] == 'result'
+            return 1.0, self.weight
+
+    oracles = [RemoteOracle(), RemoteOracle()]
+    state = bg.State(
+        name='state',
+        chains=[bg.Chain([bg.Residue(name='A', chain_ID='A', index=0)])],
+        energy_terms=[
+            ConstantEnergy(name=f'term_{i}', oracle=oracle, weight=1.0, inheritable=True)
+            for i, oracle in enumerate(oracles)
+        ],
+        concurrent_oracles=True,
+    )
+
+    assert state.get_energy() == 2.0
+    assert set(state._oracles_result.keys()) == set(oracles)
+
+
+def test_state_keeps_only_the_pae_blocks_read_by_its_energy_terms() -> None:
+    oracle = bg.oracles.folding.SyntheticFoldingOracle()
+    chains = [
+        bg.Chain([bg.Residue(name='A', chain_ID='A', index=i) for i in range(12)]),
+        bg.Chain([bg.Residue(name='G', chain_ID='B', index=i) for i in range(8)]),
+    ]
+
+    def make_state(keep_full_pae: bool) -> bg.State:
+        terms = [
+            bg.energies.PAEEnergy(oracle, residues=[chains[0].residues[2:5], chains[1].residues[:2]]),
+            bg.energies.LISEnergy(oracle, residues=[chains[0].residues[3:4], chains[1].residues[6:8]]),
+            bg.energies.PTMEnergy(oracle),
+        ]
+        return bg.State(name='state', chains=chains, energy_terms=terms, keep_full_pae=keep_full_pae)
+
+    full_state, sparse_state = make_state(keep_full_pae=True), make_state(keep_full_pae=False)
+    assert np.isclose(full_state.get_energy(), sparse_state.get_energy())
+    assert full_state._energy_terms_value == sparse_state._energy_terms_value
+
+    full_result, sparse_result = full_state._oracles_result[oracle], sparse_state._oracles_result[oracle]
+    assert full_result.pae.shape == (1, 20, 20) and full_result.pae_residues is None
+    residues = np.array([2, 3, 4, 12, 13, 18, 19])  # union of the groups of the PAE and LIS terms
+    assert np.array_equal(sparse_result.pae_residues, residues)
+    assert np.array_equal(sparse_result.pae, full_result.pae[:, residues[:, None], residues[None, :]])
+
+
+def test_state_without_pae_terms_logs_full_pae_unless_restricted(tmp_path) -> None:
+    oracle = bg.oracles.folding.SyntheticFoldingOracle()
+    chains = [bg.Chain([bg.Residue(name='A', chain_ID='A', index=i) for i in range(6)])]
+    state = bg.State(name='state', chains=chains, energy_terms=[bg.energies.PTMEnergy(oracle)])
+    state.get_energy()
+    state._oracles_result[oracle].save_attributes(tmp_path / 'full')
+    assert (tmp_path / 'full.pae').read_text().startswith('# pae\n')
+    assert np.loadtxt(tmp_path / 'full.pae').shape == (6, 6)
+
+    state = bg.State(name='state', chains=chains, energy_terms=[bg.energies.PTMEnergy(oracle)], keep_full_pae=False)
+    state.get_energy()
+    assert state._oracles_result[oracle].pae.shape == (1, 0, 0)
+    state._oracles_result[oracle].save_attributes(tmp_path / 'restricted')
+    assert (tmp_path / 'restricted.plddt').exists() and not (tmp_path / 'restricted.pae').exists()
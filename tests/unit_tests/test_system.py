@@ -2,6 +2,7 @@ import bagel as bg
 import pandas as pd
 import pathlib as pl
 import shutil
+import threading
 from biotite.sequence.io.fasta import FastaFile
 from biotite.structure.io.pdbx import CIFFile, get_structure
 import numpy as np
@@ -148,15 +149,194 @@ def test_copied_system_is_independant_of_original_system(mixed_system: bg.System
     assert mixed_system.states[0].chains[0] != copied_system.states[0].chains[0]
 
 
+def test_proposal_copy_shares_oracle_results_but_not_chains(mixed_system: bg.System) -> None:
+    proposal = mixed_system.proposal_copy()
+    for state, proposed_state in zip(mixed_system.states, proposal.states):
+        assert proposed_state._oracles_result is not state._oracles_result
+        for oracle, result in state._oracles_result.items():
+            assert proposed_state._oracles_result[oracle] is result
+        assert proposed_state.chains[0] is not state.chains[0]
+        assert proposed_state._energy_terms_value == state._energy_terms_value
+    assert proposal.total_energy == mixed_system.total_energy
+
+    proposal.states[0].chains[0].add_residue(amino_acid='A', index=0)
+    proposal.states[0]._oracles_result = bg.oracles.OraclesResultDict()
+    assert mixed_system.states[0].chains[0] != proposal.states[0].chains[0]
+    assert len(mixed_system.states[0]._oracles_result) == 1
+
+
 def test_system_states_still_reference_shared_chain_object_after_copy_method(shared_chain_system: bg.System) -> None:
     copied_system = shared_chain_system.__copy__()
     copied_system.states[0].chains[0].add_residue(amino_acid='A', index=0)
     assert copied_system.states[0].chains[0] == copied_system.states[1].chains[0]
 
 
+def test_system_unique_chains_are_registered_by_identity(shared_chain_system: bg.System) -> None:
+    chains = shared_chain_system.unique_chains
+    assert len(chains) == 1
+    assert shared_chain_system.unique_chains is chains, 'registry not cached'
+
+    equal_chain = bg.Chain(
+        [bg.Residue(name=residue.name, chain_ID='A', index=residue.index) for residue in chains[0].residues]
+    )
+    shared_chain_system.states[0].chains.append(equal_chain)
+    assert equal_chain == chains[0]
+    assert len(shared_chain_system.unique_chains) == 2 and shared_chain_system.unique_chains[-1] is equal_chain
+
+    copied_system = shared_chain_system.__copy__()
+    copied_chains = [chain for state in copied_system.states for chain in state.chains]
+    assert all(any(chain is copied for copied in copied_chains) for chain in copied_system.unique_chains)
+
+
 def test_system_get_total_energy_gives_correct_output(mixed_system: bg.System) -> None:
     for state in mixed_system.states:
         state.get_energy = Mock()  # disable method for easier testing
     total_energy = mixed_system.get_total_energy()
     # state 0: energy=-0.5, state 1: energy=0.1
     assert np.isclose(total_energy, (-0.5 + 0.1))  # system energy is sum of state energies
+
+
+def test_system_get_total_energies_sends_all_proposals_to_oracle_in_one_call() -> None:
+    class BatchOracle(bg.oracles.Oracle):
+        result_class = str
+
+        def __init__(self):
+            self.calls = []
+
+        def predict(self, chains):
+            return self.predict_batch([chains])[0]
+
+        def predict_batch(self, chains_batch):
+            self.calls.append([[chain.sequence for chain in chains] for chains in chains_batch])
+            return [''.join(chain.sequence for chain in chains) for chains in chains_batch]
+
+    class LengthEnergy(bg.energies.EnergyTerm):
+        def compute(self, oracles_result):
+            value = float(len(oracles_result[self.oracle]))
+            return value, value * self.weight
+
+    oracle = BatchOracle()
+    systems = [
+        bg.System(
+            states=[
+                bg.State(
+                    name='state',
+                    chains=[bg.Chain([bg.Residue(name='A', chain_ID='A', index=j) for j in range(n)])],
+                    energy_terms=[LengthEnergy(name='length', oracle=oracle, weight=1.0, inheritable=True)],
+                )
+            ]
+        )
+        for n in (2, 3, 4)
+    ]
+
+    energies = bg.System.get_total_energies(systems)
+
+    assert oracle.calls == [[['AA'], ['AAA'], ['AAAA']]]
+    assert np.allclose(energies, [2.0, 3.0, 4.0])
+
+
+def test_system_get_total_energy_evaluates_states_in_parallel_with_n_workers() -> None:
+    barrier = threading.Barrier(3, timeout=10)  # only passed if all states are evaluated at the same time
+
+    class RemoteOracle(bg.oracles.Oracle):
+        result_class = str
+
+        def predict(self, chains):
+            barrier.wait()
+            return chains[0].sequence
+
+    class LengthEnergy(bg.energies.EnergyTerm):
+        def compute(self, oracles_result):
+            value = float(len(oracles_result[self.oracle]))
+            return value, value * self.weight
+
+    oracle = RemoteOracle()
+    system = bg.System(
+        states=[
+            bg.State(
+                name=f'state_{n}',
+                chains=[bg.Chain([bg.Residue(name='A', chain_ID='A', index=j) for j in range(n)])],
+                energy_terms=[LengthEnergy(name='length', oracle=oracle, weight=1.0, inheritable=True)],
+            )
+            for n in (1, 2, 3)
+        ],
+        n_workers=3,
+    )
+
+    assert np.isclose(system.get_total_energy(), 6.0)
+    assert system.__copy__().n_workers == 3
+
+
+def test_system_get_total_energy_predicts_identical_requests_of_different_states_once() -> None:
+    class ChainsResult(bg.oracles.OracleResult):
+        def save_attributes(self, filepath):
+            pass
+
+    class SequenceOracle(bg.oracles.Oracle):
+        result_class = ChainsResult
+
+        def __init__(self):
+            self.calls = []
+
+        def predict(self, chains):
+            self.calls.append([chain.sequence for chain in chains])
+            return ChainsResult(input_chains=chains)
+
+    class ChainCountEnergy(bg.energies.EnergyTerm):
+        def compute(self, oracles_result):
+            value = float(len(oracles_result.get_input_chains(self.oracle)))
+            return value, value * self.weight
+
+    oracle = SequenceOracle()
+    chains = [bg.Chain([bg.Residue(name='A', chain_ID=chain_ID, index=0)]) for chain_ID in 'AB']
+    copied_chains = [bg.Chain([bg.Residue(name='A', chain_ID=chain_ID, index=0)]) for chain_ID in 'AB']
+    system = bg.System(
+        states=[
+            bg.State(
+                name=name,
+                chains=state_chains,
+                energy_terms=[ChainCountEnergy(name=name, oracle=oracle, weight=weight, inheritable=True)],
+            )
+            for name, state_chains, weight in [('interface', chains, 1.0), ('confidence', copied_chains, 2.0)]
+        ]
+    )
+
+    assert np.isclose(system.get_total_energy(), 6.0)
+    assert oracle.calls == [['A', 'A']], 'identical requests should be predicted once'
+    for state in system.states:
+        assert state._oracles_result[oracle].input_chains == state.chains
+        assert state._oracles_result[oracle].input_chains[0] is state.chains[0]
+
+
+def test_system_fingerprint_follows_the_sequences_of_its_states(mixed_system: bg.System) -> None:
+    copied_system = mixed_system.__copy__()
+    assert copied_system.fingerprint == mixed_system.fingerprint
+    chain = copied_system.states[0].chains[0]
+    amino_acid = chain.sequence[0]
+    chain.mutate_residue(index=0, amino_acid='W' if amino_acid != 'W' else 'A')
+    assert copied_system.fingerprint != mixed_system.fingerprint
+    chain.mutate_residue(index=0, amino_acid=amino_acid)
+    assert copied_system.fingerprint == mixed_system.fingerprint
+
+
+def test_system_snapshot_is_rebuilt_into_the_recorded_system(mixed_system: bg.System) -> None:
+    snapshot = mixed_system.snapshot()
+    for state, slim_state in zip(mixed_system.states, snapshot.states):
+        for oracle, result in state._oracles_result.items():
+            assert slim_state._oracles_result[oracle] is result, 'oracle results were copied'
+
+    chain = mixed_system.states[1].chains[2]  # chain E, with residues of both energy terms of the state
+    chain.add_residue(amino_acid='A', index=0)
+    mixed_system.states[1].add_residue_to_all_energy_terms(chain_ID='E', residue_index=0)
+    mixed_system.states[1].chains[1].mutate_residue(index=0, amino_acid='W')
+    mixed_system.total_energy = None
+
+    system = snapshot.to_system(template=mixed_system)
+    assert system.total_energy == -0.4
+    assert [state.total_sequence for state in system.states] == [state.total_sequence for state in snapshot.states]
+    assert system.states[1].total_sequence == ['G', 'VV', 'GVVV']
+    assert system.states[1].chains[2].mutability == [True, False, False, True]
+    chain_ids, res_ids = system.states[1].energy_terms[0].residue_groups[0]
+    assert np.all(chain_ids == ['C', 'D', 'D', 'E', 'E', 'E', 'E']) and np.all(res_ids == [0, 0, 1, 0, 1, 2, 3])
+    assert system.states[1]._energy_terms_value == snapshot.states[1]._energy_terms_value
+    assert chain.sequence == 'AGVVV', 'template was modified'